@@ -6,16 +6,25 @@ from typing import List, Optional
 
 import typer
 from importlib.metadata import version as _version
+from bfcl_eval._analyze import main as analyze_main
+from bfcl_eval._bench_generate import main as bench_generate_main
+from bfcl_eval._eval_server import main as serve_eval_main
+from bfcl_eval._eval_server import submit_job as submit_evaluation_job
 from bfcl_eval._llm_response_generation import main as generation_main
+from bfcl_eval._profiler import DEFAULT_SAMPLING_INTERVAL, PROFILE_SCOPES, SamplingProfiler
 from bfcl_eval.constants.category_mapping import TEST_COLLECTION_MAPPING
+from bfcl_eval.constants.default_prompts import LOOP_DETECTION_REPEAT_LIMIT
 from bfcl_eval.constants.eval_config import (
     DOTENV_PATH,
+    PROFILE_PATH,
     PROJECT_ROOT,
     RESULT_PATH,
     SCORE_PATH,
 )
 from bfcl_eval.constants.model_config import MODEL_CONFIG_MAPPING
 from bfcl_eval.eval_checker.eval_runner import main as evaluation_main
+from bfcl_eval.eval_checker.eval_runner import merge_main as merge_scores_main
+from bfcl_eval.model_handler.request_hedging import DEFAULT_MAX_HEDGE_RATE
 from dotenv import load_dotenv
 from tabulate import tabulate
 
@@ -28,7 +37,11 @@ class ExecutionOrderGroup(typer.core.TyperGroup):
             "generate",
             "results",
             "evaluate",
+            "serve-eval",
+            "merge-scores",
             "scores",
+            "analyze",
+            "bench-generate",
             "version",
         ]
 
@@ -57,6 +70,57 @@ def handle_multiple_input(input_str):
 
     return [item.strip() for item in ",".join(input_str).split(",") if item.strip()]
 
+
+@cli.callback()
+def profile_command(
+    ctx: typer.Context,
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        help="Run the command under a sampling profiler, and write its collapsed stacks and flamegraph.",
+    ),
+    profile_dir: str = typer.Option(
+        None,
+        "--profile-dir",
+        help="Path to the folder for the profiles, relative to the `berkeley-function-call-leaderboard` root folder. Defaults to `profile`.",
+    ),
+    profile_interval: float = typer.Option(
+        DEFAULT_SAMPLING_INTERVAL * 1000,
+        "--profile-interval",
+        help="Milliseconds between two samples of the thread stacks.",
+    ),
+    profile_scope: str = typer.Option(
+        "all",
+        "--profile-scope",
+        help=f"Which samples to keep: {', '.join(PROFILE_SCOPES)}. `checkers` keeps only the time in the evaluation checkers, `simulator` only the time in the multi-turn simulator function calls.",
+    ),
+):
+    """
+    Berkeley Function Calling Leaderboard (BFCL). The options before the command, e.g. `bfcl --profile evaluate ...`, apply to any command.
+    """
+    if not profile:
+        return
+    if profile_scope not in PROFILE_SCOPES:
+        raise typer.BadParameter(
+            f"Expected one of {PROFILE_SCOPES}.", param_hint="--profile-scope"
+        )
+    if profile_dir is None:
+        output_dir = PROFILE_PATH
+    else:
+        output_dir = (PROJECT_ROOT / profile_dir).resolve()
+    run_name = f"{ctx.invoked_subcommand}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    profiler = SamplingProfiler(interval=profile_interval / 1000, scope=profile_scope)
+
+    def write_profile():
+        profiler.stop()
+        profiler.write(output_dir, run_name)
+
+    # Runs once the command returns, or fails
+    ctx.call_on_close(write_profile)
+    profiler.start()
+
+
 @cli.command()
 def version():
     """
@@ -148,6 +212,85 @@ def generate(
         "--run-ids",
         help="If true, also run the test entry mentioned in the test_case_ids_to_generate.json file, in addition to the --test_category argument.",
     ),
+    work_queue: bool = typer.Option(
+        False,
+        "--work-queue",
+        help="Coordinate with other `bfcl generate` processes (possibly on other hosts) that write to the same result directory, through a file-lock work queue. Crashed workers' entries are reclaimed automatically.",
+    ),
+    worker_id: Optional[str] = typer.Option(
+        None,
+        "--worker-id",
+        help="Identifier of this worker in the work queue. Defaults to `<hostname>-<pid>`.",
+    ),
+    batch_api: bool = typer.Option(
+        False,
+        "--batch-api",
+        help="Generate the single-turn entries through the provider's discounted asynchronous batch API, and the multi-turn entries as usual. Only supported for OpenAI and Anthropic models.",
+    ),
+    isolated_execution: bool = typer.Option(
+        False,
+        "--isolated-execution",
+        help="Execute the multi-turn function calls in separate worker processes, with a per-call timeout and a memory limit, instead of in the inference threads.",
+    ),
+    execution_timeout: Optional[float] = typer.Option(
+        None,
+        "--execution-timeout",
+        help="Timeout in seconds for each function call under `--isolated-execution`. Defaults to 60 seconds.",
+    ),
+    loop_repeat_limit: int = typer.Option(
+        LOOP_DETECTION_REPEAT_LIMIT,
+        "--loop-repeat-limit",
+        help="End a multi-turn turn early once the model repeats the same function calls with the same execution results and simulator state (or the same short cycle of steps) this many times in a row, e.g. 3. Off (0) by default.",
+    ),
+    request_deadline: Optional[float] = typer.Option(
+        None,
+        "--request-deadline",
+        help="Fail any model request that has not returned within this many seconds, instead of letting it hold up its thread.",
+    ),
+    hedge_requests: bool = typer.Option(
+        False,
+        "--hedge-requests",
+        help="Send a duplicate of any model request still running after the p95 latency observed so far for the model, and use whichever returns first.",
+    ),
+    max_hedge_rate: float = typer.Option(
+        DEFAULT_MAX_HEDGE_RATE,
+        "--max-hedge-rate",
+        help="Maximum fraction of the requests that may be duplicated under `--hedge-requests`.",
+    ),
+    checkpoint_turns: bool = typer.Option(
+        False,
+        "--checkpoint-turns",
+        help="Checkpoint multi-turn entries after each turn, and resume failed or interrupted entries from their last completed turn instead of starting them over.",
+    ),
+    num_samples: int = typer.Option(
+        1,
+        "--num-samples",
+        help="Generate this many completions for each single-turn entry, for pass@k evaluation. OpenAI-compatible and locally served models get them in a single request (`n`); other models are queried repeatedly. Use with a nonzero `--temperature`.",
+    ),
+    generation_config: Optional[List[str]] = typer.Option(
+        None,
+        "--generation-config",
+        help="A generation config like `temperature=0.7,seed=1,lora=NAME` (keys: temperature, seed, lora, name). Repeat the flag to run several configs; locally served models launch their server once for all of them. Each config writes to its own sub-directory of the result directory, named after `name` or the other keys.",
+    ),
+    lora_modules: List[str] = typer.Option(
+        None,
+        "--lora-modules",
+        help="LoRA adapters to serve with vLLM, as NAME=PATH, for use in the `lora` key of `--generation-config`. Use commas to separate multiple adapters.",
+        callback=handle_multiple_input,
+    ),
+    subset_fraction: Optional[float] = typer.Option(
+        None,
+        "--subset-fraction",
+        help="Only generate a stratified sample of this fraction of each test category, for a quick estimate of the scores. Evaluate it with the same subset arguments.",
+    ),
+    subset_size: Optional[int] = typer.Option(
+        None,
+        "--subset-size",
+        help="Only generate a stratified sample of this many entries of each test category (all of them for smaller categories).",
+    ),
+    subset_seed: int = typer.Option(
+        0, "--subset-seed", help="Seed of the subset sample."
+    ),
 ):
     """
     Generate the LLM response for one or more models on a test-category (same as openfunctions_evaluation.py).
@@ -168,6 +311,22 @@ def generate(
         result_dir=result_dir,
         allow_overwrite=allow_overwrite,
         run_ids=run_ids,
+        work_queue=work_queue,
+        worker_id=worker_id,
+        batch_api=batch_api,
+        isolated_execution=isolated_execution,
+        execution_timeout=execution_timeout,
+        loop_repeat_limit=loop_repeat_limit,
+        request_deadline=request_deadline,
+        hedge_requests=hedge_requests,
+        max_hedge_rate=max_hedge_rate,
+        checkpoint_turns=checkpoint_turns,
+        num_samples=num_samples,
+        generation_config=generation_config,
+        lora_modules=lora_modules,
+        subset_fraction=subset_fraction,
+        subset_size=subset_size,
+        subset_seed=subset_seed,
     )
     load_dotenv(dotenv_path=DOTENV_PATH, verbose=True, override=True)  # Load the .env file
     generation_main(args)
@@ -251,13 +410,101 @@ def evaluate(
         "--score-dir",
         help="Relative path to the evaluation score folder, if different from the default; Path should be relative to the `berkeley-function-call-leaderboard` root folder",
     ),
+    shard: Optional[str] = typer.Option(
+        None,
+        "--shard",
+        help="Only evaluate shard i of N (0-indexed), in the form `i/N`. Entries are assigned to shards by a stable hash of their id. Use `bfcl merge-scores` to combine the shards afterwards.",
+    ),
+    isolated_execution: bool = typer.Option(
+        False,
+        "--isolated-execution",
+        help="Execute the multi-turn function calls in separate worker processes, with a per-call timeout and a memory limit.",
+    ),
+    execution_timeout: Optional[float] = typer.Option(
+        None,
+        "--execution-timeout",
+        help="Timeout in seconds for each function call under `--isolated-execution`. Defaults to 60 seconds.",
+    ),
+    subset_fraction: Optional[float] = typer.Option(
+        None,
+        "--subset-fraction",
+        help="Only evaluate a stratified sample of this fraction of each test category, as drawn by `bfcl generate` with the same subset arguments. The accuracies are estimated for the whole categories, with bootstrap confidence intervals.",
+    ),
+    subset_size: Optional[int] = typer.Option(
+        None,
+        "--subset-size",
+        help="Only evaluate a stratified sample of this many entries of each test category (all of them for smaller categories).",
+    ),
+    subset_seed: int = typer.Option(
+        0, "--subset-seed", help="Seed of the subset sample."
+    ),
+    no_server: bool = typer.Option(
+        False,
+        "--no-server",
+        help="Evaluate in this process even if a `bfcl serve-eval` server is running.",
+    ),
 ):
     """
     Evaluate results from run of one or more models on a test-category (same as eval_runner.py).
     """
 
+    if not no_server and submit_evaluation_job(
+        model,
+        test_category,
+        result_dir,
+        score_dir,
+        shard,
+        isolated_execution,
+        execution_timeout,
+        subset_fraction,
+        subset_size,
+        subset_seed,
+    ):
+        return
+
     load_dotenv(dotenv_path=DOTENV_PATH, verbose=True, override=True)  # Load the .env file
-    evaluation_main(model, test_category, result_dir, score_dir)
+    evaluation_main(
+        model,
+        test_category,
+        result_dir,
+        score_dir,
+        shard,
+        isolated_execution,
+        execution_timeout,
+        subset_fraction,
+        subset_size,
+        subset_seed,
+    )
+
+
+@cli.command()
+def serve_eval(
+    host: str = typer.Option("127.0.0.1", "--host", help="The address to listen on."),
+    port: int = typer.Option(
+        0, "--port", help="The port to listen on. Defaults to any free port."
+    ),
+):
+    """
+    Run a long-lived evaluation server that `bfcl evaluate` sends its jobs to. It keeps the datasets, handlers and the verdicts of the checked entries in memory, so each job only checks the entries that changed.
+    """
+
+    load_dotenv(dotenv_path=DOTENV_PATH, verbose=True, override=True)  # Load the .env file
+    serve_eval_main(host, port)
+
+
+@cli.command()
+def merge_scores(
+    score_dir: str = typer.Option(
+        None,
+        "--score-dir",
+        help="Relative path to the evaluation score folder that contains the `shards` sub-folder, if different from the default; Path should be relative to the `berkeley-function-call-leaderboard` root folder",
+    ),
+):
+    """
+    Combine the partial score files from `bfcl evaluate --shard i/N` into the normal score files and leaderboard.
+    """
+
+    merge_scores_main(score_dir)
 
 
 @cli.command()
@@ -311,5 +558,107 @@ def scores(
         print(f"\nFile {file} not found.\n")
 
 
+@cli.command()
+def analyze(
+    model: List[str] = typer.Option(
+        None,
+        help="A list of model names to compare. Defaults to all the evaluated models.",
+        callback=handle_multiple_input,
+    ),
+    test_category: List[str] = typer.Option(
+        ["all"],
+        help="A list of test categories to compare the models on.",
+        callback=handle_multiple_input,
+    ),
+    score_dir: str = typer.Option(
+        None,
+        "--score-dir",
+        help="Relative path to the evaluation score folder, if different from the default; Path should be relative to the `berkeley-function-call-leaderboard` root folder",
+    ),
+    baseline: Optional[str] = typer.Option(
+        None,
+        "--baseline",
+        help="The model the others are compared against, entry by entry. Defaults to the most accurate one.",
+    ),
+    num_bootstrap: int = typer.Option(
+        1000,
+        "--num-bootstrap",
+        help="Number of bootstrap resamples for the accuracy confidence intervals.",
+    ),
+    confidence: float = typer.Option(
+        0.95, "--confidence", help="Confidence level of the accuracy intervals."
+    ),
+    max_listed_entries: int = typer.Option(
+        20,
+        "--max-listed-entries",
+        help="Maximum number of entries listed among those that every model fails.",
+    ),
+):
+    """
+    Compare the evaluated models entry by entry: accuracy with confidence intervals, paired wins and losses with McNemar tests, and the entries every model fails.
+    """
+    analyze_main(
+        model,
+        test_category,
+        score_dir,
+        baseline,
+        num_bootstrap,
+        confidence,
+        max_listed_entries,
+    )
+
+
+@cli.command()
+def bench_generate(
+    model: List[str] = typer.Option(
+        ["mock-openai-completions-FC", "mock-openai-completions", "Qwen/Qwen3-0.6B"],
+        help="A list of model names to benchmark. Use commas to separate multiple models. `mock-openai-completions-FC` and `mock-openai-completions` run `OpenAICompletionsHandler` in FC and prompting mode; locally served models run through `OSSHandler` and need their tokenizer.",
+        callback=handle_multiple_input,
+    ),
+    test_category: List[str] = typer.Option(
+        ["simple", "multi_turn_base"],
+        help="A list of test categories to generate. Use commas to separate multiple test categories.",
+        callback=handle_multiple_input,
+    ),
+    num_threads: int = typer.Option(
+        8, help="The number of threads to use for the API models."
+    ),
+    latency: str = typer.Option(
+        "fixed:0",
+        "--latency",
+        help="Latency distribution of the mock server, in seconds: fixed:S, uniform:LOW:HIGH, exponential:MEAN or lognormal:MEDIAN:SIGMA.",
+    ),
+    error_rate: float = typer.Option(
+        0.0, "--error-rate", help="Fraction of requests answered with a 500 error."
+    ),
+    rate_limit_rate: float = typer.Option(
+        0.0, "--rate-limit-rate", help="Fraction of requests answered with a 429 error."
+    ),
+    replay_dir: Optional[str] = typer.Option(
+        None,
+        "--replay-dir",
+        help="A model result folder whose responses the mock server replays, instead of trivial ones.",
+    ),
+    local_model_path: Optional[str] = typer.Option(
+        None,
+        "--local-model-path",
+        help="Local directory with the tokenizer and config of the OSS model, if they are not in the Hugging Face cache.",
+    ),
+):
+    """
+    Measure the client-side throughput and CPU cost of `bfcl generate` against a local mock server.
+    """
+    bench_generate_main(
+        model,
+        test_category,
+        num_threads,
+        latency,
+        error_rate,
+        rate_limit_rate,
+        replay_dir,
+        local_model_path,
+    )
+
+
 if __name__ == "__main__":
     cli()
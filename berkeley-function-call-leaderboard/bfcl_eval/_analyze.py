@@ -0,0 +1,145 @@
+from typing import Optional
+
+import numpy as np
+from bfcl_eval.constants.eval_config import (
+    CORRECTNESS_BITMAP_FILE_NAME,
+    PROJECT_ROOT,
+    SCORE_PATH,
+)
+from bfcl_eval.eval_checker.correctness_bitmap import (
+    CorrectnessBitmap,
+    bootstrap_accuracy_ci,
+    compute_accuracy,
+    compute_pairwise_counts,
+    find_entries_failed_by_all,
+    mcnemar_p_values,
+)
+from bfcl_eval.utils import parse_test_category_argument
+from tabulate import tabulate
+
+
+def _format_accuracy(accuracy: float) -> str:
+    return "N/A" if np.isnan(accuracy) else f"{accuracy * 100:.2f}%"
+
+
+def main(
+    models: Optional[list[str]],
+    test_category: list[str],
+    score_dir: Optional[str],
+    baseline: Optional[str],
+    num_bootstrap: int,
+    confidence: float,
+    max_listed_entries: int,
+) -> None:
+    """
+    Compare the evaluated models entry by entry, from the correctness bitmap written by `bfcl evaluate`.
+    """
+    if score_dir is None:
+        score_dir = SCORE_PATH
+    else:
+        score_dir = (PROJECT_ROOT / score_dir).resolve()
+    bitmap_file = score_dir / CORRECTNESS_BITMAP_FILE_NAME
+    if not bitmap_file.exists():
+        raise FileNotFoundError(
+            f"No correctness bitmap found at {bitmap_file}. Run `bfcl evaluate` first."
+        )
+    if num_bootstrap < 1:
+        raise ValueError("`--num-bootstrap` must be at least 1.")
+    if not 0 < confidence < 1:
+        raise ValueError("`--confidence` must be between 0 and 1.")
+
+    bitmap = CorrectnessBitmap.load(bitmap_file)
+
+    # The score folder names the models with "_" instead of "/"
+    model_names = bitmap.model_names()
+    if models:
+        requested = [model_name.replace("/", "_") for model_name in models]
+        unknown = [model_name for model_name in requested if model_name not in model_names]
+        if unknown:
+            raise ValueError(
+                f"No evaluation found for {unknown} in {bitmap_file}. Available models: {model_names}."
+            )
+        model_names = requested
+    _, all_test_categories = parse_test_category_argument(test_category)
+    test_categories = [
+        category for category in bitmap.test_categories() if category in all_test_categories
+    ]
+    if not model_names or not test_categories:
+        print("Nothing to analyze: no evaluated model on the selected test categories.")
+        return
+
+    correct, evaluated, entry_ids = bitmap.matrix(model_names, test_categories)
+    accuracy = compute_accuracy(correct, evaluated)
+    lower, upper = bootstrap_accuracy_ci(correct, evaluated, num_bootstrap, confidence)
+    order = sorted(
+        range(len(model_names)),
+        key=lambda i: -1 if np.isnan(accuracy[i]) else accuracy[i],
+        reverse=True,
+    )
+
+    # Per-category accuracy, and the accuracy over all the selected entries, with its bootstrap confidence interval
+    category_accuracy = {}
+    offset = 0
+    for category in test_categories:
+        columns = slice(offset, offset + len(bitmap.ids[category]))
+        category_accuracy[category] = compute_accuracy(
+            correct[:, columns], evaluated[:, columns]
+        )
+        offset = columns.stop
+    rows = [
+        [
+            model_names[i],
+            _format_accuracy(accuracy[i]),
+            f"[{_format_accuracy(lower[i])}, {_format_accuracy(upper[i])}]",
+            int(evaluated[i].sum()),
+        ]
+        + [_format_accuracy(category_accuracy[category][i]) for category in test_categories]
+        for i in order
+    ]
+    print(
+        tabulate(
+            rows,
+            headers=["Model", "Accuracy", f"{confidence:.0%} CI", "Entries"] + test_categories,
+            tablefmt="grid",
+        )
+    )
+
+    # Paired comparison of every model against the baseline, on the entries evaluated for both
+    if len(model_names) > 1:
+        if baseline is None:
+            baseline_index = order[0]
+        else:
+            baseline_name = baseline.replace("/", "_")
+            if baseline_name not in model_names:
+                raise ValueError(f"The baseline '{baseline}' is not among the analyzed models.")
+            baseline_index = model_names.index(baseline_name)
+        wins, losses = compute_pairwise_counts(correct, evaluated)
+        p_values = mcnemar_p_values(wins[:, baseline_index], losses[:, baseline_index])
+        rows = [
+            [
+                model_names[i],
+                wins[i, baseline_index],
+                losses[i, baseline_index],
+                wins[i, baseline_index] - losses[i, baseline_index],
+                f"{p_values[i]:.4g}",
+            ]
+            for i in order
+            if i != baseline_index
+        ]
+        print(f"\nPaired comparison against {model_names[baseline_index]}:")
+        print(
+            tabulate(
+                rows,
+                headers=["Model", "Wins", "Losses", "Net", "McNemar p"],
+                tablefmt="grid",
+            )
+        )
+
+    failed_by_all = np.flatnonzero(find_entries_failed_by_all(correct, evaluated))
+    print(
+        f"\n{len(failed_by_all)} entries are failed by all {len(model_names)} models."
+    )
+    for index in failed_by_all[:max_listed_entries]:
+        print(f"  {entry_ids[index]}")
+    if len(failed_by_all) > max_listed_entries:
+        print(f"  ... and {len(failed_by_all) - max_listed_entries} more.")
@@ -0,0 +1,345 @@
+import json
+import os
+import time
+import traceback
+from copy import deepcopy
+from pathlib import Path
+
+from bfcl_eval.model_handler.api_inference.claude import ClaudeHandler
+from bfcl_eval.model_handler.api_inference.openai_completion import (
+    OpenAICompletionsHandler,
+)
+from bfcl_eval.model_handler.api_inference.openai_response import (
+    OpenAIResponsesHandler,
+)
+from bfcl_eval.utils import is_multi_turn, make_json_serializable
+from openai.types.chat import ChatCompletion
+from openai.types.responses import Response
+
+BATCH_POLL_INTERVAL = 30  # seconds
+# Maximum number of requests in one submitted batch; larger jobs are split into several batches
+MAX_BATCH_SIZE = 10000
+# Keyword arguments of the SDK calls that configure the client request rather than being part of the body
+CLIENT_OPTIONS = ("timeout", "extra_headers", "extra_query", "extra_body")
+# The submitted batches of a model, so that an interrupted run resumes polling them instead of submitting again
+BATCH_STATE_FILE_NAME = ".batch_api_state.json"
+
+
+class OpenAIBatchBackend:
+    """
+    OpenAI Batch API: the requests are uploaded as a JSONL file, and the results are downloaded as JSONL files once the batch has completed.
+    """
+
+    def __init__(self, client, endpoint: str, response_type) -> None:
+        self.client = client
+        self.endpoint = endpoint
+        self.response_type = response_type
+
+    def submit(self, requests: dict[str, dict]) -> str:
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": self.endpoint,
+                    "body": body,
+                }
+            )
+            for custom_id, body in requests.items()
+        ]
+        input_file = self.client.files.create(
+            file=("bfcl_batch_input.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=self.endpoint,
+            completion_window="24h",
+        )
+        return batch.id
+
+    def is_done(self, batch_id: str) -> bool:
+        batch = self.client.batches.retrieve(batch_id)
+        return batch.status in {"completed", "failed", "expired", "cancelled"}
+
+    def results(self, batch_id: str) -> dict:
+        """
+        Map each custom id to either the parsed response object, or an error message.
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        results = {}
+        for file_id in [batch.output_file_id, batch.error_file_id]:
+            if file_id is None:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                output = json.loads(line)
+                response = output.get("response") or {}
+                if output.get("error"):
+                    results[output["custom_id"]] = str(output["error"])
+                elif response.get("status_code") != 200:
+                    results[output["custom_id"]] = str(response.get("body"))
+                else:
+                    # Like the SDK does for its own responses, build the object without strict validation
+                    results[output["custom_id"]] = self.response_type.construct(
+                        **response["body"]
+                    )
+        if batch.status != "completed":
+            print(f"❗️ Batch {batch_id} ended with status {batch.status}.")
+        return results
+
+
+class AnthropicBatchBackend:
+    """
+    Anthropic Message Batches API: the requests are sent inline, and the results are streamed back once processing has ended.
+    """
+
+    def __init__(self, client) -> None:
+        self.client = client
+
+    def submit(self, requests: dict[str, dict]) -> str:
+        batch = self.client.messages.batches.create(
+            requests=[
+                {"custom_id": custom_id, "params": params}
+                for custom_id, params in requests.items()
+            ]
+        )
+        return batch.id
+
+    def is_done(self, batch_id: str) -> bool:
+        return self.client.messages.batches.retrieve(batch_id).processing_status == "ended"
+
+    def results(self, batch_id: str) -> dict:
+        results = {}
+        for output in self.client.messages.batches.results(batch_id):
+            if output.result.type == "succeeded":
+                results[output.custom_id] = output.result.message
+            else:
+                results[output.custom_id] = f"{output.result.type}: {getattr(output.result, 'error', '')}"
+        return results
+
+
+def get_batch_backend(handler):
+    """
+    Get the batch backend for the handler's provider, or `None` if the handler has no batch support.
+    Only the first-party handlers qualify; their subclasses talk to other providers through the same SDK.
+    """
+    if type(handler) is OpenAICompletionsHandler:
+        return OpenAIBatchBackend(handler.client, "/v1/chat/completions", ChatCompletion)
+    if type(handler) is OpenAIResponsesHandler:
+        return OpenAIBatchBackend(handler.client, "/v1/responses", Response)
+    if type(handler) is ClaudeHandler:
+        return AnthropicBatchBackend(handler.client)
+    return None
+
+
+def _is_fc(handler) -> bool:
+    # Same dispatch as `BaseHandler.inference`
+    return "FC" in handler.model_name or handler.is_fc_model
+
+
+def _compile_request(handler, test_entry: dict) -> tuple[dict, dict]:
+    """
+    Run the handler's normal single-turn query path, but capture the keyword arguments of the API call instead of sending it.
+    Returns the request body and the inference data.
+    """
+    captured_request = {}
+
+    def capture(**kwargs):
+        captured_request.update(kwargs)
+        return None, 0
+
+    handler.generate_with_backoff = capture
+    try:
+        if _is_fc(handler):
+            inference_data = handler._pre_query_processing_FC({}, test_entry)
+            inference_data = handler._compile_tools(inference_data, test_entry)
+            inference_data = handler.add_first_turn_message_FC(
+                inference_data, test_entry["question"][0]
+            )
+            handler._query_FC(inference_data)
+        else:
+            inference_data = handler._pre_query_processing_prompting(test_entry)
+            inference_data = handler.add_first_turn_message_prompting(
+                inference_data, test_entry["question"][0]
+            )
+            handler._query_prompting(inference_data)
+    finally:
+        del handler.generate_with_backoff
+
+    # The SDK merges `extra_body` into the body it sends, and the other client options have no place in a batched request
+    extra_body = captured_request.get("extra_body") or {}
+    for option in CLIENT_OPTIONS:
+        captured_request.pop(option, None)
+    captured_request.update(extra_body)
+    return make_json_serializable(captured_request), inference_data
+
+
+def _error_result(test_entry_id: str, error_message: str, error_traceback: str = None) -> dict:
+    # Same format as a failed entry in the threaded generation path
+    result = {
+        "id": test_entry_id,
+        "result": f"Error during inference: {error_message}",
+    }
+    if error_traceback is not None:
+        result["traceback"] = error_traceback
+    return result
+
+
+def _build_result(
+    handler, test_entry_id: str, api_response, inference_data: dict, include_input_log: bool
+) -> dict:
+    # Mirrors the post-processing of `BaseHandler.inference_single_turn_FC/prompting`
+    if _is_fc(handler):
+        model_response_data = handler._parse_query_response_FC(api_response)
+    else:
+        model_response_data = handler._parse_query_response_prompting(api_response)
+
+    result = {
+        "id": test_entry_id,
+        "result": model_response_data["model_responses"],
+    }
+    if include_input_log:
+        result["inference_log"] = [
+            {
+                "role": "inference_input",
+                "content": inference_data.get("inference_input_log", ""),
+            }
+        ]
+    result["input_token_count"] = model_response_data["input_token"]
+    result["output_token_count"] = model_response_data["output_token"]
+    # There is no meaningful per-request latency in batch mode, so no `latency` is recorded
+    if model_response_data.get("reasoning_content", "") != "":
+        result["reasoning_content"] = model_response_data["reasoning_content"]
+    return result
+
+
+def _load_batch_state(state_path: Path) -> dict:
+    if not state_path.exists():
+        return {"batch_ids": [], "requests": {}}
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def _save_batch_state(state_path: Path, state: dict) -> None:
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = state_path.with_name(state_path.name + ".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(temp_path, state_path)
+
+
+def clear_batch_state(state_dir: Path) -> None:
+    """
+    Forget the submitted batches of a model, once their results are written.
+    """
+    (Path(state_dir) / BATCH_STATE_FILE_NAME).unlink(missing_ok=True)
+
+
+def batch_inference(
+    handler,
+    test_entries: list[dict],
+    include_input_log: bool,
+    state_dir: Path,
+    poll_interval: float = BATCH_POLL_INTERVAL,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Generate the single-turn entries through the provider's asynchronous batch API.
+    Returns the results of the batched entries, and the entries that must still go through normal inference (multi-turn entries, or all of them if the provider has no batch API).
+
+    The ids of the submitted batches and the inference data of their requests are saved under `state_dir` (the result folder of the model) before polling. A run interrupted while waiting resumes polling those batches, and only submits the entries they don't cover; call `clear_batch_state` once the results are written.
+    """
+    backend = get_batch_backend(handler)
+    if backend is None:
+        print(
+            f"❗️ {handler.model_name} has no batch API support. Falling back to normal inference."
+        )
+        return [], test_entries
+
+    remaining_entries = [entry for entry in test_entries if is_multi_turn(entry["id"])]
+    single_turn_entries = [
+        entry for entry in test_entries if not is_multi_turn(entry["id"])
+    ]
+    if not single_turn_entries:
+        return [], remaining_entries
+
+    state_path = Path(state_dir) / BATCH_STATE_FILE_NAME
+    state = _load_batch_state(state_path)
+    if state["batch_ids"]:
+        print(
+            f"📦 Resuming {len(state['batch_ids'])} submitted batch(es) of {handler.model_name}: {', '.join(state['batch_ids'])}"
+        )
+    submitted_entry_ids = {request["id"] for request in state["requests"].values()}
+
+    results = []
+    # Custom ids are kept short and simple, as providers restrict their format
+    requests = {}
+    for test_entry in single_turn_entries:
+        if test_entry["id"] in submitted_entry_ids:
+            continue
+        custom_id = f"request-{len(state['requests']) + len(requests)}"
+        try:
+            request, inference_data = _compile_request(handler, deepcopy(test_entry))
+        except Exception as e:
+            results.append(_error_result(test_entry["id"], str(e), traceback.format_exc()))
+            continue
+        requests[custom_id] = request
+        state["requests"][custom_id] = {
+            "id": test_entry["id"],
+            "inference_data": make_json_serializable(inference_data),
+        }
+
+    custom_ids = list(requests.keys())
+    batch_ids = []
+    for start in range(0, len(custom_ids), MAX_BATCH_SIZE):
+        chunk = {custom_id: requests[custom_id] for custom_id in custom_ids[start : start + MAX_BATCH_SIZE]}
+        batch_ids.append(backend.submit(chunk))
+        # Saved after each submission, the batches already submitted must not be lost if the next one fails
+        state["batch_ids"].append(batch_ids[-1])
+        _save_batch_state(state_path, state)
+    if batch_ids:
+        print(
+            f"📦 Submitted {len(requests)} requests for {handler.model_name} in {len(batch_ids)} batch(es): {', '.join(batch_ids)}"
+        )
+
+    pending_batch_ids = list(state["batch_ids"])
+    while True:
+        pending_batch_ids = [
+            batch_id for batch_id in pending_batch_ids if not backend.is_done(batch_id)
+        ]
+        if not pending_batch_ids:
+            break
+        print(f"⏳ Waiting for {len(pending_batch_ids)} batch(es) to finish...")
+        time.sleep(poll_interval)
+
+    api_responses = {}
+    for batch_id in state["batch_ids"]:
+        api_responses.update(backend.results(batch_id))
+
+    single_turn_entry_ids = {entry["id"] for entry in single_turn_entries}
+    for custom_id, request in state["requests"].items():
+        test_entry_id = request["id"]
+        if test_entry_id not in single_turn_entry_ids:
+            # Submitted by an earlier run for entries that are no longer asked for
+            continue
+        api_response = api_responses.get(custom_id)
+        if api_response is None:
+            results.append(_error_result(test_entry_id, "No result returned by the batch API."))
+        elif isinstance(api_response, str):
+            results.append(_error_result(test_entry_id, api_response))
+        else:
+            try:
+                results.append(
+                    _build_result(
+                        handler,
+                        test_entry_id,
+                        api_response,
+                        request["inference_data"],
+                        include_input_log,
+                    )
+                )
+            except Exception as e:
+                results.append(_error_result(test_entry_id, str(e), traceback.format_exc()))
+
+    return results, remaining_entries
@@ -0,0 +1,212 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import requests
+from bfcl_eval._llm_response_generation import main as generation_main
+from bfcl_eval._mock_server import parse_latency_distribution
+from bfcl_eval.constants.default_prompts import LOOP_DETECTION_REPEAT_LIMIT
+from bfcl_eval.constants.model_config import MODEL_CONFIG_MAPPING, ModelConfig
+from bfcl_eval.model_handler.api_inference.openai_completion import (
+    OpenAICompletionsHandler,
+)
+from bfcl_eval.model_handler.request_hedging import DEFAULT_MAX_HEDGE_RATE
+from bfcl_eval.utils import load_file
+from tabulate import tabulate
+
+SERVER_STARTUP_TIMEOUT = 60  # seconds
+
+# No listed model uses `OpenAICompletionsHandler` itself (they all subclass it for their own provider), so the benchmark registers its own
+BENCH_MODEL_CONFIGS = {
+    f"mock-openai-completions{suffix}": ModelConfig(
+        model_name=f"mock-openai-completions{suffix}",
+        display_name=f"Mock OpenAI Chat Completions ({mode})",
+        url="",
+        org="BFCL",
+        license="",
+        model_handler=OpenAICompletionsHandler,
+        is_fc_model=is_fc_model,
+    )
+    for suffix, mode, is_fc_model in [("-FC", "FC", True), ("", "Prompt", False)]
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_mock_server(
+    port: int, latency: str, error_rate: float, rate_limit_rate: float, replay_dir
+) -> subprocess.Popen:
+    # A separate process, so that the CPU time of the server is not counted as client CPU time
+    command = [
+        sys.executable,
+        "-m",
+        "bfcl_eval._mock_server",
+        "--port",
+        str(port),
+        "--latency",
+        latency,
+        "--error-rate",
+        str(error_rate),
+        "--rate-limit-rate",
+        str(rate_limit_rate),
+    ]
+    if replay_dir is not None:
+        command += ["--replay-dir", str(replay_dir)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+    deadline = time.time() + SERVER_STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(
+                f"The mock server exited unexpectedly with code {process.returncode}."
+            )
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/v1/models", timeout=1).status_code == 200:
+                return process
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("The mock server did not start in time.")
+
+
+def _stop_mock_server(process: subprocess.Popen) -> str:
+    # SIGINT lets the server print its statistics before exiting
+    process.send_signal(signal.SIGINT)
+    try:
+        output, _ = process.communicate(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        output, _ = process.communicate()
+    return output.strip().splitlines()[-1] if output.strip() else ""
+
+
+def _count_results(model_result_dir: Path) -> tuple[int, int]:
+    entries, errors = 0, 0
+    for result_file in model_result_dir.glob("*_result.json"):
+        for result in load_file(result_file):
+            entries += 1
+            if isinstance(result["result"], str) and result["result"].startswith(
+                "Error during inference"
+            ):
+                errors += 1
+    return entries, errors
+
+
+def main(
+    models: list[str],
+    test_category: list[str],
+    num_threads: int,
+    latency: str,
+    error_rate: float,
+    rate_limit_rate: float,
+    replay_dir,
+    local_model_path,
+) -> None:
+    """
+    Run `bfcl generate` for each model against a local mock server, and report the throughput and the client-side CPU time per entry.
+    """
+    # Fail early on a bad distribution, rather than in the server process
+    parse_latency_distribution(latency)
+    for model_name, config in BENCH_MODEL_CONFIGS.items():
+        MODEL_CONFIG_MAPPING.setdefault(model_name, config)
+
+    port = _free_port()
+    server = _start_mock_server(port, latency, error_rate, rate_limit_rate, replay_dir)
+    # The OpenAI SDK reads its base URL from the environment, and `OSSHandler` its endpoint
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ["OPENAI_API_KEY"] = "mock"
+    os.environ["VLLM_ENDPOINT"] = "127.0.0.1"
+    os.environ["VLLM_PORT"] = str(port)
+
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="bfcl_bench_") as result_dir:
+            for model_name in models:
+                args = SimpleNamespace(
+                    model=[model_name],
+                    test_category=test_category,
+                    temperature=0.001,
+                    include_input_log=False,
+                    exclude_state_log=False,
+                    num_gpus=1,
+                    num_threads=num_threads,
+                    gpu_memory_utilization=0.9,
+                    backend="vllm",
+                    skip_server_setup=True,
+                    local_model_path=local_model_path,
+                    result_dir=result_dir,
+                    allow_overwrite=True,
+                    run_ids=False,
+                    work_queue=False,
+                    worker_id=None,
+                    batch_api=False,
+                    isolated_execution=False,
+                    execution_timeout=None,
+                    loop_repeat_limit=LOOP_DETECTION_REPEAT_LIMIT,
+                    request_deadline=None,
+                    hedge_requests=False,
+                    max_hedge_rate=DEFAULT_MAX_HEDGE_RATE,
+                    checkpoint_turns=False,
+                    num_samples=1,
+                    generation_config=None,
+                    lora_modules=None,
+                    subset_fraction=None,
+                    subset_size=None,
+                    subset_seed=0,
+                )
+                start_wall_time = time.perf_counter()
+                start_cpu_time = time.process_time()
+                try:
+                    generation_main(args)
+                except Exception as e:
+                    # e.g. the tokenizer of an OSS model is not available; still report the other models
+                    print(f"❗️ Benchmark of {model_name} failed: {e}")
+                    rows.append([model_name] + ["-"] * 6)
+                    continue
+                wall_time = time.perf_counter() - start_wall_time
+                cpu_time = time.process_time() - start_cpu_time
+
+                entries, errors = _count_results(
+                    Path(result_dir) / model_name.replace("/", "_")
+                )
+                rows.append(
+                    [
+                        model_name,
+                        entries,
+                        errors,
+                        f"{wall_time:.1f}",
+                        f"{entries / wall_time:.1f}" if wall_time > 0 else "-",
+                        f"{cpu_time:.1f}",
+                        f"{cpu_time / entries * 1000:.1f}" if entries else "-",
+                    ]
+                )
+    finally:
+        server_stats = _stop_mock_server(server)
+
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "Model",
+                "Entries",
+                "Errors",
+                "Wall (s)",
+                "Entries/s",
+                "Client CPU (s)",
+                "CPU/entry (ms)",
+            ],
+            tablefmt="grid",
+        )
+    )
+    if server_stats:
+        print(f"Mock server: {server_stats}")
@@ -0,0 +1,237 @@
+"""
+A long-lived evaluation server, for scoring many small result batches without paying the start-up cost of `bfcl evaluate` each time.
+
+It keeps the parsed dataset files, the model handlers (with their tree-sitter parsers) and the verdict of every checked entry in memory, so a job only re-checks the entries that changed since the previous jobs.
+While it runs, `bfcl evaluate` sends its job to it, through the address it records in `EVAL_SERVER_STATE_PATH`, and falls back to evaluating in-process when no server answers.
+
+    bfcl serve-eval --port 1054
+"""
+
+import contextlib
+import http.client
+import io
+import json
+import os
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from bfcl_eval.constants.category_mapping import TEST_FILE_MAPPING
+from bfcl_eval.constants.eval_config import (
+    EVAL_SERVER_STATE_PATH,
+    POSSIBLE_ANSWER_PATH,
+    PROJECT_ROOT,
+    PROMPT_PATH,
+)
+from bfcl_eval.eval_checker import eval_runner
+from bfcl_eval.eval_checker.evaluation_cache import EvaluationCache
+
+# How long `bfcl evaluate` waits for the server to answer its health check
+HEALTH_CHECK_TIMEOUT = 2  # seconds
+
+
+class EvalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, host: str = "127.0.0.1") -> None:
+        super().__init__((host, port), _EvalRequestHandler)
+        self.cache = EvaluationCache()
+        # The evaluation writes to shared score folders and uses process-wide state, so jobs run one at a time
+        self.job_lock = threading.Lock()
+        self.num_jobs = 0
+
+    def preload(self) -> None:
+        for test_file in sorted(set(TEST_FILE_MAPPING.values())):
+            for file_path in (PROMPT_PATH / test_file, POSSIBLE_ANSWER_PATH / test_file):
+                if file_path.exists():
+                    self.cache.load_dataset_file(file_path)
+
+    def run_job(self, job: dict) -> dict:
+        output = io.StringIO()
+        error = None
+        start_time = time.time()
+        with self.job_lock:
+            stats_before = dict(self.cache.stats)
+            # Verdicts obtained with different execution settings are kept apart
+            self.cache.verdict_scope = (
+                job.get("isolated_execution", False),
+                job.get("execution_timeout"),
+            )
+            eval_runner.configure_evaluation_cache(self.cache)
+            try:
+                with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                    eval_runner.main(
+                        job.get("model"),
+                        job.get("test_category", ["all"]),
+                        job.get("result_dir"),
+                        job.get("score_dir"),
+                        job.get("shard"),
+                        job.get("isolated_execution", False),
+                        job.get("execution_timeout"),
+                        job.get("subset_fraction"),
+                        job.get("subset_size"),
+                        job.get("subset_seed", 0),
+                    )
+            except Exception:
+                error = traceback.format_exc()
+            finally:
+                eval_runner.configure_evaluation_cache(None)
+            self.num_jobs += 1
+            stats = {
+                key: value - stats_before[key] for key, value in self.cache.stats.items()
+            }
+        print(
+            f"Job {self.num_jobs} {'failed' if error else 'done'} in {time.time() - start_time:.2f}s: {stats['checked']} entries checked, {stats['reused']} reused.",
+            flush=True,
+        )
+        return {"output": output.getvalue(), "error": error, "stats": stats}
+
+
+class _EvalRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: EvalServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/health":
+            self._send_json(
+                200,
+                {
+                    "project_root": str(PROJECT_ROOT),
+                    "pid": os.getpid(),
+                    "num_jobs": self.server.num_jobs,
+                },
+            )
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") != "/evaluate":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        job = json.loads(self.rfile.read(length) or b"{}")
+        # Relative result and score folders are resolved against the project root, which must be the same on both sides
+        if job.get("project_root") != str(PROJECT_ROOT):
+            self._send_json(
+                409,
+                {
+                    "error": f"The server evaluates for the project root {PROJECT_ROOT}, not {job.get('project_root')}."
+                },
+            )
+            return
+        self._send_json(200, self.server.run_job(job))
+
+
+def _get_server_url() -> Optional[str]:
+    """
+    The address of the running server of this project root, if any.
+    """
+    try:
+        with open(EVAL_SERVER_STATE_PATH) as f:
+            state = json.load(f)
+        url = f"http://{state['host']}:{state['port']}"
+        with urllib.request.urlopen(f"{url}/health", timeout=HEALTH_CHECK_TIMEOUT) as response:
+            health = json.load(response)
+    except (OSError, ValueError, KeyError):
+        # No server, or a stale state file left by one that was killed
+        return None
+    if health.get("project_root") != str(PROJECT_ROOT):
+        return None
+    return url
+
+
+def submit_job(
+    model,
+    test_category,
+    result_dir,
+    score_dir,
+    shard=None,
+    isolated_execution=False,
+    execution_timeout=None,
+    subset_fraction=None,
+    subset_size=None,
+    subset_seed=0,
+) -> bool:
+    """
+    Run an evaluation on the `bfcl serve-eval` server of this project root, and print its output.
+    Returns False if no server is running, or if the connection to it fails before the reply; the caller then evaluates in-process.
+    """
+    url = _get_server_url()
+    if url is None:
+        return False
+
+    job = {
+        "project_root": str(PROJECT_ROOT),
+        "model": model,
+        "test_category": test_category,
+        "result_dir": result_dir,
+        "score_dir": score_dir,
+        "shard": shard,
+        "isolated_execution": isolated_execution,
+        "execution_timeout": execution_timeout,
+        "subset_fraction": subset_fraction,
+        "subset_size": subset_size,
+        "subset_seed": subset_seed,
+    }
+    request = urllib.request.Request(
+        f"{url}/evaluate",
+        data=json.dumps(job).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    print(f"Evaluating on the `bfcl serve-eval` server at {url}.")
+    try:
+        with urllib.request.urlopen(request) as response:
+            reply = json.load(response)
+    except urllib.error.HTTPError as e:
+        if e.code == 409:
+            return False
+        raise
+    except (OSError, http.client.HTTPException) as e:
+        # E.g. the server was stopped or crashed during the job (`RemoteDisconnected`)
+        print(f"❗️ Lost the connection to the `bfcl serve-eval` server ({e!r}). Evaluating in-process instead.")
+        return False
+    print(reply["output"], end="")
+    if reply["error"]:
+        raise RuntimeError(f"The evaluation failed on the `bfcl serve-eval` server:\n{reply['error']}")
+    return True
+
+
+def main(host: str, port: int) -> None:
+    server = EvalServer(port, host=host)
+    start_time = time.time()
+    server.preload()
+    print(f"Loaded the dataset files in {time.time() - start_time:.2f}s.")
+
+    EVAL_SERVER_STATE_PATH.write_text(
+        json.dumps({"host": host, "port": server.server_address[1], "pid": os.getpid()})
+    )
+    print(
+        f"Evaluation server listening on http://{host}:{server.server_address[1]}. `bfcl evaluate` now runs on it; stop it with Ctrl+C.",
+        flush=True,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        # Unless another server has taken over since
+        with contextlib.suppress(OSError, ValueError):
+            if json.loads(EVAL_SERVER_STATE_PATH.read_text()).get("pid") == os.getpid():
+                EVAL_SERVER_STATE_PATH.unlink()
+        print(f"Served {server.num_jobs} evaluation jobs.")
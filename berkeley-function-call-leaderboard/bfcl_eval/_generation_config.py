@@ -0,0 +1,87 @@
+import re
+from copy import copy
+from pathlib import Path
+
+# Keys accepted in a `--generation-config` spec, and how their values are parsed
+GENERATION_CONFIG_KEYS = {
+    "temperature": float,
+    "seed": int,
+    "lora": str,
+    "name": str,
+}
+
+
+def parse_generation_config(spec: str) -> dict:
+    """
+    Parse a generation config spec like `temperature=0.7,seed=1,lora=my-adapter`.
+    `name` sets the name of the config's result sub-directory, which otherwise is derived from the other keys.
+    """
+    config = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        key, separator, value = item.partition("=")
+        key, value = key.strip(), value.strip()
+        if not separator or key not in GENERATION_CONFIG_KEYS:
+            raise ValueError(
+                f"Invalid generation config '{spec}'. Expected comma-separated KEY=VALUE pairs, with keys among {list(GENERATION_CONFIG_KEYS)}."
+            )
+        try:
+            config[key] = GENERATION_CONFIG_KEYS[key](value)
+        except ValueError:
+            raise ValueError(f"Invalid value '{value}' for '{key}' in generation config '{spec}'.")
+    if not config:
+        raise ValueError(f"Generation config '{spec}' is empty.")
+    return config
+
+
+def parse_lora_modules(specs: list[str]) -> dict[str, str]:
+    """
+    Parse `NAME=PATH` LoRA adapter specs (the format of vLLM's `--lora-modules`) into a name to path mapping.
+    """
+    lora_modules = {}
+    for spec in specs:
+        name, separator, path = spec.partition("=")
+        if not separator or not name.strip() or not path.strip():
+            raise ValueError(f"Invalid LoRA module '{spec}'. Expected NAME=PATH.")
+        lora_modules[name.strip()] = path.strip()
+    return lora_modules
+
+
+def get_generation_config_label(config: dict) -> str:
+    if "name" in config:
+        label = config["name"]
+    else:
+        label = "-".join(
+            f"{key}_{config[key]}" for key in GENERATION_CONFIG_KEYS if key in config
+        )
+    # Used as a directory name
+    return re.sub(r"[^A-Za-z0-9_.\-]", "_", label)
+
+
+def validate_generation_configs(configs: list[dict], lora_modules: dict[str, str]) -> None:
+    labels = [get_generation_config_label(config) for config in configs]
+    duplicates = sorted({label for label in labels if labels.count(label) > 1})
+    if duplicates:
+        raise ValueError(
+            f"Several generation configs would write to the same result directory: {duplicates}. Give them distinct `name`s."
+        )
+    for config in configs:
+        if "lora" in config and config["lora"] not in lora_modules:
+            raise ValueError(
+                f"LoRA adapter '{config['lora']}' is not defined. Pass it with `--lora-modules {config['lora']}=PATH`."
+            )
+
+
+def apply_generation_config(args, config: dict):
+    """
+    Get a copy of the generation arguments for one generation config.
+    Without a config (`{}`), the results go to the result directory as usual; otherwise to its sub-directory named after the config.
+    """
+    config_args = copy(args)
+    config_args.temperature = config.get("temperature", args.temperature)
+    config_args.seed = config.get("seed")
+    config_args.lora_adapter = config.get("lora")
+    if config:
+        config_args.result_dir = Path(args.result_dir) / get_generation_config_label(config)
+    return config_args
@@ -0,0 +1,102 @@
+import json
+import os
+from functools import partial
+from pathlib import Path
+from typing import Iterable, Union
+
+# Preference order of the JSON backends; the first one that is installed is used
+JSON_BACKENDS = ["orjson", "msgspec", "json"]
+# Forces a backend, e.g. `json` to write the lines byte-for-byte as the standard library encoder does
+JSON_BACKEND_ENV_VAR = "BFCL_JSON_BACKEND"
+
+
+def _default(value):
+    """
+    Encoder hook for the values that JSON has no type for.
+    Subclasses of `float` (e.g. `np.float64`) are written as numbers, as the standard library does; anything else is written as its string form.
+    """
+    if isinstance(value, float):
+        return float(value)
+    return str(value)
+
+
+def _json_dumps(value) -> bytes:
+    return json.dumps(value, default=_default).encode("utf-8")
+
+
+def _load_backend(name: str):
+    if name == "orjson":
+        import orjson
+
+        option = orjson.OPT_NON_STR_KEYS
+        return orjson.loads, partial(orjson.dumps, default=_default, option=option)
+    if name == "msgspec":
+        import msgspec
+
+        return msgspec.json.decode, partial(msgspec.json.encode, enc_hook=_default)
+    if name == "json":
+        return json.loads, _json_dumps
+    raise ValueError(
+        f"Unknown JSON backend '{name}' in `{JSON_BACKEND_ENV_VAR}`. Expected one of {JSON_BACKENDS}."
+    )
+
+
+def _select_backend():
+    requested = os.getenv(JSON_BACKEND_ENV_VAR)
+    if requested:
+        return requested, *_load_backend(requested)
+    for name in JSON_BACKENDS:
+        try:
+            return name, *_load_backend(name)
+        except ImportError:
+            continue
+
+
+JSON_BACKEND, _backend_loads, _backend_dumps = _select_backend()
+
+
+def loads(data: Union[str, bytes]):
+    try:
+        return _backend_loads(data)
+    except ValueError:
+        # The standard library also accepts `NaN` and `Infinity`, which files written by older versions may contain
+        return json.loads(data)
+
+
+def dumps_bytes(value) -> bytes:
+    """
+    Serialize a value to a single line of UTF-8 JSON. Values that JSON can't represent are written as their string form.
+    """
+    try:
+        return _backend_dumps(value)
+    except Exception:
+        # e.g. integers beyond 64 bits, which only the standard library encodes
+        return _json_dumps(value)
+
+
+def dumps(value) -> str:
+    return dumps_bytes(value).decode("utf-8")
+
+
+def read_jsonl(file_path: Union[str, Path]) -> list:
+    with open(file_path, "rb") as f:
+        return [loads(line) for line in f if line.strip()]
+
+
+def read_first_jsonl_entry(file_path: Union[str, Path]):
+    """
+    Parse only the first entry of a JSONL file, e.g. the header of a score file.
+    """
+    with open(file_path, "rb") as f:
+        for line in f:
+            if line.strip():
+                return loads(line)
+    raise ValueError(f"{file_path} is empty.")
+
+
+def write_jsonl(file_path: Union[str, Path], entries: Iterable, append: bool = False) -> None:
+    """
+    Write one entry per line, each followed by a newline.
+    """
+    with open(file_path, "ab" if append else "wb") as f:
+        f.write(b"".join(dumps_bytes(entry) + b"\n" for entry in entries))
@@ -1,14 +1,33 @@
 import argparse
 import json
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from copy import deepcopy
 import traceback
-
+from functools import partial
+
+from bfcl_eval._batch_api import batch_inference, clear_batch_state
+from bfcl_eval._generation_config import (
+    apply_generation_config,
+    get_generation_config_label,
+    parse_generation_config,
+    parse_lora_modules,
+    validate_generation_configs,
+)
+from bfcl_eval._json_codec import write_jsonl
+from bfcl_eval._scheduling import (
+    EntryCostModel,
+    load_latency_history,
+    plan_longest_first,
+    report_makespan,
+)
+from bfcl_eval._work_queue import FileLeaseWorkQueue
 from bfcl_eval.constants.category_mapping import (
     MULTI_TURN_FUNC_DOC_FILE_MAPPING,
     TEST_FILE_MAPPING,
 )
+from bfcl_eval.constants.default_prompts import LOOP_DETECTION_REPEAT_LIMIT
 from bfcl_eval.constants.eval_config import (
     MULTI_TURN_FUNC_DOC_PATH,
     PROJECT_ROOT,
@@ -17,9 +36,32 @@ from bfcl_eval.constants.eval_config import (
     TEST_IDS_TO_GENERATE_PATH,
 )
 from bfcl_eval.eval_checker.eval_runner_helper import load_file
+from bfcl_eval.eval_checker.multi_turn_eval.multi_turn_utils import (
+    configure_isolated_execution,
+)
 from bfcl_eval.constants.model_config import MODEL_CONFIG_MAPPING
+from bfcl_eval.model_handler.http_transport import (
+    configure_connection_pools,
+    print_connection_stats,
+)
 from bfcl_eval.model_handler.model_style import ModelStyle
-from bfcl_eval.utils import is_multi_turn, parse_test_category_argument, sort_key
+from bfcl_eval.model_handler.request_hedging import (
+    DEFAULT_MAX_HEDGE_RATE,
+    configure_request_hedging,
+    print_hedging_stats,
+)
+from bfcl_eval.model_handler.turn_checkpoint import (
+    get_turn_checkpoint_dir,
+    has_turn_checkpoint,
+    remove_turn_checkpoint,
+)
+from bfcl_eval.utils import (
+    is_multi_turn,
+    parse_test_category_argument,
+    select_subset,
+    sort_key,
+    validate_subset_arguments,
+)
 from tqdm import tqdm
 
 RETRY_LIMIT = 3
@@ -45,6 +87,99 @@ def get_args():
     parser.add_argument("--result-dir", default=None, type=str)
     parser.add_argument("--run-ids", action="store_true", default=False)
     parser.add_argument("--allow-overwrite", "-o", action="store_true", default=False)
+    parser.add_argument(
+        "--work-queue",
+        action="store_true",
+        default=False,
+        help="Coordinate with other `generate` processes writing to the same result directory through a file-lock work queue.",
+    )
+    parser.add_argument(
+        "--worker-id",
+        type=str,
+        default=None,
+        help="Identifier of this worker in the work queue. Defaults to `<hostname>-<pid>`.",
+    )
+    parser.add_argument(
+        "--batch-api",
+        action="store_true",
+        default=False,
+        help="Generate the single-turn entries through the provider's asynchronous batch API (OpenAI and Anthropic models only).",
+    )
+    parser.add_argument(
+        "--isolated-execution",
+        action="store_true",
+        default=False,
+        help="Execute the multi-turn function calls in separate worker processes, with a per-call timeout and a memory limit.",
+    )
+    parser.add_argument(
+        "--execution-timeout",
+        type=float,
+        default=None,
+        help="Timeout in seconds for each function call under `--isolated-execution`.",
+    )
+    parser.add_argument(
+        "--loop-repeat-limit",
+        type=int,
+        default=LOOP_DETECTION_REPEAT_LIMIT,
+        help="End a multi-turn turn early once the model repeats the same step (or cycle of steps) this many times in a row, e.g. 3. Off (0) by default.",
+    )
+    parser.add_argument(
+        "--request-deadline",
+        type=float,
+        default=None,
+        help="Fail any model request that has not returned within this many seconds.",
+    )
+    parser.add_argument(
+        "--hedge-requests",
+        action="store_true",
+        default=False,
+        help="Send a duplicate of any model request still running after the p95 latency observed so far, and use whichever returns first.",
+    )
+    parser.add_argument(
+        "--max-hedge-rate",
+        type=float,
+        default=DEFAULT_MAX_HEDGE_RATE,
+        help="Maximum fraction of the requests that may be duplicated under `--hedge-requests`.",
+    )
+    parser.add_argument(
+        "--checkpoint-turns",
+        action="store_true",
+        default=False,
+        help="Checkpoint multi-turn entries after each turn, and resume failed or interrupted entries from their last completed turn.",
+    )
+    parser.add_argument(
+        "--num-samples",
+        type=int,
+        default=1,
+        help="Generate this many completions for each single-turn entry, for pass@k evaluation.",
+    )
+    parser.add_argument(
+        "--generation-config",
+        type=str,
+        action="append",
+        default=None,
+        help="A generation config like `temperature=0.7,seed=1,lora=NAME`; repeat the flag for several configs. Locally served models launch their server once for all of them. Each config writes to its own sub-directory of the result directory.",
+    )
+    parser.add_argument(
+        "--lora-modules",
+        type=str,
+        nargs="+",
+        default=None,
+        help="LoRA adapters to serve with vLLM, as NAME=PATH, for use in the `lora` key of `--generation-config`.",
+    )
+    parser.add_argument(
+        "--subset-fraction",
+        type=float,
+        default=None,
+        help="Only generate a stratified sample of this fraction of each test category.",
+    )
+    parser.add_argument(
+        "--subset-size",
+        type=int,
+        default=None,
+        help="Only generate a stratified sample of this many entries of each test category.",
+    )
+    parser.add_argument("--subset-seed", type=int, default=0, help="Seed of the subset sample.")
     # Add the new skip_vllm argument
     parser.add_argument(
         "--skip-server-setup",
@@ -111,6 +246,7 @@ def collect_test_cases(
 ):
     model_name_dir = model_name.replace("/", "_")
     model_result_dir = args.result_dir / model_name_dir
+    checkpoint_dir = get_turn_checkpoint_dir(args.result_dir, model_name)
 
     existing_result = []
     for test_category, file_to_open in zip(all_test_categories, all_test_file_paths):
@@ -119,7 +255,12 @@ def collect_test_cases(
         if result_file_path.exists():
             # Not allowing overwrite, we will load the existing results
             if not args.allow_overwrite:
-                existing_result.extend(load_file(result_file_path))
+                file_results = load_file(result_file_path)
+                if args.checkpoint_turns:
+                    file_results = drop_resumable_results(
+                        result_file_path, file_results, checkpoint_dir
+                    )
+                existing_result.extend(file_results)
             # Allow overwrite and not running specific test ids, we will delete the existing result file before generating new results
             elif not args.run_ids:
                 result_file_path.unlink()
@@ -136,9 +277,37 @@ def collect_test_cases(
     ]
     test_cases_to_generate = process_multi_turn_test_case(test_cases_to_generate)
 
+    if args.checkpoint_turns and args.allow_overwrite:
+        # Overwriting means starting over, not resuming from an earlier run
+        for test_case in test_cases_to_generate:
+            remove_turn_checkpoint(checkpoint_dir, test_case["id"])
+
     return sorted(test_cases_to_generate, key=sort_key)
 
 
+def drop_resumable_results(result_file_path, file_results, checkpoint_dir):
+    """
+    Remove the failed multi-turn entries that have a turn checkpoint from the result file, so that they are generated again, starting after their last completed turn.
+    """
+    resumable_ids = {
+        entry["id"]
+        for entry in file_results
+        if is_multi_turn(entry["id"])
+        and isinstance(entry["result"], str)
+        and entry["result"].startswith("Error during inference")
+        and has_turn_checkpoint(checkpoint_dir, entry["id"])
+    }
+    if not resumable_ids:
+        return file_results
+
+    print(
+        f"Resuming {len(resumable_ids)} failed multi-turn entries in {result_file_path.name} from their last completed turn."
+    )
+    file_results = [entry for entry in file_results if entry["id"] not in resumable_ids]
+    write_jsonl(result_file_path, file_results)
+    return file_results
+
+
 def process_multi_turn_test_case(test_cases):
     """
     Multi-turn test cases don't have the function doc in the prompt. We need to add them here.
@@ -224,9 +393,75 @@ def multi_threaded_inference(handler, test_case, include_input_log, exclude_stat
     return result_to_write
 
 
-def generate_results(args, model_name, test_cases_total):
+@contextmanager
+def shared_model_server(args, model_name, has_several_runs: bool):
+    """
+    Launch the server of a locally served model once for all its generation configs, instead of once per config.
+    Yields whether the server was launched here.
+    """
+    if not has_several_runs or args.skip_server_setup:
+        yield False
+        return
+    handler = build_handler(model_name, args.temperature)
+    if handler.model_style != ModelStyle.OSSMODEL:
+        yield False
+        return
+    with handler.serve(
+        num_gpus=args.num_gpus,
+        gpu_memory_utilization=args.gpu_memory_utilization,
+        backend=args.backend,
+        local_model_path=args.local_model_path,
+        lora_modules=args.lora_modules,
+    ):
+        yield True
+
+
+def generate_results(args, model_name, test_cases_total, latency_history):
     update_mode = args.allow_overwrite
+    # The handler's API client takes its connection pool from the shared registry, so size it before building the handler
+    configure_connection_pools(args.num_threads)
     handler = build_handler(model_name, args.temperature)
+    handler.loop_repeat_limit = args.loop_repeat_limit
+    handler.num_samples = args.num_samples
+    handler.seed = args.seed
+    if args.seed is not None and not handler.sends_seed():
+        # Otherwise every seed of a sweep would silently be a repeat of the same run
+        raise ValueError(
+            f"The handler of {model_name} does not send a sampling seed, so the generation config `seed={args.seed}` would have no effect."
+        )
+    if handler.model_style == ModelStyle.OSSMODEL:
+        handler.lora_adapter = args.lora_adapter
+    elif args.lora_adapter is not None:
+        raise ValueError(
+            f"LoRA adapters are only supported for locally served models, not {model_name}."
+        )
+    if args.checkpoint_turns:
+        handler.checkpoint_dir = get_turn_checkpoint_dir(args.result_dir, model_name)
+
+    if args.batch_api and args.num_samples > 1:
+        print("❗️ --batch-api does not support --num-samples. Falling back to normal inference.")
+    elif args.batch_api:
+        # Single-turn entries are independent requests, so they can go through the provider's batch API
+        batch_state_dir = args.result_dir / model_name.replace("/", "_")
+        batch_results, test_cases_total = batch_inference(
+            handler, test_cases_total, args.include_input_log, batch_state_dir
+        )
+        if batch_results:
+            handler.write(batch_results, result_dir=args.result_dir, update_mode=args.run_ids)
+        clear_batch_state(batch_state_dir)
+        if len(test_cases_total) == 0:
+            return
+
+    work_queue = None
+    if args.work_queue:
+        work_queue = FileLeaseWorkQueue(
+            args.result_dir / model_name.replace("/", "_"),
+            test_cases_total,
+            worker_id=args.worker_id,
+        )
+        print(f"Joining work queue {work_queue.queue_dir} as worker {work_queue.worker_id}.")
+
+    cost_model = EntryCostModel(model_name, test_cases_total, latency_history)
 
     if handler.model_style == ModelStyle.OSSMODEL:
         # batch_inference will handle the writing of results
@@ -241,16 +476,40 @@ def generate_results(args, model_name, test_cases_total):
             exclude_state_log=args.exclude_state_log,
             result_dir=args.result_dir,
             update_mode=update_mode,
+            work_queue=work_queue,
+            cost_model=cost_model,
+            lora_modules=args.lora_modules,
+        )
+
+    elif work_queue is not None:
+        # The work queue writes the results to per-worker journals, which are merged into the result files once all entries are done
+        work_queue.run(
+            partial(
+                multi_threaded_inference,
+                handler,
+                include_input_log=args.include_input_log,
+                exclude_state_log=args.exclude_state_log,
+            ),
+            num_threads=args.num_threads,
+            desc=f"Generating results for {model_name}",
         )
+        work_queue.merge(handler, args.result_dir)
 
     else:
-        futures = []
-        with ThreadPoolExecutor(max_workers=args.num_threads) as executor:
+        # Submit the slowest entries first, so that the run doesn't end waiting on a few stragglers
+        submission_order, predicted_makespan, original_makespan = plan_longest_first(
+            test_cases_total, cost_model, args.num_threads
+        )
+        start_time = time.time()
+        futures = {}
+        with ThreadPoolExecutor(
+            max_workers=args.num_threads, thread_name_prefix="bfcl-inference"
+        ) as executor:
             with tqdm(
                 total=len(test_cases_total), desc=f"Generating results for {model_name}"
             ) as pbar:
 
-                for test_case in test_cases_total:
+                for test_case in submission_order:
                     future = executor.submit(
                         multi_threaded_inference,
                         handler,
@@ -258,16 +517,21 @@ def generate_results(args, model_name, test_cases_total):
                         args.include_input_log,
                         args.exclude_state_log,
                     )
-                    futures.append(future)
+                    futures[test_case["id"]] = future
 
-                for future in futures:
-                    # This will wait for the task to complete, so that we are always writing in order
-                    result = future.result()
+                # Written as they complete, so that a crash loses as few results as possible
+                for future in as_completed(futures.values()):
                     handler.write(
-                        result, result_dir=args.result_dir, update_mode=args.run_ids
+                        future.result(), result_dir=args.result_dir, update_mode=args.run_ids
                     )  # Only when we run specific test ids, we will need update_mode=True to keep entries in the same order
                     pbar.update()
 
+        if not args.run_ids:
+            handler.sort_result_files(args.result_dir, test_cases_total)
+        report_makespan(
+            predicted_makespan, original_makespan, time.time() - start_time
+        )
+
 
 def main(args):
 
@@ -289,9 +553,26 @@ def main(args):
                         "• For officially supported models, please refer to `SUPPORTED_MODELS.md`.\n"
                         "• For running new models, please refer to `README.md` and `CONTRIBUTING.md`."
                     )
+    if args.num_samples < 1:
+        raise ValueError(f"--num-samples must be at least 1, got {args.num_samples}.")
+    is_subset = args.subset_fraction is not None or args.subset_size is not None
+    if is_subset:
+        validate_subset_arguments(args.subset_fraction, args.subset_size)
+        if args.run_ids:
+            raise ValueError("`--subset-fraction` and `--subset-size` can't be used with `--run-ids`.")
+        all_test_entries_involved = select_subset(
+            all_test_entries_involved,
+            args.subset_fraction,
+            args.subset_size,
+            args.subset_seed,
+        )
     print(f"Generating results for {args.model}")
     if args.run_ids:
         print("Running specific test cases. Ignoring `--test-category` argument.")
+    elif is_subset:
+        print(
+            f"Running a stratified subset of {len(all_test_entries_involved)} test cases for categories: {all_test_categories}."
+        )
     else:
         print(f"Running full test cases for categories: {all_test_categories}.")
 
@@ -300,18 +581,67 @@ def main(args):
     else:
         args.result_dir = RESULT_PATH
 
-    for model_name in args.model:
-        test_cases_total = collect_test_cases(
-            args,
-            model_name,
-            all_test_categories,
-            all_test_file_paths,
-            all_test_entries_involved,
-        )
+    if args.isolated_execution:
+        configure_isolated_execution(True, args.execution_timeout)
+    configure_request_hedging(
+        args.request_deadline, args.hedge_requests, args.max_hedge_rate
+    )
 
-        if len(test_cases_total) == 0:
-            print(
-                f"All selected test cases have been previously generated for {model_name}. No new test cases to generate."
-            )
-        else:
-            generate_results(args, model_name, test_cases_total)
+    # Without any `--generation-config`, a single run with the plain arguments
+    generation_configs = [
+        parse_generation_config(spec) for spec in args.generation_config or []
+    ] or [{}]
+    args.lora_modules = parse_lora_modules(args.lora_modules or [])
+    validate_generation_configs(generation_configs, args.lora_modules)
+
+    # Read before `collect_test_cases`, which deletes the result files that are going to be regenerated
+    latency_histories = [
+        load_latency_history(apply_generation_config(args, config).result_dir)
+        for config in generation_configs
+    ]
+
+    try:
+        for model_name in args.model:
+            config_runs = []
+            for config, latency_history in zip(generation_configs, latency_histories):
+                config_args = apply_generation_config(args, config)
+                test_cases_total = collect_test_cases(
+                    config_args,
+                    model_name,
+                    all_test_categories,
+                    all_test_file_paths,
+                    all_test_entries_involved,
+                )
+
+                config_description = (
+                    f" with generation config {get_generation_config_label(config)}"
+                    if config
+                    else ""
+                )
+                if len(test_cases_total) == 0:
+                    print(
+                        f"All selected test cases have been previously generated for {model_name}{config_description}. No new test cases to generate."
+                    )
+                else:
+                    config_runs.append(
+                        (config_args, config_description, test_cases_total, latency_history)
+                    )
+
+            with shared_model_server(args, model_name, len(config_runs) > 1) as is_shared:
+                for config_args, config_description, test_cases_total, latency_history in config_runs:
+                    if config_description:
+                        print(
+                            f"⚙️ Generating {model_name}{config_description} into {config_args.result_dir}"
+                        )
+                    if is_shared:
+                        # Already launched for all the configs
+                        config_args.skip_server_setup = True
+                    generate_results(
+                        config_args, model_name, test_cases_total, latency_history
+                    )
+
+        print_connection_stats()
+        print_hedging_stats()
+    finally:
+        if args.isolated_execution:
+            configure_isolated_execution(False)
@@ -0,0 +1,555 @@
+"""
+A local stand-in for an OpenAI-compatible inference server (vLLM, SGLang or the OpenAI API), for load-testing `bfcl generate` without network access or GPUs.
+
+Serves `/v1/models`, `/v1/completions` and `/v1/chat/completions` (with tool calls), with a configurable latency distribution and injected errors.
+`/v1/files` and `/v1/batches` run the chat and text completions of the OpenAI Batch API, for testing `--batch-api`; the batches are processed in the background as soon as they are created.
+Replies are replayed from an existing model result folder when `--replay-dir` is given, and are trivial otherwise.
+
+    python -m bfcl_eval._mock_server --port 1053 --latency lognormal:0.5:0.6 --rate-limit-rate 0.01
+"""
+
+import argparse
+import email.parser
+import email.policy
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Optional
+
+from bfcl_eval.constants.category_mapping import TEST_FILE_MAPPING
+from bfcl_eval.constants.default_prompts import (
+    DEFAULT_USER_PROMPT_FOR_ADDITIONAL_FUNCTION_FC,
+)
+from bfcl_eval.constants.eval_config import PROMPT_PATH, VLLM_PORT
+from bfcl_eval.utils import is_multi_turn, load_file
+
+CHARS_PER_TOKEN = 4
+MOCK_MODEL_ID = "bfcl-mock"
+
+
+def parse_latency_distribution(spec: str) -> Callable[[], float]:
+    """
+    Parse a latency distribution, in seconds, given as `fixed:S`, `uniform:LOW:HIGH`, `exponential:MEAN` or `lognormal:MEDIAN:SIGMA`.
+    """
+    name, *params = spec.split(":")
+    try:
+        params = [float(param) for param in params]
+    except ValueError:
+        raise ValueError(f"Invalid latency distribution: {spec}")
+
+    if name == "fixed" and len(params) == 1:
+        return lambda: params[0]
+    if name == "uniform" and len(params) == 2:
+        return lambda: random.uniform(params[0], params[1])
+    if name == "exponential" and len(params) == 1:
+        return lambda: random.expovariate(1 / params[0]) if params[0] > 0 else 0.0
+    if name == "lognormal" and len(params) == 2:
+        return lambda: random.lognormvariate(math.log(params[0]), params[1])
+    raise ValueError(
+        f"Invalid latency distribution: {spec}. Expected one of fixed:S, uniform:LOW:HIGH, exponential:MEAN, lognormal:MEDIAN:SIGMA."
+    )
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        # Content blocks
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return content or ""
+
+
+class ReplayBook:
+    """
+    The responses of a previous run, looked up by the request they answer.
+
+    The entry is found from the text of its first user message, the turn from the number of turn-opening user messages in the request, and the step from the number of model replies since the last of them.
+    Entries with the same first question (e.g. the same scenario in `multi_turn_base` and `multi_turn_long_context`) share their replies.
+    """
+
+    def __init__(self, result_dir: Path) -> None:
+        self.responses: dict[str, any] = {}
+        # First user message of the entry -> entry id
+        self.entry_by_question: dict[str, str] = {}
+        # Entry id -> the text of the first user message of each turn (empty for the turns that only add functions)
+        self.turn_questions: dict[str, list[str]] = {}
+
+        for test_file in sorted(set(TEST_FILE_MAPPING.values())):
+            result_file = result_dir / test_file.replace(".json", "_result.json")
+            if not result_file.exists():
+                continue
+            for result in load_file(result_file):
+                if isinstance(result["result"], str) and result["result"].startswith(
+                    "Error during inference"
+                ):
+                    continue
+                self.responses[result["id"]] = result["result"]
+
+            for test_entry in load_file(PROMPT_PATH / test_file):
+                if test_entry["id"] not in self.responses:
+                    continue
+                turn_questions = [
+                    next(
+                        (_message_text(m) for m in turn if m["role"] == "user"), ""
+                    )
+                    for turn in test_entry["question"]
+                ]
+                if not turn_questions or not turn_questions[0]:
+                    continue
+                self.turn_questions[test_entry["id"]] = turn_questions
+                self.entry_by_question.setdefault(turn_questions[0], test_entry["id"])
+
+    def __len__(self) -> int:
+        return len(self.responses)
+
+    def _lookup(self, entry_id: str, turn_idx: int, step_idx: int):
+        response = self.responses[entry_id]
+        if not is_multi_turn(entry_id):
+            return response if turn_idx == 0 and step_idx == 0 else None
+        if turn_idx >= len(response) or step_idx >= len(response[turn_idx]):
+            return None
+        return response[turn_idx][step_idx]
+
+    def _is_turn_opening(self, text: str, entry_id: str) -> bool:
+        return text in self.turn_questions[entry_id] or text.endswith(
+            DEFAULT_USER_PROMPT_FOR_ADDITIONAL_FUNCTION_FC
+        )
+
+    def for_chat(self, messages: list[dict]):
+        """
+        Get the recorded response for a chat request, or `None` if there is none.
+        """
+        first_user_text = next(
+            (_message_text(m) for m in messages if m.get("role") == "user"), None
+        )
+        entry_id = self.entry_by_question.get(first_user_text)
+        if entry_id is None:
+            return None
+
+        turn_idx, step_idx = -1, 0
+        for message in messages:
+            if message.get("role") == "user" and self._is_turn_opening(
+                _message_text(message), entry_id
+            ):
+                turn_idx += 1
+                step_idx = 0
+            elif message.get("role") == "assistant":
+                step_idx += 1
+        return self._lookup(entry_id, max(turn_idx, 0), step_idx)
+
+    def for_prompt(self, prompt: str):
+        """
+        Get the recorded response for a completion request, whose messages have already been formatted into one prompt.
+        """
+        entry_id = next(
+            (
+                entry_id
+                for question, entry_id in self.entry_by_question.items()
+                if question in prompt
+            ),
+            None,
+        )
+        if entry_id is None:
+            return None
+        if not is_multi_turn(entry_id):
+            return self._lookup(entry_id, 0, 0)
+
+        turn_questions = self.turn_questions[entry_id]
+        turn_idx, turn_start = 0, 0
+        for idx, question in enumerate(turn_questions):
+            if not question:
+                # A turn that only adds functions opens with the default prompt
+                position = prompt.find(DEFAULT_USER_PROMPT_FOR_ADDITIONAL_FUNCTION_FC, turn_start)
+            else:
+                position = prompt.find(question, turn_start)
+            if position == -1:
+                break
+            turn_idx, turn_start = idx, position
+
+        # The earlier replies of this turn appear in order after its question
+        step_idx, position = 0, turn_start
+        recorded_turns = self.responses[entry_id]
+        for step_response in recorded_turns[turn_idx] if turn_idx < len(recorded_turns) else []:
+            position = prompt.find(_as_text(step_response), position)
+            if position == -1:
+                break
+            step_idx += 1
+        return self._lookup(entry_id, turn_idx, step_idx)
+
+
+def _as_text(response) -> str:
+    # Recorded function calls, as a prompting model would write them
+    if isinstance(response, str):
+        return response
+    calls = []
+    for call in response:
+        if isinstance(call, dict):
+            for name, arguments in call.items():
+                if isinstance(arguments, str):
+                    try:
+                        arguments = json.loads(arguments)
+                    except json.JSONDecodeError:
+                        arguments = {}
+                calls.append(
+                    f"{name}({', '.join(f'{k}={v!r}' for k, v in arguments.items())})"
+                )
+        else:
+            calls.append(str(call))
+    return f"[{', '.join(calls)}]"
+
+
+def _as_tool_calls(response) -> Optional[list[dict]]:
+    if isinstance(response, str):
+        return None
+    tool_calls = []
+    for call in response:
+        if not isinstance(call, dict):
+            return None
+        for name, arguments in call.items():
+            tool_calls.append(
+                {
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {
+                        "name": name,
+                        "arguments": arguments if isinstance(arguments, str) else json.dumps(arguments),
+                    },
+                }
+            )
+    return tool_calls
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int,
+        latency: Callable[[], float],
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        replay_book: Optional[ReplayBook] = None,
+        host: str = "127.0.0.1",
+    ) -> None:
+        super().__init__((host, port), _MockRequestHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.replay_book = replay_book
+        self.stats = {"requests": 0, "replayed": 0, "errors": 0, "rate_limited": 0}
+        self.stats_lock = threading.Lock()
+        # The uploaded and generated files (file id -> content) and the batches (batch id -> batch object) of the Batch API
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict] = {}
+
+    def count(self, key: str) -> None:
+        with self.stats_lock:
+            self.stats[key] += 1
+
+
+class _MockRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real servers
+    protocol_version = "HTTP/1.1"
+    server: MockServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: Optional[dict] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_bytes(self, data: bytes) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        parts = self.path.split("?", 1)[0].rstrip("/").split("/")
+        if len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+            content = self.server.files.get(parts[-2])
+            if content is None:
+                self._send_json(404, {"error": {"message": f"No file {parts[-2]}"}})
+            else:
+                self._send_bytes(content)
+        elif len(parts) >= 2 and parts[-2] == "batches":
+            batch = self.server.batches.get(parts[-1])
+            if batch is None:
+                self._send_json(404, {"error": {"message": f"No batch {parts[-1]}"}})
+            else:
+                self._send_json(200, batch)
+        elif self.path.rstrip("/").endswith("/models"):
+            self._send_json(
+                200,
+                {
+                    "object": "list",
+                    "data": [{"id": MOCK_MODEL_ID, "object": "model", "owned_by": "bfcl"}],
+                },
+            )
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        path = self.path.rstrip("/")
+        if path.endswith("/files"):
+            self._create_file(body)
+            return
+        request = json.loads(body or b"{}")
+        if path.endswith("/batches"):
+            self._create_batch(request)
+            return
+        if not (path.endswith("/chat/completions") or path.endswith("/completions")):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        server = self.server
+        server.count("requests")
+        time.sleep(max(server.latency(), 0.0))
+
+        roll = random.random()
+        if roll < server.rate_limit_rate:
+            server.count("rate_limited")
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (injected by the mock server).", "type": "rate_limit_error"}},
+                headers={"Retry-After": "1"},
+            )
+            return
+        if roll < server.rate_limit_rate + server.error_rate:
+            server.count("errors")
+            self._send_json(
+                500,
+                {"error": {"message": "Internal server error (injected by the mock server).", "type": "server_error"}},
+            )
+            return
+
+        if path.endswith("/chat/completions"):
+            self._send_json(200, self._chat_completion(request))
+        else:
+            self._send_json(200, self._completion(request))
+
+    def _create_file(self, body: bytes) -> None:
+        # The SDK uploads the file as multipart form data
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8") + body
+        )
+        content = next(
+            (
+                part.get_payload(decode=True)
+                for part in message.iter_parts()
+                if part.get_param("name", header="content-disposition") == "file"
+            ),
+            None,
+        )
+        if content is None:
+            self._send_json(400, {"error": {"message": "No file in the upload."}})
+            return
+        file_id = f"file-{uuid.uuid4().hex}"
+        self.server.files[file_id] = content
+        self._send_json(
+            200,
+            {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(content),
+                "created_at": int(time.time()),
+                "filename": "batch_input.jsonl",
+                "purpose": "batch",
+            },
+        )
+
+    def _create_batch(self, request: dict) -> None:
+        if request.get("input_file_id") not in self.server.files:
+            self._send_json(404, {"error": {"message": f"No file {request.get('input_file_id')}"}})
+            return
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex}",
+            "object": "batch",
+            "endpoint": request.get("endpoint"),
+            "input_file_id": request["input_file_id"],
+            "completion_window": request.get("completion_window", "24h"),
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        self.server.batches[batch["id"]] = batch
+        threading.Thread(target=self._run_batch, args=(batch,), daemon=True).start()
+        self._send_json(200, batch)
+
+    def _run_batch(self, batch: dict) -> None:
+        output_lines = []
+        for line in self.server.files[batch["input_file_id"]].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            batch_request = json.loads(line)
+            self.server.count("requests")
+            url = batch_request.get("url", "").rstrip("/")
+            if url.endswith("/chat/completions"):
+                status_code, body = 200, self._chat_completion(batch_request["body"])
+            elif url.endswith("/completions"):
+                status_code, body = 200, self._completion(batch_request["body"])
+            else:
+                status_code, body = 404, {"error": {"message": f"Unknown path {url}"}}
+            output_lines.append(
+                json.dumps(
+                    {
+                        "id": f"batch_req_{uuid.uuid4().hex}",
+                        "custom_id": batch_request.get("custom_id"),
+                        "response": {"status_code": status_code, "body": body},
+                        "error": None,
+                    }
+                )
+            )
+            batch["request_counts"]["total"] += 1
+            batch["request_counts"]["completed" if status_code == 200 else "failed"] += 1
+
+        output_file_id = f"file-{uuid.uuid4().hex}"
+        self.server.files[output_file_id] = "\n".join(output_lines).encode("utf-8")
+        batch["output_file_id"] = output_file_id
+        batch["status"] = "completed"
+
+    def _usage(self, prompt_chars: int, completion_text: str, num_choices: int) -> dict:
+        prompt_tokens = prompt_chars // CHARS_PER_TOKEN
+        completion_tokens = (len(completion_text) // CHARS_PER_TOKEN + 1) * num_choices
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _chat_completion(self, request: dict) -> dict:
+        messages = request.get("messages", [])
+        tools = request.get("tools") or []
+        # Several completions of the same request (`n`) are identical, the mock server being deterministic
+        num_choices = request.get("n") or 1
+
+        recorded = None
+        if self.server.replay_book is not None:
+            recorded = self.server.replay_book.for_chat(messages)
+            if recorded is not None:
+                self.server.count("replayed")
+
+        message = {"role": "assistant", "content": None}
+        tool_calls = None
+        if recorded is not None:
+            tool_calls = _as_tool_calls(recorded) if tools else None
+            if tool_calls is None:
+                message["content"] = _as_text(recorded)
+        elif tools and messages and messages[-1].get("role") not in ("tool", "function"):
+            # Call the first tool once, then stop
+            tool_calls = _as_tool_calls([{tools[0]["function"]["name"]: "{}"}])
+        else:
+            message["content"] = "[]" if not tools else "Done."
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", MOCK_MODEL_ID),
+            "choices": [
+                {
+                    "index": index,
+                    "message": message,
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                    "logprobs": None,
+                }
+                for index in range(num_choices)
+            ],
+            "usage": self._usage(
+                len(json.dumps(messages)) + len(json.dumps(tools)),
+                json.dumps(tool_calls) if tool_calls else message["content"],
+                num_choices,
+            ),
+        }
+
+    def _completion(self, request: dict) -> dict:
+        prompt = request.get("prompt", "")
+        num_choices = request.get("n") or 1
+        if isinstance(prompt, list):
+            prompt = "".join(str(p) for p in prompt)
+
+        text = "[]"
+        if self.server.replay_book is not None:
+            recorded = self.server.replay_book.for_prompt(prompt)
+            if recorded is not None:
+                self.server.count("replayed")
+                text = _as_text(recorded)
+
+        return {
+            "id": f"cmpl-{uuid.uuid4().hex}",
+            "object": "text_completion",
+            "created": int(time.time()),
+            "model": request.get("model", MOCK_MODEL_ID),
+            "choices": [
+                {"index": index, "text": text, "finish_reason": "stop", "logprobs": None}
+                for index in range(num_choices)
+            ],
+            "usage": self._usage(len(prompt), text, num_choices),
+        }
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock inference server for load-testing `bfcl generate`.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(VLLM_PORT))
+    parser.add_argument(
+        "--latency",
+        type=str,
+        default="fixed:0",
+        help="Latency distribution of each response, in seconds: fixed:S, uniform:LOW:HIGH, exponential:MEAN or lognormal:MEDIAN:SIGMA.",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500 error.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429 error.")
+    parser.add_argument(
+        "--replay-dir",
+        type=str,
+        default=None,
+        help="A model result folder (e.g. result/gpt-4o-2024-11-20-FC) whose responses are replayed.",
+    )
+    return parser.parse_args()
+
+
+def main(args) -> None:
+    replay_book = None
+    if args.replay_dir is not None:
+        replay_book = ReplayBook(Path(args.replay_dir))
+        print(f"Loaded {len(replay_book)} recorded responses from {args.replay_dir}.")
+
+    server = MockServer(
+        args.port,
+        parse_latency_distribution(args.latency),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        replay_book=replay_book,
+        host=args.host,
+    )
+    print(f"Mock server listening on http://{args.host}:{server.server_address[1]}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.stats}")
+
+
+if __name__ == "__main__":
+    main(get_args())
@@ -0,0 +1,327 @@
+"""
+A low-overhead sampling profiler for `bfcl --profile <command>`.
+
+A background thread samples the Python stack of every other thread at a fixed interval, so the profile covers wall-clock time, including the time threads spend waiting on the network or on locks.
+Each run writes the samples as collapsed stacks (one `thread;frame;...;frame count` line per distinct stack, the format of py-spy and flamegraph.pl), and a self-contained flamegraph HTML page.
+"""
+
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from tabulate import tabulate
+
+DEFAULT_SAMPLING_INTERVAL = 0.005  # seconds
+
+# Which samples are kept: those with a frame matching the scope, with their stack starting at the outermost such frame
+PROFILE_SCOPES = ["all", "checkers", "simulator"]
+
+
+def _is_checker_frame(file_name: str, function_name: str) -> bool:
+    return "/eval_checker/" in file_name and (
+        "/ast_eval/" in file_name
+        or file_name.endswith("/multi_turn_checker.py")
+        or function_name.startswith("_check_")
+    )
+
+
+def _is_simulator_frame(file_name: str, function_name: str) -> bool:
+    return "/func_source_code/" in file_name or function_name == "execute_multi_turn_func_call"
+
+
+# What the named threads of bfcl do, by thread group
+THREAD_ROLES = {
+    "MainThread": "main (writes the results in `generate`)",
+    "bfcl-inference": "inference workers",
+    "bfcl-hedged-request": "hedged requests",
+    "bfcl-work-queue-heartbeat": "work queue heartbeat",
+}
+
+_SCOPE_MATCHERS = {
+    "checkers": _is_checker_frame,
+    "simulator": _is_simulator_frame,
+}
+
+
+def _get_frame_label(code) -> str:
+    file_name = code.co_filename.replace("\\", "/")
+    for marker in ("/bfcl_eval/", "/site-packages/"):
+        if marker in file_name:
+            file_name = file_name.rsplit(marker, 1)[1]
+            if marker == "/bfcl_eval/":
+                file_name = "bfcl_eval/" + file_name
+            break
+    else:
+        file_name = file_name.rsplit("/", 1)[-1]
+    # `;` separates the frames in the collapsed format
+    return f"{code.co_name} ({file_name}:{code.co_firstlineno})".replace(";", ":")
+
+
+def get_thread_group(thread_name: str) -> str:
+    """
+    Group the threads of a pool under one name, e.g. `bfcl-inference_3` under `bfcl-inference`.
+    """
+    return re.sub(r"([_-]\d+)+(\s*\(.*\))?$", "", thread_name) or thread_name
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = DEFAULT_SAMPLING_INTERVAL, scope: str = "all"):
+        if scope not in PROFILE_SCOPES:
+            raise ValueError(f"Unknown profile scope '{scope}'. Expected one of {PROFILE_SCOPES}.")
+        self.interval = interval
+        self.scope = scope
+        # (thread name, code objects from the outermost frame) -> number of samples
+        self._samples: Counter = Counter()
+        self._num_samples = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_time = None
+        self._duration = 0.0
+
+    def start(self) -> None:
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="bfcl-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._duration = time.perf_counter() - self._start_time
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                thread_name = thread_names.get(thread_id, f"thread-{thread_id}")
+                self._samples[(thread_name, tuple(stack))] += 1
+            self._num_samples += 1
+
+    def get_collapsed_stacks(self) -> Counter:
+        """
+        The samples as `thread;frame;...;frame` -> count, restricted to the profile scope.
+        """
+        matcher = _SCOPE_MATCHERS.get(self.scope)
+        labels = {}
+        collapsed = Counter()
+        for (thread_name, stack), count in self._samples.items():
+            if matcher is not None:
+                start = next(
+                    (
+                        i
+                        for i, code in enumerate(stack)
+                        if matcher(code.co_filename.replace("\\", "/"), code.co_name)
+                    ),
+                    None,
+                )
+                if start is None:
+                    continue
+                stack = stack[start:]
+            frames = [thread_name.replace(";", ":")]
+            for code in stack:
+                if code not in labels:
+                    labels[code] = _get_frame_label(code)
+                frames.append(labels[code])
+            collapsed[";".join(frames)] += count
+        return collapsed
+
+    def write(self, output_dir: Path, run_name: str) -> tuple[Path, Path]:
+        """
+        Write the collapsed stacks and the flamegraph of the run, and print where the time went.
+        """
+        collapsed = self.get_collapsed_stacks()
+        output_dir.mkdir(parents=True, exist_ok=True)
+        collapsed_path = output_dir / f"{run_name}.collapsed"
+        with open(collapsed_path, "w") as f:
+            for stack, count in sorted(collapsed.items()):
+                f.write(f"{stack} {count}\n")
+        html_path = output_dir / f"{run_name}.html"
+        html_path.write_text(_render_flamegraph(collapsed, run_name))
+
+        self._print_summary(collapsed)
+        print(f"🔥 Profile written to {collapsed_path} and {html_path}.")
+        return collapsed_path, html_path
+
+    def _print_summary(self, collapsed: Counter) -> None:
+        total = sum(collapsed.values())
+        scope = "" if self.scope == "all" else f", {self.scope} only"
+        print(
+            f"\n🔥 Profiled {self._duration:.1f}s: {self._num_samples} samples every {self.interval * 1000:g}ms{scope}."
+        )
+        if total == 0:
+            print("No sample in the profile scope.")
+            return
+
+        # Wall-clock samples per group of threads; a thread blocked on I/O still counts
+        thread_samples = Counter()
+        thread_counts = {}
+        self_samples = Counter()
+        for stack, count in collapsed.items():
+            thread_name, *frames = stack.split(";")
+            group = get_thread_group(thread_name)
+            thread_samples[group] += count
+            thread_counts.setdefault(group, set()).add(thread_name)
+            self_samples[frames[-1] if frames else thread_name] += count
+        print(
+            tabulate(
+                [
+                    [
+                        group,
+                        THREAD_ROLES.get(group, ""),
+                        len(thread_counts[group]),
+                        count,
+                        f"{count / total:.1%}",
+                    ]
+                    for group, count in thread_samples.most_common()
+                ],
+                headers=["Threads", "Role", "Count", "Samples", "Share"],
+            )
+        )
+        print()
+        print(
+            tabulate(
+                [
+                    [label, count, f"{count / total:.1%}"]
+                    for label, count in self_samples.most_common(10)
+                ],
+                headers=["Top frames (self)", "Samples", "Share"],
+            )
+        )
+
+
+def _build_tree(collapsed: Counter) -> dict:
+    root = {"name": "all", "value": 0, "children": {}}
+    for stack, count in collapsed.items():
+        root["value"] += count
+        node = root
+        for frame in stack.split(";"):
+            child = node["children"].get(frame)
+            if child is None:
+                child = node["children"][frame] = {"name": frame, "value": 0, "children": {}}
+            child["value"] += count
+            node = child
+
+    def to_list(node):
+        return {
+            "name": node["name"],
+            "value": node["value"],
+            "children": sorted(
+                (to_list(child) for child in node["children"].values()),
+                key=lambda child: -child["value"],
+            ),
+        }
+
+    return to_list(root)
+
+
+def _render_flamegraph(collapsed: Counter, title: str) -> str:
+    tree = json.dumps(_build_tree(collapsed)).replace("</", "<\\/")
+    return _FLAMEGRAPH_TEMPLATE.replace("__TITLE__", title).replace("__TREE__", tree)
+
+
+_FLAMEGRAPH_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+  body { font: 12px sans-serif; margin: 12px; }
+  #graph { position: relative; width: 100%; }
+  .frame { position: absolute; height: 17px; box-sizing: border-box; border: 1px solid #fff;
+           overflow: hidden; white-space: nowrap; padding-left: 3px; line-height: 15px; cursor: pointer; }
+  .frame:hover { border-color: #000; }
+  #info { height: 18px; margin: 6px 0; font-family: monospace; }
+</style>
+</head>
+<body>
+<b>__TITLE__</b> &mdash; click a frame to zoom in, click the root to zoom out.
+<div id="info"></div>
+<div id="graph"></div>
+<script>
+const tree = __TREE__;
+const graph = document.getElementById("graph");
+const info = document.getElementById("info");
+const ROW = 17;
+
+function color(name) {
+  let hash = 0;
+  for (const c of name) hash = (hash * 31 + c.charCodeAt(0)) | 0;
+  const thread = name.indexOf(" (") < 0;
+  return thread ? "hsl(210, 60%, 75%)" : `hsl(${20 + Math.abs(hash) % 40}, 85%, ${55 + Math.abs(hash >> 8) % 20}%)`;
+}
+
+function depthOf(node) {
+  return 1 + Math.max(0, ...node.children.map(depthOf));
+}
+
+function render(focus, path) {
+  graph.innerHTML = "";
+  const width = graph.clientWidth;
+  const depth = path.length + depthOf(focus);
+  graph.style.height = depth * ROW + "px";
+  // The ancestors of the focused frame span the whole width
+  path.forEach((ancestor, level) => draw(ancestor, 0, width, level, focus, path, ancestor.value));
+  (function walk(node, x, level) {
+    const w = width * node.value / focus.value;
+    if (w < 1) return;
+    draw(node, x, w, level, focus, path, node.value);
+    let childX = x;
+    for (const child of node.children) {
+      walk(child, childX, level + 1);
+      childX += width * child.value / focus.value;
+    }
+  })(focus, 0, path.length);
+}
+
+function draw(node, x, w, level, focus, path, value) {
+  const div = document.createElement("div");
+  div.className = "frame";
+  div.style.left = x + "px";
+  div.style.width = w + "px";
+  div.style.top = level * ROW + "px";
+  div.style.background = color(node.name);
+  div.textContent = node.name;
+  div.onmouseover = () => {
+    info.textContent = `${node.name}: ${value} samples (${(100 * value / tree.value).toFixed(2)}%)`;
+  };
+  div.onclick = () => {
+    if (path.includes(node)) {
+      render(node, path.slice(0, path.indexOf(node)));
+    } else {
+      const newPath = path.concat(findPath(focus, node));
+      render(node, newPath);
+    }
+  };
+  graph.appendChild(div);
+}
+
+function findPath(from, target) {
+  if (from === target) return [];
+  for (const child of from.children) {
+    const rest = findPath(child, target);
+    if (rest !== null) return [from].concat(rest);
+  }
+  return null;
+}
+
+render(tree, []);
+window.onresize = () => render(tree, []);
+</script>
+</body>
+</html>
+"""
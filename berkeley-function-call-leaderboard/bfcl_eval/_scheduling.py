@@ -0,0 +1,189 @@
+import heapq
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from bfcl_eval.utils import is_multi_turn, load_file
+
+# Rough cost of each feature in seconds, used until there is enough history to fit the model.
+# Features are: constant overhead, prompt tokens, number of turns, number of functions.
+DEFAULT_COEFFICIENTS = [1.0, 0.0005, 2.0, 0.01]
+# Minimum number of entries with a known latency needed to fit the coefficients
+MIN_FIT_SAMPLES = 20
+# Floor of any estimate, so that no entry is considered free
+MIN_ENTRY_COST = 0.1  # seconds
+CHARS_PER_TOKEN = 4
+
+
+def _entry_features(test_entry: dict) -> list[float]:
+    question = test_entry["question"]
+    functions = test_entry.get("function", [])
+    num_turns = len(question) if is_multi_turn(test_entry["id"]) else 1
+    prompt_tokens = (len(json.dumps(question)) + len(json.dumps(functions))) / CHARS_PER_TOKEN
+    return [1.0, prompt_tokens, num_turns, len(functions)]
+
+
+def _total_latency(entry: dict) -> Optional[float]:
+    # Latency is a single value for single-turn entries, and a list (per turn) of lists (per step) for multi-turn entries
+    latency = entry.get("latency")
+    if isinstance(latency, (int, float)):
+        total = float(latency)
+    elif isinstance(latency, list):
+        total = 0.0
+        for turn_latency in latency:
+            if isinstance(turn_latency, list):
+                total += sum(
+                    step_latency
+                    for step_latency in turn_latency
+                    if isinstance(step_latency, (int, float))
+                )
+            elif isinstance(turn_latency, (int, float)):
+                total += turn_latency
+    else:
+        return None
+    return total if total > 0 else None
+
+
+def load_latency_history(result_dir: Path) -> dict[str, dict[str, float]]:
+    """
+    Collect the total latency of every entry in the existing result files, for every model.
+    Returns a mapping from model result folder name to a mapping from entry id to latency in seconds.
+    """
+    history = {}
+    if not result_dir.exists():
+        return history
+    for model_result_dir in result_dir.iterdir():
+        if not model_result_dir.is_dir():
+            continue
+        for result_file in model_result_dir.glob("*_result.json"):
+            try:
+                entries = load_file(result_file)
+            except (json.JSONDecodeError, OSError):
+                continue
+            for entry in entries:
+                latency = _total_latency(entry)
+                if latency is not None and "id" in entry:
+                    history.setdefault(model_result_dir.name, {})[entry["id"]] = latency
+    return history
+
+
+class EntryCostModel:
+    """
+    Estimates how long each test entry will take to generate for a model, in seconds.
+
+    In order of preference, the estimate comes from:
+        - The latency of the same entry in a previous run of this model.
+        - The mean latency of the same entry for other models, scaled by how much slower or faster this model was than them on their shared entries.
+        - A linear model of the prompt tokens, number of turns and number of functions, fitted on the entries above (or default coefficients if there are too few of them).
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        test_entries: list[dict],
+        latency_history: dict[str, dict[str, float]],
+    ) -> None:
+        model_result_dir_name = model_name.replace("/", "_")
+        self.own_latency = latency_history.get(model_result_dir_name, {})
+
+        other_latencies = {}
+        for other_model, latencies in latency_history.items():
+            if other_model == model_result_dir_name:
+                continue
+            for entry_id, latency in latencies.items():
+                other_latencies.setdefault(entry_id, []).append(latency)
+        self.other_latency = {
+            entry_id: sum(latencies) / len(latencies)
+            for entry_id, latencies in other_latencies.items()
+        }
+
+        shared_ids = [entry_id for entry_id in self.own_latency if entry_id in self.other_latency]
+        if shared_ids:
+            self.model_scale = sum(self.own_latency[i] for i in shared_ids) / sum(
+                self.other_latency[i] for i in shared_ids
+            )
+        else:
+            self.model_scale = 1.0
+
+        self.coefficients = np.array(DEFAULT_COEFFICIENTS)
+        features, targets = [], []
+        for test_entry in test_entries:
+            known_latency = self._known_latency(test_entry["id"])
+            if known_latency is not None:
+                features.append(_entry_features(test_entry))
+                targets.append(known_latency)
+        # Number of entries with a known latency; without any, the estimates are only the default coefficients
+        self.num_entries = len(test_entries)
+        self.num_known_entries = len(targets)
+        if len(targets) >= MIN_FIT_SAMPLES:
+            coefficients, *_ = np.linalg.lstsq(
+                np.array(features), np.array(targets), rcond=None
+            )
+            self.coefficients = coefficients
+
+    @property
+    def has_history(self) -> bool:
+        """
+        Whether enough of the entries have a known latency for the estimates to be worth scheduling on.
+        """
+        return self.num_known_entries > 0 and self.num_known_entries >= min(
+            MIN_FIT_SAMPLES, self.num_entries
+        )
+
+    def _known_latency(self, entry_id: str) -> Optional[float]:
+        if entry_id in self.own_latency:
+            return self.own_latency[entry_id]
+        if entry_id in self.other_latency:
+            return self.other_latency[entry_id] * self.model_scale
+        return None
+
+    def estimate(self, test_entry: dict) -> float:
+        cost = self._known_latency(test_entry["id"])
+        if cost is None:
+            cost = float(np.dot(self.coefficients, _entry_features(test_entry)))
+        return max(cost, MIN_ENTRY_COST)
+
+
+def predict_makespan(costs: list[float], num_workers: int) -> float:
+    """
+    Simulate the thread pool: each entry, in submission order, starts on whichever worker frees up first.
+    """
+    worker_finish_times = [0.0] * max(num_workers, 1)
+    for cost in costs:
+        earliest_finish = heapq.heappop(worker_finish_times)
+        heapq.heappush(worker_finish_times, earliest_finish + cost)
+    return max(worker_finish_times)
+
+
+def plan_longest_first(
+    test_entries: list[dict], cost_model: EntryCostModel, num_workers: int
+) -> tuple[list[dict], float, float]:
+    """
+    Order the entries longest-expected-first (LPT), so that the slow entries don't start last and leave the run waiting on a few stragglers.
+    Returns the submission order, and the predicted makespan with that order and with the original order.
+    Without latency history the estimates mean little, so the entries keep their original order and no makespan is predicted.
+    """
+    if not cost_model.has_history:
+        return list(test_entries), None, None
+    costs = {test_entry["id"]: cost_model.estimate(test_entry) for test_entry in test_entries}
+    submission_order = sorted(test_entries, key=lambda entry: costs[entry["id"]], reverse=True)
+    predicted_makespan = predict_makespan(
+        [costs[entry["id"]] for entry in submission_order], num_workers
+    )
+    original_makespan = predict_makespan(
+        [costs[entry["id"]] for entry in test_entries], num_workers
+    )
+    return submission_order, predicted_makespan, original_makespan
+
+
+def report_makespan(
+    predicted_makespan: Optional[float],
+    original_makespan: Optional[float],
+    actual_makespan: float,
+) -> None:
+    if predicted_makespan is None:
+        return
+    print(
+        f"⏱️ Predicted makespan: {predicted_makespan:.1f}s ({original_makespan:.1f}s in sorted order), actual makespan: {actual_makespan:.1f}s."
+    )
@@ -0,0 +1,264 @@
+import hashlib
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from bfcl_eval._json_codec import dumps_bytes, loads
+from bfcl_eval.utils import sort_key
+from tqdm import tqdm
+
+WORK_QUEUE_FOLDER_NAME = ".work_queue"
+# Number of entries a worker claims at once
+CLAIM_BATCH_SIZE = 4
+# A lease that has not been renewed for this many seconds is considered abandoned and can be reclaimed by another worker.
+# It should comfortably exceed the clock skew between the hosts sharing the result directory.
+LEASE_TIMEOUT = 600  # seconds
+HEARTBEAT_INTERVAL = 30  # seconds
+
+
+class FileLeaseWorkQueue:
+    """
+    A lease-based work queue that lives entirely on a (possibly network-mounted) filesystem.
+
+    It allows several `bfcl generate` processes, potentially on different hosts, to generate results for the same model into the same result directory without a broker.
+    The queue folder layout is:
+        - `lease/<entry_id>`: Claimed by a worker. Created atomically with `O_CREAT | O_EXCL`, and its mtime is renewed by a heartbeat thread. Expired leases are reclaimed by other workers.
+        - `done/<entry_id>`: The result of this entry has been durably recorded in a journal.
+        - `journal/<worker_id>.jsonl`: The results generated by each worker, one entry per line.
+        - `merge.lock`: A worker is merging the journals. A lease like those of the entries, renewed while the merge runs.
+        - `merged`: All entries are done and the journals have been merged into the canonical result files.
+
+    An entry is never lost. In the rare event that a stalled worker loses its lease, the entry may be generated twice; duplicates are dropped at merge time.
+    """
+
+    def __init__(
+        self,
+        model_result_dir: Path,
+        test_entries: list[dict],
+        worker_id: str = None,
+        claim_batch_size: int = CLAIM_BATCH_SIZE,
+        lease_timeout: float = LEASE_TIMEOUT,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+    ) -> None:
+        self.test_entries = sorted(test_entries, key=sort_key)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.claim_batch_size = claim_batch_size
+        self.lease_timeout = lease_timeout
+        self.heartbeat_interval = heartbeat_interval
+
+        # Workers that were started for the same set of entries share the same queue
+        queue_key = hashlib.sha256(
+            "\n".join(entry["id"] for entry in self.test_entries).encode("utf-8")
+        ).hexdigest()[:16]
+        self.queue_dir = model_result_dir / WORK_QUEUE_FOLDER_NAME / queue_key
+        self.lease_dir = self.queue_dir / "lease"
+        self.done_dir = self.queue_dir / "done"
+        self.journal_dir = self.queue_dir / "journal"
+        self.merged_marker = self.queue_dir / "merged"
+        self.merge_lock_path = self.queue_dir / "merge.lock"
+        for folder in [self.lease_dir, self.done_dir, self.journal_dir]:
+            folder.mkdir(parents=True, exist_ok=True)
+
+        self.journal_path = self.journal_dir / f"{self.worker_id}.jsonl"
+        self._held_leases: set[str] = set()
+        self._lock = threading.Lock()
+
+    #### Lease management ####
+
+    def _try_create_lease(self, lease_path: Path) -> bool:
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            f.write(f"{self.worker_id} {time.time()}")
+        return True
+
+    def _is_expired(self, lease_path: Path) -> bool:
+        try:
+            return time.time() - lease_path.stat().st_mtime > self.lease_timeout
+        except FileNotFoundError:
+            return False
+
+    def _try_claim(self, lease_path: Path) -> bool:
+        if self._try_create_lease(lease_path):
+            return True
+
+        if not self._is_expired(lease_path):
+            return False
+
+        # The lease holder crashed or stalled. `rename` is atomic, so only one worker can move the stale lease out of the way.
+        stale_path = lease_path.with_name(f"{lease_path.name}.stale.{self.worker_id}")
+        try:
+            os.rename(lease_path, stale_path)
+        except FileNotFoundError:
+            return False
+        if not self._is_expired(stale_path):
+            # Someone else reclaimed the lease between our check and the rename, and we moved their fresh lease away.
+            # Put it back with `link`, which fails rather than overwrite a lease created since; a `rename` could replace it.
+            try:
+                os.link(stale_path, lease_path)
+            except OSError:
+                # The holder's heartbeat will find its lease gone; the entry may be generated twice, and the duplicate is dropped at merge time
+                pass
+            stale_path.unlink(missing_ok=True)
+            return False
+        stale_path.unlink(missing_ok=True)
+        print(f"♻️ Reclaimed expired lease {lease_path.name}.")
+        return self._try_create_lease(lease_path)
+
+    def _release(self, entry_id: str) -> None:
+        with self._lock:
+            self._held_leases.discard(entry_id)
+        (self.lease_dir / entry_id).unlink(missing_ok=True)
+
+    def _heartbeat(self, stop_event: threading.Event, get_lease_paths) -> None:
+        while not stop_event.wait(self.heartbeat_interval):
+            for lease_path in get_lease_paths():
+                try:
+                    os.utime(lease_path)
+                except FileNotFoundError:
+                    # The lease has been reclaimed by another worker. We still finish the entry; the duplicate is dropped at merge time.
+                    pass
+
+    def _start_heartbeat(self, get_lease_paths) -> tuple[threading.Event, threading.Thread]:
+        """
+        Renew the leases returned by `get_lease_paths` until the returned event is set.
+        """
+        stop_event = threading.Event()
+        heartbeat_thread = threading.Thread(
+            target=self._heartbeat,
+            args=(stop_event, get_lease_paths),
+            name="bfcl-work-queue-heartbeat",
+            daemon=True,
+        )
+        heartbeat_thread.start()
+        return stop_event, heartbeat_thread
+
+    def _get_held_lease_paths(self) -> list[Path]:
+        with self._lock:
+            return [self.lease_dir / entry_id for entry_id in self._held_leases]
+
+    def _done_ids(self) -> set[str]:
+        return set(os.listdir(self.done_dir))
+
+    def _claim_batch(self) -> list[dict]:
+        done_ids = self._done_ids()
+        batch = []
+        for entry in self.test_entries:
+            if len(batch) >= self.claim_batch_size:
+                break
+            entry_id = entry["id"]
+            if entry_id in done_ids or entry_id in self._held_leases:
+                continue
+            if self._try_claim(self.lease_dir / entry_id):
+                with self._lock:
+                    self._held_leases.add(entry_id)
+                batch.append(entry)
+        return batch
+
+    #### Result recording ####
+
+    def _record(self, result: dict) -> None:
+        # The journal line must be durable before the entry is marked as done
+        with open(self.journal_path, "ab") as f:
+            f.write(dumps_bytes(result) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        (self.done_dir / result["id"]).touch()
+        self._release(result["id"])
+
+    def is_all_done(self) -> bool:
+        done_ids = self._done_ids()
+        return all(entry["id"] in done_ids for entry in self.test_entries)
+
+    #### Main entry points ####
+
+    def run(self, inference_fn, num_threads: int, desc: str = None) -> None:
+        """
+        Claim, generate and record entries until every entry in the queue is done.
+        `inference_fn` takes a test entry and returns the result dict to write.
+        """
+        stop_event, heartbeat_thread = self._start_heartbeat(self._get_held_lease_paths)
+
+        try:
+            with ThreadPoolExecutor(
+                max_workers=num_threads, thread_name_prefix="bfcl-inference"
+            ) as executor:
+                with tqdm(
+                    total=len(self.test_entries),
+                    initial=len(self._done_ids()),
+                    desc=desc,
+                ) as pbar:
+                    in_flight = set()
+                    while True:
+                        if len(in_flight) < num_threads:
+                            for test_case in self._claim_batch():
+                                in_flight.add(executor.submit(inference_fn, test_case))
+
+                        if len(in_flight) == 0:
+                            if self.is_all_done():
+                                break
+                            # The remaining entries are leased by other workers; wait in case one of them crashes
+                            time.sleep(self.heartbeat_interval)
+                            pbar.n = len(self._done_ids())
+                            pbar.refresh()
+                            continue
+
+                        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            self._record(future.result())
+                        pbar.n = len(self._done_ids())
+                        pbar.refresh()
+        finally:
+            stop_event.set()
+            heartbeat_thread.join()
+            with self._lock:
+                held_leases = list(self._held_leases)
+            for entry_id in held_leases:
+                self._release(entry_id)
+
+    def merge(self, handler, result_dir: Path) -> bool:
+        """
+        Merge all the worker journals into the canonical sorted result files.
+        Only one worker performs the merge; the others return `False`.
+        """
+        if self.merged_marker.exists() or not self.is_all_done():
+            return False
+        # A lease like those of the entries, so that a worker that crashes while merging doesn't block the merge forever
+        if not self._try_claim(self.merge_lock_path):
+            return False
+        stop_event, heartbeat_thread = self._start_heartbeat(lambda: [self.merge_lock_path])
+        try:
+            if self.merged_marker.exists():
+                # Merged by a worker that held the lock between our two checks
+                return False
+            self._merge_journals(handler, result_dir)
+        finally:
+            stop_event.set()
+            heartbeat_thread.join()
+            self.merge_lock_path.unlink(missing_ok=True)
+        return True
+
+    def _merge_journals(self, handler, result_dir: Path) -> None:
+        results = {}
+        for journal_path in sorted(self.journal_dir.glob("*.jsonl")):
+            with open(journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = loads(line)
+                    except ValueError:
+                        # A worker crashed halfway through writing this line; the entry was never marked as done and has been regenerated
+                        continue
+                    # Keep the first copy if an entry was generated more than once
+                    results.setdefault(entry["id"], entry)
+
+        handler.write(list(results.values()), result_dir=result_dir, update_mode=True)
+
+        self.merged_marker.touch()
+        for journal_path in self.journal_dir.glob("*.jsonl"):
+            journal_path.unlink()
+        print(f"🔀 Merged {len(results)} entries from the work queue into the result files.")
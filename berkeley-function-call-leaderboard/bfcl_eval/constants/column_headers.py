@@ -67,3 +67,22 @@ COLUMNS_OVERALL = [
     "Organization",
     "License",
 ]
+
+
+# Written only for the models with categories evaluated on a subset (`--subset-fraction` / `--subset-size`)
+COLUMNS_SUBSET_CONFIDENCE_INTERVAL = [
+    "Rank",
+    "Model",
+    "Overall Acc",
+    "Overall Acc CI Lower",
+    "Overall Acc CI Upper",
+    "Non-Live Acc",
+    "Non-Live Acc CI Lower",
+    "Non-Live Acc CI Upper",
+    "Live Acc",
+    "Live Acc CI Lower",
+    "Live Acc CI Upper",
+    "Multi Turn Acc",
+    "Multi Turn Acc CI Lower",
+    "Multi Turn Acc CI Upper",
+]
@@ -1,4 +1,11 @@
 MAXIMUM_STEP_LIMIT = 20
+# A turn is ended early once the model repeats the same step (same function calls, same execution results, same simulator state) this many times in a row, or cycles through the same few steps this many times.
+# 0 disables the check. It is off by default, since ending turns early changes the generations compared with a run without it; 3 is a reasonable value to opt in with.
+LOOP_DETECTION_REPEAT_LIMIT = 0
+# Longest cycle of steps that the loop detection looks for
+LOOP_DETECTION_MAX_CYCLE_LENGTH = 3
+# Assistant message that closes a turn ended by the loop detection
+LOOP_DETECTION_TURN_END_MESSAGE = "I keep getting the same results, so I will stop here."
 
 DEFAULT_SYSTEM_PROMPT_WITHOUT_FUNC_DOC = """You are an expert in composing functions. You are given a question and a set of possible functions. Based on the question, you will need to make one or more function/tool calls to achieve the purpose.
 If none of the functions can be used, point it out. If the given question lacks the parameters required by the function, also point it out.
@@ -27,6 +27,25 @@ MULTI_TURN_FUNC_DOC_PATH = PROMPT_PATH / "multi_turn_func_doc"
 POSSIBLE_ANSWER_PATH = PROMPT_PATH / "possible_answer"
 UTILS_PATH = PACKAGE_ROOT / "scripts"
 
+# Partial score files from `bfcl evaluate --shard i/N` are stored under `SCORE_PATH / SHARD_SCORE_FOLDER_NAME`
+SHARD_SCORE_FOLDER_NAME = "shards"
+SHARD_LEADERBOARD_TABLE_FILE_NAME = "leaderboard_table.json"
+# Packed per-entry correctness of every evaluated model and test category, stored in the score folder and read by `bfcl analyze`
+CORRECTNESS_BITMAP_FILE_NAME = "correctness_bitmap.npz"
+# Bootstrap confidence intervals of the accuracies estimated with `--subset-fraction` / `--subset-size`
+SUBSET_BOOTSTRAP_RESAMPLES = 2000
+SUBSET_CONFIDENCE_LEVEL = 0.95
+# Address of the running `bfcl serve-eval` server, where `bfcl evaluate` finds it
+EVAL_SERVER_STATE_PATH = PROJECT_ROOT / ".eval_server.json"
+# Collapsed stacks and flamegraphs written by `bfcl --profile`
+PROFILE_PATH = PROJECT_ROOT / "profile"
+
+# Limits of `--isolated-execution`, where the simulator function calls run in separate worker processes
+ISOLATED_EXECUTION_CALL_TIMEOUT = 60  # seconds, per function call
+ISOLATED_EXECUTION_MEMORY_LIMIT_MB = 4096  # address space limit of each worker process
+# Workers are replaced by fresh processes after serving this many test entries
+ISOLATED_EXECUTION_MAX_SESSIONS_PER_WORKER = 200
+
 
 RED_FONT = "\033[91m"
 RESET = "\033[0m"
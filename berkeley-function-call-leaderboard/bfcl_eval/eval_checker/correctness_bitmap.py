@@ -0,0 +1,253 @@
+import math
+import os
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+# Arrays stored for each test category in the `.npz` file, under `<prefix><test category>`
+_IDS_KEY_PREFIX = "ids::"
+_MODELS_KEY_PREFIX = "models::"
+_CORRECT_KEY_PREFIX = "correct::"
+_EVALUATED_KEY_PREFIX = "evaluated::"
+
+# Below this many discordant entries, the McNemar test uses the exact binomial distribution instead of the chi-square approximation
+MCNEMAR_EXACT_THRESHOLD = 25
+# Number of bootstrap resamples drawn at once, to bound the memory of the weight matrix
+BOOTSTRAP_CHUNK_SIZE = 100
+
+
+class CorrectnessBitmap:
+    """
+    Whether each entry is correct, for every evaluated (model, test category), as bitsets aligned to the canonical id order of the category (the sorted ids of its dataset file).
+
+    Each pair has two bitsets: whether the entry is correct, and whether it was evaluated at all, since a result file may be partial, and a shard only covers some of the entries.
+    On disk, the bitsets of each category form a (model, entry) matrix packed with `np.packbits`, and all the categories are stored in a single `.npz` file together with their canonical ids.
+    """
+
+    def __init__(self):
+        # Test category -> canonical ids
+        self.ids: dict[str, list[str]] = {}
+        # (model name, test category) -> (correct, evaluated), boolean arrays aligned to `self.ids[test_category]`
+        self.bits: dict[tuple[str, str], tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def load(cls, file_path: Path) -> "CorrectnessBitmap":
+        """
+        Load the bitmap file, or get an empty bitmap if there is none yet.
+        """
+        bitmap = cls()
+        if not Path(file_path).exists():
+            return bitmap
+        with np.load(file_path) as data:
+            for key in data.files:
+                if not key.startswith(_IDS_KEY_PREFIX):
+                    continue
+                test_category = key[len(_IDS_KEY_PREFIX) :]
+                ids = data[key].tolist()
+                bitmap.ids[test_category] = ids
+                correct = np.unpackbits(
+                    data[_CORRECT_KEY_PREFIX + test_category], axis=1, count=len(ids)
+                ).astype(bool)
+                evaluated = np.unpackbits(
+                    data[_EVALUATED_KEY_PREFIX + test_category], axis=1, count=len(ids)
+                ).astype(bool)
+                for i, model_name in enumerate(data[_MODELS_KEY_PREFIX + test_category].tolist()):
+                    bitmap.bits[(model_name, test_category)] = (correct[i], evaluated[i])
+        return bitmap
+
+    def save(self, file_path: Path) -> None:
+        # One (model, entry) matrix per category, with each row packed into bytes
+        arrays = {}
+        for test_category, ids in self.ids.items():
+            model_names = [
+                model_name for model_name, category in self.bits if category == test_category
+            ]
+            correct, evaluated = self.matrix(model_names, [test_category])[:2]
+            arrays[_IDS_KEY_PREFIX + test_category] = np.array(ids, dtype=str)
+            arrays[_MODELS_KEY_PREFIX + test_category] = np.array(model_names, dtype=str)
+            arrays[_CORRECT_KEY_PREFIX + test_category] = np.packbits(correct, axis=1)
+            arrays[_EVALUATED_KEY_PREFIX + test_category] = np.packbits(evaluated, axis=1)
+
+        # Written to a temporary file first, so that an interrupted evaluation never leaves a truncated file behind
+        file_path = Path(file_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = file_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temp_path, file_path)
+
+    def _set_ids(self, test_category: str, ids: list[str]) -> None:
+        old_ids = self.ids.get(test_category)
+        self.ids[test_category] = ids
+        if old_ids is None or old_ids == ids:
+            return
+        # The dataset changed since the bitsets were recorded; re-align them, the entries that no longer exist are dropped
+        old_position = {entry_id: i for i, entry_id in enumerate(old_ids)}
+        old_indices = np.array([old_position.get(entry_id, -1) for entry_id in ids], dtype=int)
+        known = old_indices >= 0
+        for key, (correct, evaluated) in list(self.bits.items()):
+            if key[1] != test_category:
+                continue
+            new_correct = np.zeros(len(ids), dtype=bool)
+            new_evaluated = np.zeros(len(ids), dtype=bool)
+            new_correct[known] = correct[old_indices[known]]
+            new_evaluated[known] = evaluated[old_indices[known]]
+            self.bits[key] = (new_correct, new_evaluated)
+
+    def record(
+        self,
+        model_name: str,
+        test_category: str,
+        ids: list[str],
+        entry_correctness: dict[str, bool],
+    ) -> None:
+        """
+        Record the evaluation of a model on a test category, replacing any previous one.
+        `ids` is the canonical id order of the category, and `entry_correctness` maps the id of each evaluated entry to whether it is correct.
+        """
+        self._set_ids(test_category, list(ids))
+        position = {entry_id: i for i, entry_id in enumerate(self.ids[test_category])}
+        correct = np.zeros(len(position), dtype=bool)
+        evaluated = np.zeros(len(position), dtype=bool)
+        for entry_id, valid in entry_correctness.items():
+            # Entries that are not in the dataset file (any more) can't be aligned
+            if entry_id in position:
+                evaluated[position[entry_id]] = True
+                correct[position[entry_id]] = valid
+        self.bits[(model_name, test_category)] = (correct, evaluated)
+
+    def update(self, other: "CorrectnessBitmap", union: bool = False) -> None:
+        """
+        Add the evaluations of another bitmap.
+        By default they replace the ones of the same (model, test category); with `union`, they are combined entry by entry, as for the shards of a single evaluation.
+        """
+        for test_category, ids in other.ids.items():
+            self._set_ids(test_category, ids)
+        for key, (correct, evaluated) in other.bits.items():
+            if union and key in self.bits:
+                own_correct, own_evaluated = self.bits[key]
+                correct = np.where(evaluated, correct, own_correct)
+                evaluated = evaluated | own_evaluated
+            self.bits[key] = (correct.copy(), evaluated.copy())
+
+    def model_names(self) -> list[str]:
+        return sorted({model_name for model_name, _ in self.bits})
+
+    def test_categories(self) -> list[str]:
+        return sorted({test_category for _, test_category in self.bits})
+
+    def matrix(
+        self, model_names: list[str], test_categories: list[str]
+    ) -> tuple[np.ndarray, np.ndarray, list[str]]:
+        """
+        Stack the bitsets of the given models and categories into two (model, entry) boolean matrices, correct and evaluated, with the entries of the categories one after another.
+        A model that was not evaluated on a category has no evaluated entry there.
+        Also returns the entry ids, in column order.
+        """
+        entry_ids = [entry_id for test_category in test_categories for entry_id in self.ids[test_category]]
+        correct = np.zeros((len(model_names), len(entry_ids)), dtype=bool)
+        evaluated = np.zeros((len(model_names), len(entry_ids)), dtype=bool)
+        for i, model_name in enumerate(model_names):
+            offset = 0
+            for test_category in test_categories:
+                count = len(self.ids[test_category])
+                if (model_name, test_category) in self.bits:
+                    category_correct, category_evaluated = self.bits[(model_name, test_category)]
+                    correct[i, offset : offset + count] = category_correct
+                    evaluated[i, offset : offset + count] = category_evaluated
+                offset += count
+        return correct, evaluated, entry_ids
+
+
+def compute_accuracy(correct: np.ndarray, evaluated: np.ndarray) -> np.ndarray:
+    """
+    Accuracy of each model (row) over its evaluated entries; NaN for a model without any.
+    """
+    evaluated_count = evaluated.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (correct & evaluated).sum(axis=1) / evaluated_count
+
+
+def compute_pairwise_counts(
+    correct: np.ndarray, evaluated: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For every pair of models (i, j), count the entries evaluated for both that model i gets right and model j gets wrong.
+    Returns the (model, model) matrix of these wins, and its transpose, the losses.
+    """
+    right = (correct & evaluated).astype(np.float32)
+    wrong = (~correct & evaluated).astype(np.float32)
+    # float32 matrix products are exact for counts below 2**24
+    wins = np.rint(right @ wrong.T).astype(np.int64)
+    return wins, wins.T.copy()
+
+
+def mcnemar_p_values(wins: np.ndarray, losses: np.ndarray) -> np.ndarray:
+    """
+    Two-sided p-values of McNemar's test for paired correctness, from the numbers of discordant entries.
+    The exact binomial test is used when there are few discordant entries, and the chi-square approximation with continuity correction otherwise.
+    """
+    wins = np.asarray(wins, dtype=np.int64)
+    losses = np.asarray(losses, dtype=np.int64)
+    discordant = wins + losses
+    chi_square = np.where(
+        discordant > 0,
+        (np.abs(wins - losses) - 1).clip(min=0) ** 2 / np.maximum(discordant, 1),
+        0.0,
+    )
+    # Survival function of the chi-square distribution with one degree of freedom
+    p_values = np.vectorize(lambda x: math.erfc(math.sqrt(x / 2)), otypes=[float])(chi_square)
+
+    for index in zip(*np.nonzero(discordant < MCNEMAR_EXACT_THRESHOLD)):
+        n = int(discordant[index])
+        k = int(min(wins[index], losses[index]))
+        tail = sum(math.comb(n, i) for i in range(k + 1)) / 2**n
+        p_values[index] = min(1.0, 2 * tail)
+    return p_values
+
+
+def bootstrap_accuracy_ci(
+    correct: np.ndarray,
+    evaluated: np.ndarray,
+    num_resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: int = 0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Percentile bootstrap confidence interval of the accuracy of each model (row), resampling the entries with replacement.
+    The same resamples are used for every model, and each resample is a vector of entry weights (the number of times each entry is drawn), so all the models are resampled with one matrix product.
+    """
+    rng = np.random.default_rng(seed)
+    num_entries = correct.shape[1]
+    right = (correct & evaluated).astype(np.float32).T
+    counted = evaluated.astype(np.float32).T
+    accuracies = []
+    for start in range(0, num_resamples, BOOTSTRAP_CHUNK_SIZE):
+        size = min(BOOTSTRAP_CHUNK_SIZE, num_resamples - start)
+        # How many times each entry is drawn in each resample
+        draws = rng.integers(0, num_entries, (size, num_entries))
+        draws += np.arange(size)[:, None] * num_entries
+        weights = (
+            np.bincount(draws.ravel(), minlength=size * num_entries)
+            .reshape(size, num_entries)
+            .astype(np.float32)
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            accuracies.append((weights @ right) / (weights @ counted))
+    accuracies = np.concatenate(accuracies)
+
+    alpha = (1 - confidence) / 2
+    with warnings.catch_warnings():
+        # A model without any evaluated entry has no interval
+        warnings.simplefilter("ignore", RuntimeWarning)
+        lower = np.nanquantile(accuracies, alpha, axis=0)
+        upper = np.nanquantile(accuracies, 1 - alpha, axis=0)
+    return lower, upper
+
+
+def find_entries_failed_by_all(correct: np.ndarray, evaluated: np.ndarray) -> np.ndarray:
+    """
+    Mask of the entries that every model was evaluated on and got wrong.
+    """
+    return evaluated.all(axis=0) & ~correct.any(axis=0)
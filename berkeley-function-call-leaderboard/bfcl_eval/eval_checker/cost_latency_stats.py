@@ -0,0 +1,113 @@
+from itertools import chain
+
+import numpy as np
+
+# The latency percentiles reported by `CostLatencyStats.latency_summary`
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+def _extract_values(model_output_data: list[dict], key: str) -> np.ndarray:
+    """
+    The non-zero numbers under `key` in the result entries, as a float array.
+    The value of an entry is either a list of lists, one per turn (in multi-turn), or a single value (in single-turn).
+    """
+    values = []
+    for data in model_output_data:
+        value = data.get(key)
+        if isinstance(value, list) and all(isinstance(inner_item, list) for inner_item in value):
+            values.extend(chain.from_iterable(value))
+        else:
+            values.append(value)
+    return np.fromiter(
+        (value for value in values if isinstance(value, (int, float)) and value != 0),
+        dtype=np.float64,
+    )
+
+
+class CostLatencyStats:
+    """
+    The token counts and latencies of a model's results, across all the test categories it is evaluated on.
+
+    Token counts are only kept as totals. The latencies are kept as float arrays, one per recorded batch of results, so that the percentiles stay exact and the stats of several shards merge into the same ones as a single run.
+    """
+
+    def __init__(self):
+        self.input_tokens = 0.0
+        self.output_tokens = 0.0
+        # Number of non-zero token counts recorded; a model that reports none has no token-based cost
+        self.num_input_tokens = 0
+        self.num_output_tokens = 0
+        self._latency_chunks: list[np.ndarray] = []
+
+    def add(self, model_output_data: list[dict]) -> None:
+        """
+        Record the `input_token_count`, `output_token_count` and `latency` of the result entries.
+        """
+        input_tokens = _extract_values(model_output_data, "input_token_count")
+        output_tokens = _extract_values(model_output_data, "output_token_count")
+        self.input_tokens += float(input_tokens.sum())
+        self.output_tokens += float(output_tokens.sum())
+        self.num_input_tokens += len(input_tokens)
+        self.num_output_tokens += len(output_tokens)
+        latency = _extract_values(model_output_data, "latency")
+        if len(latency) > 0:
+            self._latency_chunks.append(latency)
+
+    def merge(self, other: "CostLatencyStats") -> None:
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.num_input_tokens += other.num_input_tokens
+        self.num_output_tokens += other.num_output_tokens
+        self._latency_chunks.extend(other._latency_chunks)
+
+    @property
+    def latency(self) -> np.ndarray:
+        if len(self._latency_chunks) > 1:
+            # Concatenated once, on first use
+            self._latency_chunks = [np.concatenate(self._latency_chunks)]
+        if len(self._latency_chunks) == 0:
+            return np.empty(0, dtype=np.float64)
+        return self._latency_chunks[0]
+
+    def latency_summary(self) -> dict:
+        """
+        Count, total, mean, sample standard deviation and percentiles of the latencies, in seconds.
+        Empty if no latency is recorded.
+        """
+        latency = self.latency
+        if len(latency) == 0:
+            return {}
+        summary = {
+            "count": len(latency),
+            "total": float(latency.sum()),
+            "mean": float(latency.mean()),
+            "std": float(latency.std(ddof=1)) if len(latency) > 1 else 0.0,
+        }
+        for percentile, value in zip(
+            LATENCY_PERCENTILES, np.percentile(latency, LATENCY_PERCENTILES)
+        ):
+            summary[f"p{percentile}"] = float(value)
+        return summary
+
+    def to_dict(self) -> dict:
+        """
+        JSON form, for the leaderboard table of a shard.
+        """
+        return {
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "num_input_tokens": self.num_input_tokens,
+            "num_output_tokens": self.num_output_tokens,
+            "latency": self.latency.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CostLatencyStats":
+        stats = cls()
+        stats.input_tokens = data["input_tokens"]
+        stats.output_tokens = data["output_tokens"]
+        stats.num_input_tokens = data["num_input_tokens"]
+        stats.num_output_tokens = data["num_output_tokens"]
+        if len(data["latency"]) > 0:
+            stats._latency_chunks.append(np.asarray(data["latency"], dtype=np.float64))
+        return stats
@@ -1,4 +1,6 @@
 import argparse
+import json
+import re
 
 from bfcl_eval.constants.category_mapping import (
     TEST_COLLECTION_MAPPING,
@@ -6,25 +8,41 @@ from bfcl_eval.constants.category_mapping import (
     VERSION_PREFIX,
 )
 from bfcl_eval.constants.eval_config import (
+    CORRECTNESS_BITMAP_FILE_NAME,
     DOTENV_PATH,
     POSSIBLE_ANSWER_PATH,
     PROJECT_ROOT,
     PROMPT_PATH,
     RESULT_PATH,
     SCORE_PATH,
+    SHARD_LEADERBOARD_TABLE_FILE_NAME,
+    SHARD_SCORE_FOLDER_NAME,
 )
 from bfcl_eval.eval_checker.ast_eval.ast_checker import ast_checker
+from bfcl_eval.eval_checker.correctness_bitmap import CorrectnessBitmap
+from bfcl_eval.eval_checker.cost_latency_stats import CostLatencyStats
 from bfcl_eval.eval_checker.eval_runner_helper import *
+from bfcl_eval.eval_checker.multi_turn_eval.isolated_executor import (
+    SimulatorStateLostError,
+)
 from bfcl_eval.eval_checker.multi_turn_eval.multi_turn_checker import (
     multi_turn_checker,
     multi_turn_irrelevance_checker,
 )
-from bfcl_eval.eval_checker.multi_turn_eval.multi_turn_utils import is_empty_execute_response
+from bfcl_eval.eval_checker.multi_turn_eval.multi_turn_utils import (
+    configure_isolated_execution,
+    end_multi_turn_session,
+    is_empty_execute_response,
+)
 from bfcl_eval.constants.model_config import MODEL_CONFIG_MAPPING
+from bfcl_eval.model_handler.input_log import INPUT_LOG_MESSAGES_KEY
 from bfcl_eval.utils import *
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+# Set by `configure_evaluation_cache`
+_evaluation_cache = None
+
 
 def get_handler(model_name):
     config = MODEL_CONFIG_MAPPING[model_name]
@@ -35,92 +53,118 @@ def get_handler(model_name):
     return handler
 
 
-def multi_turn_runner(
-    handler, model_result, prompt, possible_answer, model_name, test_category, score_dir
-):
-    assert (
-        len(model_result) == len(prompt) == len(possible_answer)
-    ), f"The length of the model result ({len(model_result)}) does not match the length of the prompt ({len(prompt)}) or possible answer ({len(possible_answer)}). Please check the input files for completeness."
+def configure_evaluation_cache(cache):
+    """
+    Keep the dataset files, the handlers and the entry verdicts in `cache` across evaluations, as `bfcl serve-eval` does; `None` turns it off.
+    """
+    global _evaluation_cache
+    _evaluation_cache = cache
 
-    result = []
-    correct_count = 0
-    for i in range(len(model_result)):
-        index: str = model_result[i]["id"]
-        # Model result is stored as a list of list of model responses. Each inner list represents a turn.
-        multi_turn_model_result_list: list[list] = model_result[i]["result"]
-        multi_turn_ground_truth_list: list[list[str]] = possible_answer[i]["ground_truth"]
-        test_entry: dict = prompt[i]
 
-        # Remove the function doc from the score file for better readability; they are repeated and way too long
-        if "function" in test_entry:
-            del test_entry["function"]
+def _get_handler(model_name):
+    if _evaluation_cache is not None:
+        return _evaluation_cache.get_handler(model_name, get_handler)
+    return get_handler(model_name)
+
+
+def _load_dataset_file(file_path):
+    if _evaluation_cache is not None:
+        return _evaluation_cache.load_dataset_file(file_path)
+    return load_file(file_path, sort_by_id=True)
 
-        if type(multi_turn_model_result_list) != list:
-            result.append(
-                {
-                    "id": index,
-                    "model_name": model_name,
-                    "test_category": test_category,
-                    "valid": False,
-                    "error": {
-                        "error_message": [
-                            "Error during inference phase. Model did not output a list of model responses."
-                        ],
-                        "error_type": "multi_turn:inference_error",
-                    },
-                    "prompt": test_entry,
-                    "model_result": multi_turn_model_result_list,
-                    "possible_answer": multi_turn_ground_truth_list,
-                }
-            )
-        # Check if force-terminated during inference phase.
-        # This happens when the model has retried too many times and still haven't figured out the answer.
-        # When force-terminated, no further evaluation is needed. This whole entry will be failed.
-        if len(multi_turn_model_result_list) != len(multi_turn_ground_truth_list):
-            result.append(
-                {
-                    "id": index,
-                    "model_name": model_name,
-                    "test_category": test_category,
-                    "valid": False,
-                    "error": {
-                        "error_message": [
-                            f"Model was force-terminated during inference phase. The length of the model result turns ({len(multi_turn_model_result_list)}) does not match the length of the ground truth turns ({len(multi_turn_ground_truth_list)})."
-                        ],
-                        "error_type": "multi_turn:force_terminated",
-                    },
-                    "prompt": test_entry,
-                    "model_result": multi_turn_model_result_list,
-                    "possible_answer": multi_turn_ground_truth_list,
-                }
-            )
-            continue
 
-        multi_turn_model_result_list_decoded: list[list[list[str]]] = (
-            []
-        )  # decode_execute returns a list of strings
-        # Try decoding the model results into executable function calls
-        for single_turn_model_result_list in multi_turn_model_result_list:
-            single_turn_model_result_list_decoded = []
-            for model_result_item in single_turn_model_result_list:
-                # model_result_item is per step
-                try:
-                    decoded_result: list[str] = handler.decode_execute(model_result_item)
-                    if is_empty_execute_response(decoded_result):
-                        # Empty output is not considered as a valid function call
-                        continue
-
-                    single_turn_model_result_list_decoded.append(decoded_result)
-
-                except Exception as e:
-                    # Ignore any failed decoding and continue to the next message
-                    # We only care about the decoded function call, not the error message or if the model is chatting
+def _check_entry(model_name, test_category, model_result_entry, check):
+    # Under `bfcl serve-eval`, an entry that is unchanged since an earlier job keeps its verdict
+    if _evaluation_cache is not None:
+        return _evaluation_cache.check_entry(
+            model_name, test_category, model_result_entry, check
+        )
+    return check()
+
+
+def _check_multi_turn_entry(
+    handler, model_result_entry, test_entry, possible_answer_entry, model_name, test_category
+) -> tuple[list[dict], bool]:
+    """
+    Returns the score file records of the entry, and whether it is correct.
+    """
+    records = []
+    index: str = model_result_entry["id"]
+    # Model result is stored as a list of list of model responses. Each inner list represents a turn.
+    multi_turn_model_result_list: list[list] = model_result_entry["result"]
+    multi_turn_ground_truth_list: list[list[str]] = possible_answer_entry["ground_truth"]
+
+    # Remove the function doc from the score file for better readability; they are repeated and way too long
+    if "function" in test_entry:
+        del test_entry["function"]
+
+    if type(multi_turn_model_result_list) != list:
+        records.append(
+            {
+                "id": index,
+                "model_name": model_name,
+                "test_category": test_category,
+                "valid": False,
+                "error": {
+                    "error_message": [
+                        "Error during inference phase. Model did not output a list of model responses."
+                    ],
+                    "error_type": "multi_turn:inference_error",
+                },
+                "prompt": test_entry,
+                "model_result": multi_turn_model_result_list,
+                "possible_answer": multi_turn_ground_truth_list,
+            }
+        )
+    # Check if force-terminated during inference phase.
+    # This happens when the model has retried too many times and still haven't figured out the answer.
+    # When force-terminated, no further evaluation is needed. This whole entry will be failed.
+    if len(multi_turn_model_result_list) != len(multi_turn_ground_truth_list):
+        records.append(
+            {
+                "id": index,
+                "model_name": model_name,
+                "test_category": test_category,
+                "valid": False,
+                "error": {
+                    "error_message": [
+                        f"Model was force-terminated during inference phase. The length of the model result turns ({len(multi_turn_model_result_list)}) does not match the length of the ground truth turns ({len(multi_turn_ground_truth_list)})."
+                    ],
+                    "error_type": "multi_turn:force_terminated",
+                },
+                "prompt": test_entry,
+                "model_result": multi_turn_model_result_list,
+                "possible_answer": multi_turn_ground_truth_list,
+            }
+        )
+        return records, False
+
+    multi_turn_model_result_list_decoded: list[list[list[str]]] = (
+        []
+    )  # decode_execute returns a list of strings
+    # Try decoding the model results into executable function calls
+    for single_turn_model_result_list in multi_turn_model_result_list:
+        single_turn_model_result_list_decoded = []
+        for model_result_item in single_turn_model_result_list:
+            # model_result_item is per step
+            try:
+                decoded_result: list[str] = handler.decode_execute(model_result_item)
+                if is_empty_execute_response(decoded_result):
+                    # Empty output is not considered as a valid function call
                     continue
-            multi_turn_model_result_list_decoded.append(
-                single_turn_model_result_list_decoded
-            )
 
-        # Check if the model output the correct function calls
+                single_turn_model_result_list_decoded.append(decoded_result)
+
+            except Exception as e:
+                # Ignore any failed decoding and continue to the next message
+                # We only care about the decoded function call, not the error message or if the model is chatting
+                continue
+        multi_turn_model_result_list_decoded.append(
+            single_turn_model_result_list_decoded
+        )
+
+    # Check if the model output the correct function calls
+    try:
         accuracy_checker_result = multi_turn_checker(
             multi_turn_model_result_list_decoded,
             multi_turn_ground_truth_list,
@@ -128,119 +172,271 @@ def multi_turn_runner(
             test_category,
             model_name,
         )
+    except SimulatorStateLostError as e:
+        # With `--isolated-execution`, a call timed out or crashed its worker and the state could not be rebuilt
+        accuracy_checker_result = {
+            "valid": False,
+            "error_message": str(e),
+            "error_type": "multi_turn:execution_state_lost",
+        }
+    finally:
+        end_multi_turn_session(model_name, test_entry["id"], is_evaL_run=True)
+        end_multi_turn_session(
+            model_name + "_ground_truth", test_entry["id"], is_evaL_run=True
+        )
 
-        # Perform additional check for multi-turn irrelevance
-        # This happens when the model is expected to not output any function calls in a certain turn due to miss parameters or miss functions
-        # irrelevance_checker_result = multi_turn_irrelevance_checker(
-        #     multi_turn_model_result_list_decoded,
-        #     multi_turn_ground_truth_list,
-        # )
-
-        if not accuracy_checker_result["valid"]:
-            temp = {}
-            temp["id"] = index
-            temp["model_name"] = model_name
-            temp["test_category"] = test_category
-            temp["valid"] = accuracy_checker_result.pop("valid")
-            temp["error"] = accuracy_checker_result
-            temp["prompt"] = test_entry
-            temp["model_result_raw"] = multi_turn_model_result_list
-            temp["model_result_decoded"] = multi_turn_model_result_list_decoded
-            temp["possible_answer"] = multi_turn_ground_truth_list
-            temp["inference_log"] = model_result[i].get("inference_log", "")
-            result.append(temp)
-        else:
+    # Perform additional check for multi-turn irrelevance
+    # This happens when the model is expected to not output any function calls in a certain turn due to miss parameters or miss functions
+    # irrelevance_checker_result = multi_turn_irrelevance_checker(
+    #     multi_turn_model_result_list_decoded,
+    #     multi_turn_ground_truth_list,
+    # )
+
+    if accuracy_checker_result["valid"]:
+        return records, True
+
+    temp = {}
+    temp["id"] = index
+    temp["model_name"] = model_name
+    temp["test_category"] = test_category
+    temp["valid"] = accuracy_checker_result.pop("valid")
+    temp["error"] = accuracy_checker_result
+    temp["prompt"] = test_entry
+    temp["model_result_raw"] = multi_turn_model_result_list
+    temp["model_result_decoded"] = multi_turn_model_result_list_decoded
+    temp["possible_answer"] = multi_turn_ground_truth_list
+    temp["inference_log"] = model_result_entry.get("inference_log", "")
+    # The message table of the delta-encoded input logs, see `expand_inference_input_log.py`
+    if INPUT_LOG_MESSAGES_KEY in model_result_entry:
+        temp[INPUT_LOG_MESSAGES_KEY] = model_result_entry[INPUT_LOG_MESSAGES_KEY]
+    records.append(temp)
+    return records, False
+
+
+def multi_turn_runner(
+    handler,
+    model_result,
+    prompt,
+    possible_answer,
+    model_name,
+    test_category,
+    score_dir,
+    stratum_by_id=None,
+):
+    assert (
+        len(model_result) == len(prompt) == len(possible_answer)
+    ), f"The length of the model result ({len(model_result)}) does not match the length of the prompt ({len(prompt)}) or possible answer ({len(possible_answer)}). Please check the input files for completeness."
+
+    result = []
+    correct_count = 0
+    for i in range(len(model_result)):
+        records, is_correct = _check_entry(
+            model_name,
+            test_category,
+            model_result[i],
+            lambda: _check_multi_turn_entry(
+                handler,
+                model_result[i],
+                prompt[i],
+                possible_answer[i],
+                model_name,
+                test_category,
+            ),
+        )
+        result.extend(records)
+        if is_correct:
             correct_count += 1
 
+    entry_correctness = get_entry_correctness(model_result, result)
     accuracy = correct_count / len(model_result)
-    result.insert(
-        0,
-        {
-            "accuracy": accuracy,
-            "correct_count": correct_count,
-            "total_count": len(model_result),
-        },
-    )
+    header = {
+        "accuracy": accuracy,
+        "correct_count": correct_count,
+        "total_count": len(model_result),
+    }
+    # On a subset, the accuracy is estimated for the whole category
+    if stratum_by_id is not None:
+        header.update(summarize_subset(stratum_by_id, entry_correctness))
+        accuracy = header["accuracy"]
+    result.insert(0, header)
     output_file_name = f"{VERSION_PREFIX}_{test_category}_score.json"
     output_file_dir = score_dir / model_name
     write_list_of_dicts_to_file(output_file_name, result, output_file_dir)
 
-    return accuracy, len(model_result)
+    return accuracy, len(model_result), entry_correctness
 
 
-def relevance_file_runner(
-    handler, model_result, prompt, model_name, test_category, score_dir
-):
+def _check_relevance_sample(
+    handler, model_result_item, prompt_item, model_name, test_category, index
+) -> dict:
     # This function serves for both relevance and irrelevance tests, which share the exact opposite logic.
     # If `test_category` is "irrelevance", the model is expected to output no function call.
     # No function call means either the AST decoding fails (a error message is generated) or the decoded AST does not contain any function call (such as a empty list, `[]`).
     # If `test_category` is "relevance", the model is expected to output to a function call, and empty list doesn't count as a function call.
+    contain_func_call = False
+    decoded_result = None
+    decode_error = None
+
+    try:
+        decoded_result = handler.decode_ast(model_result_item, language="Python")
+        # Decode successfully, which means the model output is in valid function call format
+        contain_func_call = True
+        if is_empty_output(decoded_result):
+            # Empty output is not considered as a valid function call
+            contain_func_call = False
+
+    except Exception as e:
+        # Decode failed, which means the model output is not in valid function call format
+        contain_func_call = False
+        decode_error = str(e)
+
+    # irrelevance test means no function call outputted
+    if "irrelevance" in test_category:
+        success = not contain_func_call
+    else:
+        success = contain_func_call
+
+    if success:
+        return {"valid": True}
+
+    temp = {}
+    temp["id"] = index
+    temp["model_name"] = model_name
+    temp["test_category"] = test_category
+    temp["valid"] = success
+    if "irrelevance" in test_category:
+        temp["error"] = [f"Valid syntax. Successfully decode AST when it should not."]
+        temp["error_type"] = "irrelevance_error:decoder_success"
+    else:
+        temp["error"] = [
+            f"Invalid syntax. Failed to decode AST when it should have. {decode_error}"
+        ]
+        temp["error_type"] = "relevance_error:decoder_failed"
+    temp["prompt"] = prompt_item
+    temp["model_result"] = model_result_item
+    temp["decoded_result"] = decoded_result
+    return temp
+
+
+def relevance_file_runner(
+    handler, model_result, prompt, model_name, test_category, score_dir, stratum_by_id=None
+):
     result = []
     correct_count = 0
+    # Whether each sample of each entry is correct, for entries generated with `--num-samples`
+    sample_validity = []
     for i in range(len(model_result)):
         index: str = model_result[i]["id"]
-        model_result_item = model_result[i]["result"]
-        contain_func_call = False
-        decoded_result = None
-        decode_error = None
-
-        try:
-            decoded_result = handler.decode_ast(model_result_item, language="Python")
-            # Decode successfully, which means the model output is in valid function call format
-            contain_func_call = True
-            if is_empty_output(decoded_result):
-                # Empty output is not considered as a valid function call
-                contain_func_call = False
-
-        except Exception as e:
-            # Decode failed, which means the model output is not in valid function call format
-            contain_func_call = False
-            decode_error = str(e)
-
-        # irrelevance test means no function call outputted
-        if "irrelevance" in test_category:
-            success = not contain_func_call
-        else:
-            success = contain_func_call
-
-        if success:
+        sample_results = _check_entry(
+            model_name,
+            test_category,
+            model_result[i],
+            lambda: [
+                _check_relevance_sample(
+                    handler, model_result_item, prompt[i], model_name, test_category, index
+                )
+                for model_result_item in get_model_result_samples(model_result[i])
+            ],
+        )
+        sample_validity.append([checker_result["valid"] for checker_result in sample_results])
+        # The accuracy (and the error report) is based on the first sample, as in a single-sample run
+        if sample_results[0]["valid"]:
             correct_count += 1
         else:
-            temp = {}
-            temp["id"] = index
-            temp["model_name"] = model_name
-            temp["test_category"] = test_category
-            temp["valid"] = success
-            if "irrelevance" in test_category:
-                temp["error"] = [
-                    f"Valid syntax. Successfully decode AST when it should not."
-                ]
-                temp["error_type"] = "irrelevance_error:decoder_success"
-            else:
-                temp["error"] = [
-                    f"Invalid syntax. Failed to decode AST when it should have. {decode_error}"
-                ]
-                temp["error_type"] = "relevance_error:decoder_failed"
-            temp["prompt"] = prompt[i]
-            temp["model_result"] = model_result_item
-            temp["decoded_result"] = decoded_result
-
-            result.append(temp)
+            result.append(sample_results[0])
 
     accuracy = correct_count / len(model_result)
-    result.insert(
-        0,
-        {
-            "accuracy": accuracy,
-            "correct_count": correct_count,
-            "total_count": len(model_result),
-        },
-    )
+    header = {
+        "accuracy": accuracy,
+        "correct_count": correct_count,
+        "total_count": len(model_result),
+    }
+    entry_correctness = get_entry_correctness(model_result, result)
+    # On a subset, the accuracy is estimated for the whole category
+    if stratum_by_id is not None:
+        header.update(summarize_subset(stratum_by_id, entry_correctness))
+        accuracy = header["accuracy"]
+    sample_summary = summarize_samples(sample_validity)
+    if sample_summary:
+        header.update(sample_summary)
+        print_sample_summary(test_category, sample_summary)
+    result.insert(0, header)
     output_file_name = f"{VERSION_PREFIX}_{test_category}_score.json"
     output_file_dir = score_dir / model_name
     write_list_of_dicts_to_file(output_file_name, result, output_file_dir)
 
-    return accuracy, len(model_result)
+    return accuracy, len(model_result), entry_correctness
+
+
+def _check_ast_sample(
+    handler,
+    model_result_item,
+    prompt_entry,
+    possible_answer_item,
+    language,
+    test_category,
+    model_name,
+    index,
+) -> dict:
+    prompt_item = prompt_entry["function"]
+
+    try:
+        model_result_item_raw = model_result_item
+        model_result_item = handler.decode_ast(model_result_item, language)
+    except Exception as e:
+        return {
+            "id": index,
+            "model_name": model_name,
+            "test_category": test_category,
+            "valid": False,
+            "error": [f"Invalid syntax. Failed to decode AST. {str(e)}"],
+            "error_type": "ast_decoder:decoder_failed",
+            "prompt": prompt_entry,
+            "model_result_raw": model_result_item_raw,
+            "possible_answer": possible_answer_item,
+        }
+
+    decoder_output_valid = is_function_calling_format_output(model_result_item)
+    if not decoder_output_valid:
+        return {
+            "id": index,
+            "model_name": model_name,
+            "test_category": test_category,
+            "valid": False,
+            "error": [
+                "Did not output in the specified format. Note: the model_result is wrapped in a string to ensure json serializability."
+            ],
+            "error_type": "ast_decoder:decoder_wrong_output_format",
+            "prompt": prompt_entry,
+            "model_result_raw": str(model_result_item_raw),
+            "model_result_decoded": str(model_result_item),
+            "possible_answer": possible_answer_item,
+        }
+
+    checker_result = ast_checker(
+        prompt_item,
+        model_result_item,
+        possible_answer_item,
+        language,
+        test_category,
+        model_name,
+    )
+
+    if checker_result["valid"]:
+        return {"valid": True}
+
+    temp = {}
+    temp["id"] = index
+    temp["model_name"] = model_name
+    temp["test_category"] = test_category
+    temp["valid"] = checker_result["valid"]
+    temp["error"] = checker_result["error"]
+    temp["error_type"] = checker_result["error_type"]
+    temp["prompt"] = prompt_entry
+    temp["model_result_raw"] = model_result_item_raw
+    temp["model_result_decoded"] = model_result_item
+    temp["possible_answer"] = possible_answer_item
+    return temp
 
 
 def ast_file_runner(
@@ -252,6 +448,7 @@ def ast_file_runner(
     test_category,
     model_name,
     score_dir,
+    stratum_by_id=None,
 ):
     assert (
         len(model_result) == len(prompt) == len(possible_answer)
@@ -259,94 +456,61 @@ def ast_file_runner(
 
     result = []
     correct_count = 0
+    # Whether each sample of each entry is correct, for entries generated with `--num-samples`
+    sample_validity = []
     for i in range(len(model_result)):
         index: str = model_result[i]["id"]
-        model_result_item = model_result[i]["result"]
-        prompt_item = prompt[i]["function"]
         possible_answer_item = possible_answer[i]["ground_truth"]
-
-        try:
-            model_result_item_raw = model_result_item
-            model_result_item = handler.decode_ast(model_result_item, language)
-        except Exception as e:
-            result.append(
-                {
-                    "id": index,
-                    "model_name": model_name,
-                    "test_category": test_category,
-                    "valid": False,
-                    "error": [f"Invalid syntax. Failed to decode AST. {str(e)}"],
-                    "error_type": "ast_decoder:decoder_failed",
-                    "prompt": prompt[i],
-                    "model_result_raw": model_result_item_raw,
-                    "possible_answer": possible_answer_item,
-                }
-            )
-            continue
-
-        decoder_output_valid = is_function_calling_format_output(model_result_item)
-        if not decoder_output_valid:
-            result.append(
-                {
-                    "id": index,
-                    "model_name": model_name,
-                    "test_category": test_category,
-                    "valid": False,
-                    "error": [
-                        "Did not output in the specified format. Note: the model_result is wrapped in a string to ensure json serializability."
-                    ],
-                    "error_type": "ast_decoder:decoder_wrong_output_format",
-                    "prompt": prompt[i],
-                    "model_result_raw": str(model_result_item_raw),
-                    "model_result_decoded": str(model_result_item),
-                    "possible_answer": possible_answer_item,
-                }
-            )
-            continue
-
-        checker_result = ast_checker(
-            prompt_item,
-            model_result_item,
-            possible_answer_item,
-            language,
-            test_category,
+        sample_results = _check_entry(
             model_name,
+            test_category,
+            model_result[i],
+            lambda: [
+                _check_ast_sample(
+                    handler,
+                    model_result_item,
+                    prompt[i],
+                    possible_answer_item,
+                    language,
+                    test_category,
+                    model_name,
+                    index,
+                )
+                for model_result_item in get_model_result_samples(model_result[i])
+            ],
         )
-
-        if checker_result["valid"]:
+        sample_validity.append([checker_result["valid"] for checker_result in sample_results])
+        # The accuracy (and the error report) is based on the first sample, as in a single-sample run
+        if sample_results[0]["valid"]:
             correct_count += 1
         else:
-            temp = {}
-            temp["id"] = index
-            temp["model_name"] = model_name
-            temp["test_category"] = test_category
-            temp["valid"] = checker_result["valid"]
-            temp["error"] = checker_result["error"]
-            temp["error_type"] = checker_result["error_type"]
-            temp["prompt"] = prompt[i]
-            temp["model_result_raw"] = model_result_item_raw
-            temp["model_result_decoded"] = model_result_item
-            temp["possible_answer"] = possible_answer_item
-            result.append(temp)
+            result.append(sample_results[0])
 
     accuracy = correct_count / len(model_result)
-    result.insert(
-        0,
-        {
-            "accuracy": accuracy,
-            "correct_count": correct_count,
-            "total_count": len(model_result),
-        },
-    )
+    header = {
+        "accuracy": accuracy,
+        "correct_count": correct_count,
+        "total_count": len(model_result),
+    }
+    entry_correctness = get_entry_correctness(model_result, result)
+    # On a subset, the accuracy is estimated for the whole category
+    if stratum_by_id is not None:
+        header.update(summarize_subset(stratum_by_id, entry_correctness))
+        accuracy = header["accuracy"]
+    sample_summary = summarize_samples(sample_validity)
+    if sample_summary:
+        header.update(sample_summary)
+        print_sample_summary(test_category, sample_summary)
+    result.insert(0, header)
     output_file_name = f"{VERSION_PREFIX}_{test_category}_score.json"
     output_file_dir = score_dir / model_name
     write_list_of_dicts_to_file(output_file_name, result, output_file_dir)
 
-    return accuracy, len(model_result)
+    return accuracy, len(model_result), entry_correctness
 
 
 #### Main runner function ####
-def runner(model_names, test_categories, result_dir, score_dir):
+def runner(model_names, test_categories, result_dir, score_dir, shard=None, subset=None):
 
     # State udpated by each eval subtask.
     state = dict(
@@ -354,8 +518,15 @@ def runner(model_names, test_categories, result_dir, score_dir):
         # Key is model name, value is a dictionary with keys as test category
         # and values as a dictionary with accuracy and total count.
         leaderboard_table={},
+        # The per-entry correctness of each model and test category, for `bfcl analyze`
+        correctness_bitmap=CorrectnessBitmap(),
     )
 
+    # When evaluating a single shard, the partial score files are written to a dedicated sub-folder.
+    # They are combined into the normal score files by `merge_shard_scores`.
+    if shard is not None:
+        score_dir = score_dir / SHARD_SCORE_FOLDER_NAME / get_shard_dir_name(*shard)
+
     # Get a list of all entries in the folder
     entries = result_dir.iterdir()
 
@@ -379,7 +550,7 @@ def runner(model_names, test_categories, result_dir, score_dir):
             if test_category not in test_categories:
                 continue
 
-            handler = get_handler(model_name_escaped)
+            handler = _get_handler(model_name_escaped)
 
             # We don't evaluate the following categories in the current iteration of the benchmark
             if is_chatable(test_category) or is_sql(test_category) or is_executable(test_category):
@@ -387,6 +558,13 @@ def runner(model_names, test_categories, result_dir, score_dir):
 
             model_result = load_file(model_result_json, sort_by_id=True)
 
+            if shard is not None:
+                model_result = [
+                    entry for entry in model_result if is_in_shard(entry["id"], *shard)
+                ]
+                if len(model_result) == 0:
+                    continue
+
             state = evaluate_task(
                 test_category,
                 result_dir,
@@ -395,12 +573,33 @@ def runner(model_names, test_categories, result_dir, score_dir):
                 model_name,
                 handler,
                 state,
+                shard,
+                subset,
             )
 
+    if shard is not None:
+        # The leaderboard can only be generated once all shards are merged.
+        # We keep the per-shard cost and latency data so that the merged leaderboard matches a single-node run.
+        state["correctness_bitmap"].save(score_dir / CORRECTNESS_BITMAP_FILE_NAME)
+        # Written last, as it marks the shard as complete
+        with open(score_dir / SHARD_LEADERBOARD_TABLE_FILE_NAME, "w") as f:
+            json.dump(
+                {
+                    model_name: {
+                        key: item.to_dict() if isinstance(item, CostLatencyStats) else item
+                        for key, item in value.items()
+                    }
+                    for model_name, value in state["leaderboard_table"].items()
+                },
+                f,
+            )
+        return
+
     # This function reads all the score files from local folder and updates the
     # leaderboard table. This is helpful when you only want to run the
     # evaluation for a subset of models and test categories.
     update_leaderboard_table_with_local_score_file(state["leaderboard_table"], score_dir)
+    update_correctness_bitmap_file(state["correctness_bitmap"], score_dir)
     # Write the leaderboard table to a file
     generate_leaderboard_csv(
         state["leaderboard_table"], score_dir, model_names, test_categories
@@ -415,6 +614,8 @@ def evaluate_task(
     model_name,
     handler,
     state,
+    shard=None,
+    subset=None,
 ):
 
     language = "Python"
@@ -425,24 +626,50 @@ def evaluate_task(
 
     print(f"🔍 Running test: {test_category}")
 
-    record_cost_latency(state["leaderboard_table"], model_name, model_result)
-
     # Find the corresponding test file.
     prompt_file = find_file_with_suffix(PROMPT_PATH, test_category)
-    prompt = load_file(prompt_file, sort_by_id=True)
+    prompt = _load_dataset_file(prompt_file)
+    # The correctness bitmap is aligned to all the ids of the category, whichever shard or subset of them is evaluated
+    canonical_ids = [entry["id"] for entry in prompt]
+    stratum_by_id = None
+    if subset is not None:
+        # The same stratified sample as `bfcl generate` draws with the same arguments
+        stratum_by_id = get_subset_stratum_by_id(prompt, *subset[:2])
+        subset_ids = {entry["id"] for entry in select_subset(prompt, *subset)}
+        prompt = [entry for entry in prompt if entry["id"] in subset_ids]
+        model_result = [entry for entry in model_result if entry["id"] in subset_ids]
+        if len(model_result) == 0:
+            print(f"⏭️ No result to evaluate in the subset of {test_category}, skipped.")
+            return state
+    if shard is not None:
+        prompt = [entry for entry in prompt if is_in_shard(entry["id"], *shard)]
+
+    record_cost_latency(state["leaderboard_table"], model_name, model_result)
 
     if is_relevance_or_irrelevance(test_category):
-        accuracy, total_count = relevance_file_runner(
-            handler, model_result, prompt, model_name, test_category, score_dir
+        accuracy, total_count, entry_correctness = relevance_file_runner(
+            handler,
+            model_result,
+            prompt,
+            model_name,
+            test_category,
+            score_dir,
+            stratum_by_id,
         )
 
     else:
         # Find the corresponding possible answer file
         possible_answer_file = find_file_with_suffix(POSSIBLE_ANSWER_PATH, test_category)
-        possible_answer = load_file(possible_answer_file, sort_by_id=True)
+        possible_answer = _load_dataset_file(possible_answer_file)
+        if subset is not None:
+            possible_answer = [entry for entry in possible_answer if entry["id"] in subset_ids]
+        if shard is not None:
+            possible_answer = [
+                entry for entry in possible_answer if is_in_shard(entry["id"], *shard)
+            ]
 
         if is_multi_turn(test_category):
-            accuracy, total_count = multi_turn_runner(
+            accuracy, total_count, entry_correctness = multi_turn_runner(
                 handler,
                 model_result,
                 prompt,
@@ -450,11 +677,12 @@ def evaluate_task(
                 model_name,
                 test_category,
                 score_dir,
+                stratum_by_id,
             )
 
         # Single turn test
         else:
-            accuracy, total_count = ast_file_runner(
+            accuracy, total_count, entry_correctness = ast_file_runner(
                 handler,
                 model_result,
                 prompt,
@@ -463,15 +691,203 @@ def evaluate_task(
                 test_category,
                 model_name,
                 score_dir,
+                stratum_by_id,
             )
 
-    record_result(state["leaderboard_table"], model_name, test_category, accuracy, total_count)
+    if stratum_by_id is not None:
+        # Weighted by the size of the whole category, as the accuracy is estimated for all of it
+        subset_summary = summarize_subset(stratum_by_id, entry_correctness)
+        record_result(
+            state["leaderboard_table"],
+            model_name,
+            test_category,
+            accuracy,
+            subset_summary["subset_population_count"],
+            subset_summary["subset_strata"],
+        )
+    else:
+        record_result(
+            state["leaderboard_table"], model_name, test_category, accuracy, total_count
+        )
+    state["correctness_bitmap"].record(
+        model_name, test_category, canonical_ids, entry_correctness
+    )
     print(f"✅ Test completed: {test_category}. 🎯 Accuracy: {accuracy}")
 
     return state
 
 
-def main(model, test_categories, result_dir, score_dir):
+def update_correctness_bitmap_file(correctness_bitmap, score_dir):
+    """
+    Add the newly evaluated models and test categories to the correctness bitmap file of the score folder, keeping the others.
+    """
+    bitmap_file = score_dir / CORRECTNESS_BITMAP_FILE_NAME
+    stored_bitmap = CorrectnessBitmap.load(bitmap_file)
+    stored_bitmap.update(correctness_bitmap)
+    stored_bitmap.save(bitmap_file)
+
+
+def merge_shard_scores(score_dir):
+    """
+    Combine the partial score files written by `bfcl evaluate --shard i/N` into the normal score files and leaderboard CSVs.
+    The output is identical to evaluating all the shards in a single run.
+    """
+    shard_root = score_dir / SHARD_SCORE_FOLDER_NAME
+    shard_dirs = {}
+    for shard_dir in sorted(shard_root.glob("shard_*_of_*")) if shard_root.exists() else []:
+        match = re.fullmatch(r"shard_(\d+)_of_(\d+)", shard_dir.name)
+        if match and shard_dir.is_dir():
+            shard_dirs[(int(match.group(1)), int(match.group(2)))] = shard_dir
+
+    if len(shard_dirs) == 0:
+        raise FileNotFoundError(f"No shard score folders found in {shard_root}.")
+
+    all_num_shards = {num_shards for _, num_shards in shard_dirs}
+    if len(all_num_shards) != 1:
+        raise ValueError(
+            f"Found shard folders from runs with different shard counts {sorted(all_num_shards)} in {shard_root}. Please remove the stale ones."
+        )
+    num_shards = all_num_shards.pop()
+    missing_shards = [
+        f"{shard_index}/{num_shards}"
+        for shard_index in range(num_shards)
+        if (shard_index, num_shards) not in shard_dirs
+        or not (
+            shard_dirs[(shard_index, num_shards)] / SHARD_LEADERBOARD_TABLE_FILE_NAME
+        ).exists()
+    ]
+    if missing_shards:
+        raise FileNotFoundError(
+            f"The following shards are missing or did not complete: {missing_shards}."
+        )
+
+    leaderboard_table = {}
+    # Key is (model name, test category), value is the merged score file content
+    merged_scores = {}
+    correctness_bitmap = CorrectnessBitmap()
+    for shard_dir in shard_dirs.values():
+        # Each shard covers its own entries of every model and test category
+        correctness_bitmap.update(
+            CorrectnessBitmap.load(shard_dir / CORRECTNESS_BITMAP_FILE_NAME), union=True
+        )
+        with open(shard_dir / SHARD_LEADERBOARD_TABLE_FILE_NAME) as f:
+            shard_leaderboard_table = json.load(f)
+        for model_name, value in shard_leaderboard_table.items():
+            if "cost_latency" not in value:
+                continue
+            if model_name not in leaderboard_table:
+                leaderboard_table[model_name] = {"cost_latency": CostLatencyStats()}
+            leaderboard_table[model_name]["cost_latency"].merge(
+                CostLatencyStats.from_dict(value["cost_latency"])
+            )
+
+        for model_dir in shard_dir.iterdir():
+            if not model_dir.is_dir():
+                continue
+            for model_score_json in model_dir.glob("*.json"):
+                test_category = extract_test_category(model_score_json)
+                metadata, *entries = load_file(model_score_json)
+                merged = merged_scores.setdefault(
+                    (model_dir.name, test_category),
+                    {
+                        "correct_count": 0,
+                        "total_count": 0,
+                        "entries": [],
+                        "sample_correct_count": [],
+                        "any_sample_correct_count": 0,
+                        "subset_strata": None,
+                    },
+                )
+                merged["correct_count"] += metadata["correct_count"]
+                merged["total_count"] += metadata["total_count"]
+                merged["entries"].extend(entries)
+                # A shard without the pass@k fields only has single-sample entries
+                sample_correct_count = metadata.get(
+                    "sample_correct_count", [metadata["correct_count"]]
+                )
+                for sample_index, correct_count in enumerate(sample_correct_count):
+                    if sample_index == len(merged["sample_correct_count"]):
+                        merged["sample_correct_count"].append(0)
+                    merged["sample_correct_count"][sample_index] += correct_count
+                merged["any_sample_correct_count"] += metadata.get(
+                    "any_sample_correct_count", metadata["correct_count"]
+                )
+                if "subset_strata" in metadata:
+                    # Each shard has the population counts of the whole category, and its own evaluated entries
+                    if merged["subset_strata"] is None:
+                        merged["subset_strata"] = {
+                            stratum: [population, 0, 0]
+                            for stratum, (population, _, _) in metadata["subset_strata"].items()
+                        }
+                    for stratum, (_, evaluated, correct) in metadata["subset_strata"].items():
+                        merged["subset_strata"][stratum][1] += evaluated
+                        merged["subset_strata"][stratum][2] += correct
+
+    for (model_name, test_category), merged in merged_scores.items():
+        accuracy = merged["correct_count"] / merged["total_count"]
+        result = sorted(merged["entries"], key=sort_key)
+        header = {
+            "accuracy": accuracy,
+            "correct_count": merged["correct_count"],
+            "total_count": merged["total_count"],
+        }
+        subset_strata = merged["subset_strata"]
+        if subset_strata is not None:
+            accuracy = get_subset_accuracy(subset_strata)
+            header["accuracy"] = accuracy
+            header["subset_population_count"] = sum(
+                population for population, _, _ in subset_strata.values()
+            )
+            header["subset_strata"] = subset_strata
+        header.update(
+            get_sample_summary(
+                merged["sample_correct_count"],
+                merged["any_sample_correct_count"],
+                merged["total_count"],
+            )
+        )
+        result.insert(0, header)
+        output_file_name = f"{VERSION_PREFIX}_{test_category}_score.json"
+        write_list_of_dicts_to_file(output_file_name, result, score_dir / model_name)
+        record_result(
+            leaderboard_table,
+            model_name,
+            test_category,
+            accuracy,
+            header.get("subset_population_count", merged["total_count"]),
+            subset_strata,
+        )
+
+    update_leaderboard_table_with_local_score_file(leaderboard_table, score_dir)
+    update_correctness_bitmap_file(correctness_bitmap, score_dir)
+    generate_leaderboard_csv(leaderboard_table, score_dir)
+
+
+def merge_main(score_dir):
+    if score_dir is None:
+        score_dir = SCORE_PATH
+    else:
+        score_dir = (PROJECT_ROOT / score_dir).resolve()
+
+    merge_shard_scores(score_dir)
+
+    print(
+        f"🏁 Shard merge completed. See {score_dir / 'data_overall.csv'} for overall evaluation results on BFCL V3."
+    )
+
+
+def main(
+    model,
+    test_categories,
+    result_dir,
+    score_dir,
+    shard=None,
+    isolated_execution=False,
+    execution_timeout=None,
+    subset_fraction=None,
+    subset_size=None,
+    subset_seed=0,
+):
     if result_dir is None:
         result_dir = RESULT_PATH
     else:
@@ -498,8 +914,29 @@ def main(model, test_categories, result_dir, score_dir):
             # We patch it here to avoid confusing the user.
             model_names.append(model_name.replace("/", "_"))
 
+    if shard is not None:
+        shard = parse_shard_argument(shard)
+
+    subset = None
+    if subset_fraction is not None or subset_size is not None:
+        validate_subset_arguments(subset_fraction, subset_size)
+        subset = (subset_fraction, subset_size, subset_seed)
+
+    if isolated_execution:
+        configure_isolated_execution(True, execution_timeout)
+
     # Driver function to run the evaluation for all categories involved.
-    runner(model_names, all_test_categories, result_dir, score_dir)
+    try:
+        runner(model_names, all_test_categories, result_dir, score_dir, shard, subset)
+    finally:
+        if isolated_execution:
+            configure_isolated_execution(False)
+
+    if shard is not None:
+        print(
+            f"🏁 Evaluation completed for shard {shard[0]}/{shard[1]}. Once all shards are done, run `bfcl merge-scores` to combine them."
+        )
+        return
 
     print(
         f"🏁 Evaluation completed. See {score_dir / 'data_overall.csv'} for overall evaluation results on BFCL V3."
@@ -535,6 +972,42 @@ if __name__ == "__main__":
         type=str,
         help="Path to the folder where the evaluation score files will be stored; relative to the `berkeley-function-call-leaderboard` root folder",
     )
+    parser.add_argument(
+        "--shard",
+        default=None,
+        type=str,
+        help="Only evaluate shard i of N (0-indexed), in the form `i/N`. Use `bfcl merge-scores` to combine the shards afterwards.",
+    )
+    parser.add_argument(
+        "--isolated-execution",
+        action="store_true",
+        default=False,
+        help="Execute the multi-turn function calls in separate worker processes, with a per-call timeout and a memory limit.",
+    )
+    parser.add_argument(
+        "--execution-timeout",
+        default=None,
+        type=float,
+        help="Timeout in seconds for each function call under `--isolated-execution`.",
+    )
+    parser.add_argument(
+        "--subset-fraction",
+        default=None,
+        type=float,
+        help="Only evaluate a stratified sample of this fraction of each test category, as drawn by `generate` with the same arguments.",
+    )
+    parser.add_argument(
+        "--subset-size",
+        default=None,
+        type=int,
+        help="Only evaluate a stratified sample of this many entries of each test category.",
+    )
+    parser.add_argument(
+        "--subset-seed",
+        default=0,
+        type=int,
+        help="Seed of the subset sample.",
+    )
 
     args = parser.parse_args()
 
@@ -544,4 +1017,10 @@ if __name__ == "__main__":
         args.test_category,
         args.result_dir,
         args.score_dir,
+        args.shard,
+        args.isolated_execution,
+        args.execution_timeout,
+        args.subset_fraction,
+        args.subset_size,
+        args.subset_seed,
     )
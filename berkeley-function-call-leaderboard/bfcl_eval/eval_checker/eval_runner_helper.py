@@ -1,14 +1,16 @@
 import os
-import statistics
+import zlib
 from datetime import datetime
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
+from bfcl_eval._json_codec import read_first_jsonl_entry
 from bfcl_eval.constants.category_mapping import TEST_FILE_MAPPING
 from bfcl_eval.constants.column_headers import *
 from bfcl_eval.constants.eval_config import *
 from bfcl_eval.constants.model_config import MODEL_CONFIG_MAPPING
+from bfcl_eval.eval_checker.cost_latency_stats import CostLatencyStats
 from bfcl_eval.utils import extract_test_category, load_file
 
 
@@ -16,6 +18,9 @@ def calculate_weighted_accuracy(accuracy_dict_list, display_na_if_category_missi
     has_na = False
     total_count = 0
     total_accuracy = 0
+    # Bootstrap replicates of the accuracy, for the categories evaluated on a subset; the others count as exact
+    has_bootstrap = False
+    total_bootstrap = 0
     for accuracy_dict in accuracy_dict_list:
         accuracy = accuracy_dict["accuracy"]
         count = accuracy_dict["total_count"]
@@ -24,8 +29,12 @@ def calculate_weighted_accuracy(accuracy_dict_list, display_na_if_category_missi
 
         total_count += count
         total_accuracy += accuracy * count
+        has_bootstrap = has_bootstrap or "bootstrap" in accuracy_dict
+        total_bootstrap = total_bootstrap + accuracy_dict.get("bootstrap", accuracy) * count
 
     result = {"accuracy": total_accuracy / total_count, "total_count": total_count}
+    if has_bootstrap:
+        result["bootstrap"] = total_bootstrap / total_count
 
     if has_na and display_na_if_category_missing:
         result["display_accuracy"] = "N/A"
@@ -39,6 +48,8 @@ def calculate_unweighted_accuracy(accuracy_dict_list, display_na_if_category_mis
     has_na = False
     total_count = 0
     total_accuracy = 0
+    has_bootstrap = False
+    total_bootstrap = 0
     for accuracy_dict in accuracy_dict_list:
         accuracy = accuracy_dict["accuracy"]
         count = accuracy_dict["total_count"]
@@ -48,11 +59,15 @@ def calculate_unweighted_accuracy(accuracy_dict_list, display_na_if_category_mis
 
         total_count += count
         total_accuracy += accuracy
+        has_bootstrap = has_bootstrap or "bootstrap" in accuracy_dict
+        total_bootstrap = total_bootstrap + accuracy_dict.get("bootstrap", accuracy)
 
     result = {
         "accuracy": total_accuracy / len(accuracy_dict_list),
         "total_count": total_count,
     }
+    if has_bootstrap:
+        result["bootstrap"] = total_bootstrap / len(accuracy_dict_list)
 
     if has_na and display_na_if_category_missing:
         result["display_accuracy"] = "N/A"
@@ -62,85 +77,190 @@ def calculate_unweighted_accuracy(accuracy_dict_list, display_na_if_category_mis
     return result
 
 
-def record_result(leaderboard_table, model_name, test_category, accuracy, total_count):
+def record_result(
+    leaderboard_table, model_name, test_category, accuracy, total_count, subset_strata=None
+):
     if model_name not in leaderboard_table:
         leaderboard_table[model_name] = {}
     leaderboard_table[model_name][test_category] = {
         "accuracy": accuracy,
         "total_count": total_count,
     }
+    # Evaluated on a subset: `total_count` is the size of the whole category, so that it weighs as much as in a full run
+    if subset_strata is not None:
+        leaderboard_table[model_name][test_category]["subset_strata"] = subset_strata
+
+
+def get_subset_accuracy(subset_strata: dict[str, list[int]]) -> float:
+    """
+    Estimate the accuracy on the whole category from a stratified subset, weighting the accuracy of each stratum by its size in the category.
+    `subset_strata` maps each stratum to its [population, evaluated, correct] counts; strata without any evaluated entry are left out of the weights.
+    """
+    sampled = [counts for counts in subset_strata.values() if counts[1] > 0]
+    total_population = sum(population for population, _, _ in sampled)
+    if total_population == 0:
+        return 0
+    return sum(
+        population / total_population * correct / evaluated
+        for population, evaluated, correct in sampled
+    )
 
 
-def record_cost_latency(leaderboard_table, model_name, model_output_data):
-    def process_data(key, data, output_list):
-        # All entries are either a list of list (in multi-turn), or a single value (in single-turn)
-        if key in data:
-            if isinstance(data[key], list) and all(
-                isinstance(inner_item, list) for inner_item in data[key]
-            ):
-                flattened_list = sum(data[key], [])
-                output_list.extend(
-                    [
-                        item
-                        for item in flattened_list
-                        if isinstance(item, (int, float)) and item != 0
-                    ]
-                )
-            else:
-                if isinstance(data[key], (int, float)) and data[key] != 0:
-                    output_list.append(data[key])
+def summarize_subset(
+    stratum_by_id: dict[str, str], entry_correctness: dict[str, bool]
+) -> dict:
+    """
+    Score file header fields of a category evaluated on a stratified subset (`--subset-fraction` / `--subset-size`).
+    `stratum_by_id` gives the stratum of every entry of the category, whether evaluated or not.
+    """
+    subset_strata = {}
+    for entry_id, stratum in sorted(stratum_by_id.items()):
+        counts = subset_strata.setdefault(stratum, [0, 0, 0])
+        counts[0] += 1
+        if entry_id in entry_correctness:
+            counts[1] += 1
+            counts[2] += int(entry_correctness[entry_id])
+    return {
+        "accuracy": get_subset_accuracy(subset_strata),
+        "subset_population_count": len(stratum_by_id),
+        "subset_strata": dict(sorted(subset_strata.items())),
+    }
 
-    if model_name not in leaderboard_table:
-        leaderboard_table[model_name] = {}
-        leaderboard_table[model_name]["cost"] = {"input_data": [], "output_data": []}
-        leaderboard_table[model_name]["latency"] = {"data": []}
 
-    input_token = []
-    output_token = []
-    latency = []
-    for data in model_output_data:
-        process_data("latency", data, latency)
-        process_data("input_token_count", data, input_token)
-        process_data("output_token_count", data, output_token)
+def bootstrap_subset_accuracy(
+    subset_strata: dict[str, list[int]], num_resamples: int, seed: int
+) -> np.ndarray:
+    """
+    Bootstrap replicates of `get_subset_accuracy`, resampling the evaluated entries within each stratum.
+    Resampling the n entries of a stratum with replacement draws its correct count from Binomial(n, accuracy), so the counts are enough.
+    The replicates are rescaled by the finite population correction, as the interval is for the accuracy on the whole category: a stratum evaluated in full adds no uncertainty.
+
+    A stratum with a single evaluated entry, or with all of them correct (or all wrong), has no spread to resample. It is perturbed with the normal variance of the plus-four (Agresti-Coull) estimate of its accuracy instead, the center of the Wilson interval, so that it still widens the interval.
+    """
+    rng = np.random.default_rng(seed)
+    sampled = [counts for counts in subset_strata.values() if counts[1] > 0]
+    total_population = sum(population for population, _, _ in sampled)
+    replicates = np.zeros(num_resamples)
+    for population, evaluated, correct in sampled:
+        accuracy = correct / evaluated
+        finite_population_correction = 1 - evaluated / population
+        if evaluated > 1 and 0 < correct < evaluated:
+            resampled = rng.binomial(evaluated, accuracy, num_resamples) / evaluated
+            scale = np.sqrt(finite_population_correction * evaluated / (evaluated - 1))
+            deviation = scale * (resampled - accuracy)
+        else:
+            adjusted = (correct + 2) / (evaluated + 4)
+            deviation = rng.normal(
+                0,
+                np.sqrt(finite_population_correction * adjusted * (1 - adjusted) / (evaluated + 4)),
+                num_resamples,
+            )
+        replicates += population / total_population * (accuracy + deviation)
+    return np.clip(replicates, 0, 1)
+
+
+def get_model_result_samples(model_result_entry: dict) -> list:
+    """
+    Get all the completions generated for an entry with `--num-samples`. Entries generated without it (or that failed) have a single one.
+    """
+    return model_result_entry.get("samples", [model_result_entry["result"]])
+
+
+def get_entry_correctness(model_result: list[dict], score_entries: list[dict]) -> dict[str, bool]:
+    """
+    Map the id of each evaluated entry to whether it is correct, given the entries of the score file, which only lists the failed ones.
+    """
+    failed_ids = {entry["id"] for entry in score_entries if "id" in entry}
+    return {entry["id"]: entry["id"] not in failed_ids for entry in model_result}
+
+
+def summarize_samples(sample_validity: list[list[bool]]) -> dict:
+    """
+    Summarize the per-sample check results of a test category, one list of booleans per entry.
+    Returns an empty dict if there is only one sample per entry.
+    """
+    num_samples = max((len(entry_validity) for entry_validity in sample_validity), default=1)
+    sample_correct_count = [
+        sum(
+            1
+            for entry_validity in sample_validity
+            if len(entry_validity) > sample_index and entry_validity[sample_index]
+        )
+        for sample_index in range(num_samples)
+    ]
+    any_sample_correct_count = sum(
+        1 for entry_validity in sample_validity if any(entry_validity)
+    )
+    return get_sample_summary(
+        sample_correct_count, any_sample_correct_count, len(sample_validity)
+    )
+
 
-    leaderboard_table[model_name]["cost"]["input_data"].extend(input_token)
-    leaderboard_table[model_name]["cost"]["output_data"].extend(output_token)
-    leaderboard_table[model_name]["latency"]["data"].extend(latency)
+def get_sample_summary(
+    sample_correct_count: list[int], any_sample_correct_count: int, total_count: int
+) -> dict:
+    """
+    Build the pass@k fields of a score file header from the number of correct entries for each sample index, and the number of entries with at least one correct sample.
+    An entry with fewer samples than the others (e.g. an inference error) counts as incorrect for the missing ones.
+    """
+    num_samples = len(sample_correct_count)
+    if num_samples <= 1:
+        return {}
+    return {
+        "num_samples": num_samples,
+        "pass@1": sum(sample_correct_count) / (num_samples * total_count),
+        f"pass@{num_samples}": any_sample_correct_count / total_count,
+        "sample_accuracy": [
+            correct_count / total_count for correct_count in sample_correct_count
+        ],
+        "sample_correct_count": sample_correct_count,
+        "any_sample_correct_count": any_sample_correct_count,
+    }
+
+
+def print_sample_summary(test_category: str, sample_summary: dict) -> None:
+    num_samples = sample_summary["num_samples"]
+    print(
+        f"🎲 {test_category}: pass@1 {sample_summary['pass@1']:.4f}, pass@{num_samples} {sample_summary[f'pass@{num_samples}']:.4f}, per-sample accuracy {[round(accuracy, 4) for accuracy in sample_summary['sample_accuracy']]}"
+    )
 
 
-def get_cost_latency_info(model_name, cost_data, latency_data):
+def record_cost_latency(leaderboard_table, model_name, model_output_data):
+    if model_name not in leaderboard_table:
+        leaderboard_table[model_name] = {}
+    if "cost_latency" not in leaderboard_table[model_name]:
+        leaderboard_table[model_name]["cost_latency"] = CostLatencyStats()
+    leaderboard_table[model_name]["cost_latency"].add(model_output_data)
+
+
+def get_cost_latency_info(model_name, cost_latency_stats: CostLatencyStats):
     cost, mean_latency, std_latency, percentile_95_latency = "N/A", "N/A", "N/A", "N/A"
     model_config = MODEL_CONFIG_MAPPING[model_name]
+    latency_summary = cost_latency_stats.latency_summary()
 
     # For API models, we use the input and output token counts to calculate the cost
     if model_config.input_price is not None and model_config.output_price is not None:
-        if len(cost_data["input_data"]) > 0 and len(cost_data["output_data"]) > 0:
-            total_input_tokens = sum(cost_data["input_data"])
-            total_output_tokens = sum(cost_data["output_data"])
+        if cost_latency_stats.num_input_tokens > 0 and cost_latency_stats.num_output_tokens > 0:
             # price is in USD per million tokens
             cost = (
-                total_input_tokens * model_config.input_price / 1000000
-                + total_output_tokens * model_config.output_price / 1000000
+                cost_latency_stats.input_tokens * model_config.input_price / 1000000
+                + cost_latency_stats.output_tokens * model_config.output_price / 1000000
             )
             cost = round(cost, 2)
 
     # For local-hosted models, we calculate the total GPU cost by summing all latencies and multiplying by the hourly GPU price.
-    elif len(latency_data["data"]) > 0:
-        total_latency_seconds = sum(latency_data["data"])
-        total_latency_hours = total_latency_seconds / 3600
+    elif latency_summary:
+        total_latency_hours = latency_summary["total"] / 3600
 
         # Divide by 100 since we are doing 100x parallel inference; this is an approximation to the GPU up-time.
         cost = total_latency_hours * H100_X8_PRICE_PER_HOUR / 100
         cost = round(cost, 2)
 
     # Calculate latency statistics for ALL models (both API and local)
-    if len(latency_data["data"]) != 0:
-        mean_latency = statistics.mean(latency_data["data"])
-        std_latency = statistics.stdev(latency_data["data"])
-        percentile_95_latency = np.percentile(latency_data["data"], 95)
-        mean_latency = round(mean_latency, 2)
-        std_latency = round(std_latency, 2)
-        percentile_95_latency = round(percentile_95_latency, 2)
+    if latency_summary:
+        mean_latency = round(latency_summary["mean"], 2)
+        std_latency = round(latency_summary["std"], 2)
+        percentile_95_latency = round(latency_summary["p95"], 2)
 
     return cost, mean_latency, std_latency, percentile_95_latency
 
@@ -149,6 +269,22 @@ def get_category_score(score_dict: dict, test_category: str) -> dict:
     if test_category in score_dict:
         score = score_dict[test_category]
         score["display_accuracy"] = score["accuracy"]
+        if "subset_strata" in score:
+            unsampled = [
+                stratum
+                for stratum, (_, evaluated, _) in score["subset_strata"].items()
+                if evaluated == 0
+            ]
+            if unsampled:
+                print(
+                    f"⚠️ No result evaluated in the strata {unsampled} of {test_category}; the accuracy is estimated without them."
+                )
+            # Seeded per category, so that the categories are resampled independently but reproducibly
+            score["bootstrap"] = bootstrap_subset_accuracy(
+                score["subset_strata"],
+                SUBSET_BOOTSTRAP_RESAMPLES,
+                seed=zlib.crc32(test_category.encode("utf-8")),
+            )
         return score
     else:
         test_file_path = TEST_FILE_MAPPING[test_category]
@@ -159,6 +295,20 @@ def get_category_score(score_dict: dict, test_category: str) -> dict:
         return {"accuracy": 0, "total_count": num_entry, "display_accuracy": "N/A"}
 
 
+def get_accuracy_with_confidence_interval(accuracy_dict: dict) -> list:
+    """
+    The accuracy and the bounds of its bootstrap confidence interval; the interval is empty when no category underneath was evaluated on a subset.
+    """
+    accuracy = accuracy_dict["display_accuracy"]
+    if accuracy == "N/A":
+        return ["N/A", "N/A", "N/A"]
+    if "bootstrap" not in accuracy_dict:
+        return [accuracy, accuracy, accuracy]
+    alpha = (1 - SUBSET_CONFIDENCE_LEVEL) / 2
+    lower, upper = np.quantile(accuracy_dict["bootstrap"], [alpha, 1 - alpha])
+    return [accuracy, float(lower), float(upper)]
+
+
 def write_score_csv_file(
     data,
     file_path: str,
@@ -198,14 +348,13 @@ def generate_leaderboard_csv(
     data_live = []
     data_multi_turn = []
     data_combined = []
+    data_subset_confidence_interval = []
     for model_name, value in leaderboard_table.items():
         model_name_escaped = model_name.replace("_", "/")
         model_config = MODEL_CONFIG_MAPPING[model_name_escaped]
 
-        cost_data = value.get("cost", {"input_data": [], "output_data": []})
-        latency_data = value.get("latency", {"data": []})
         cost, latency_mean, latency_std, percentile_95_latency = get_cost_latency_info(
-            model_name_escaped, cost_data, latency_data
+            model_name_escaped, value.get("cost_latency", CostLatencyStats())
         )
 
         # Non-Live Score
@@ -388,6 +537,21 @@ def generate_leaderboard_csv(
             ]
         )
 
+        if any("subset_strata" in score for score in value.values() if isinstance(score, dict)):
+            data_subset_confidence_interval.append(
+                ["N/A", model_config.display_name]
+                + [
+                    column
+                    for accuracy_dict in [
+                        total_overall_accuracy,
+                        overall_accuracy_non_live,
+                        overall_accuracy_live,
+                        overall_accuracy_multi_turn,
+                    ]
+                    for column in get_accuracy_with_confidence_interval(accuracy_dict)
+                ]
+            )
+
     # Write Non-Live Score File
     write_score_csv_file(
         data=data_non_live,
@@ -421,6 +585,17 @@ def generate_leaderboard_csv(
         no_conversion_numeric_column_index=[4, 5, 6, 7],
     )
 
+    if data_subset_confidence_interval:
+        write_score_csv_file(
+            data=data_subset_confidence_interval,
+            file_path=output_path / "data_subset_confidence_interval.csv",
+            header=COLUMNS_SUBSET_CONFIDENCE_INTERVAL,
+            sort_column_index=2,
+        )
+        print(
+            f"📊 Some categories were evaluated on a subset; see {output_path / 'data_subset_confidence_interval.csv'} for the {SUBSET_CONFIDENCE_LEVEL:.0%} confidence intervals of the estimated accuracies."
+        )
+
     # TODO: Update and optimize the logic
     # Check if all categories are present and evaluated for all models
     # if eval_models:
@@ -498,13 +673,18 @@ def update_leaderboard_table_with_local_score_file(
         model_name = subdir.relative_to(score_path).name
         # Find and process all JSON files in the subdirectory
         for model_score_json in subdir.glob("*.json"):
-            metadata = load_file(model_score_json)[0]
+            # Only the header line is needed; the rest of the score file can be large
+            metadata = read_first_jsonl_entry(model_score_json)
             accuracy, total_count = metadata["accuracy"], metadata["total_count"]
             test_category = extract_test_category(model_score_json)
             if model_name not in leaderboard_table:
                 leaderboard_table[model_name] = {}
             if test_category not in leaderboard_table[model_name]:
-                leaderboard_table[model_name][test_category] = {
-                    "accuracy": accuracy,
-                    "total_count": total_count,
-                }
+                record_result(
+                    leaderboard_table,
+                    model_name,
+                    test_category,
+                    accuracy,
+                    metadata.get("subset_population_count", total_count),
+                    metadata.get("subset_strata"),
+                )
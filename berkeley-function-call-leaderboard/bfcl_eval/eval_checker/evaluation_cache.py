@@ -0,0 +1,65 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Callable
+
+from bfcl_eval._json_codec import dumps_bytes
+from bfcl_eval.utils import load_file
+
+
+class EvaluationCache:
+    """
+    What `bfcl serve-eval` keeps resident between evaluation jobs: the parsed dataset files, the model handlers, and the verdict of every entry it has checked.
+
+    A verdict is keyed by the model, the test category and the entry id, and kept along with a digest of the whole result entry, so an entry is only checked again once it changes.
+    Only the verdict of the latest version of each entry is kept, so the cache doesn't grow as the results are regenerated.
+    All the verdicts are dropped whenever a dataset file changes on disk, as they depend on the prompts and possible answers.
+    """
+
+    def __init__(self):
+        # File path -> ((mtime, size), entries sorted by id)
+        self._files: dict[Path, tuple[tuple[int, int], list[dict]]] = {}
+        self._handlers: dict = {}
+        # (verdict scope, model, test category, entry id) -> (digest of the result entry, verdict)
+        self._verdicts: dict[tuple, tuple[bytes, object]] = {}
+        # Job options the verdicts depend on, e.g. the function call timeout of `--isolated-execution`
+        self.verdict_scope: tuple = ()
+        self.stats = {"checked": 0, "reused": 0}
+
+    def load_dataset_file(self, file_path) -> list[dict]:
+        """
+        Same as `load_file(file_path, sort_by_id=True)`, but parsed only once as long as the file doesn't change.
+        """
+        file_path = Path(file_path)
+        stat = os.stat(file_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._files.get(file_path)
+        if cached is None or cached[0] != version:
+            if cached is not None:
+                self._verdicts.clear()
+            cached = (version, load_file(file_path, sort_by_id=True))
+            self._files[file_path] = cached
+        # Shallow copies, since the runners may remove fields from the entries
+        return [dict(entry) for entry in cached[1]]
+
+    def get_handler(self, model_name: str, create_handler: Callable):
+        if model_name not in self._handlers:
+            self._handlers[model_name] = create_handler(model_name)
+        return self._handlers[model_name]
+
+    def check_entry(
+        self, model_name: str, test_category: str, model_result_entry: dict, check: Callable
+    ):
+        """
+        Get the verdict `check()` returns for a result entry, reusing the one of an earlier job if the entry hasn't changed since.
+        """
+        digest = hashlib.blake2b(dumps_bytes(model_result_entry), digest_size=16).digest()
+        key = (self.verdict_scope, model_name, test_category, model_result_entry["id"])
+        cached = self._verdicts.get(key)
+        if cached is not None and cached[0] == digest:
+            self.stats["reused"] += 1
+            return cached[1]
+        verdict = check()
+        self._verdicts[key] = (digest, verdict)
+        self.stats["checked"] += 1
+        return verdict
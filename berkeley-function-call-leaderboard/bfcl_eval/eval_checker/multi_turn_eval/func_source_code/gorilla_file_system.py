@@ -1,4 +1,5 @@
 import datetime
+import hashlib
 import subprocess
 from copy import deepcopy
 from typing import Dict, List, Optional, Union
@@ -20,6 +21,12 @@ class File:
         self.name: str = name
         self.content: str = content
         self._last_modified: datetime.datetime = datetime.datetime.now()
+        # Cached byte size of the content, so that `du` does not need to re-encode every file; None if it needs to be recomputed
+        self._size: Optional[int] = None
+        # Cached structural hash of the name and content, used for fast equality checks; None if it needs to be recomputed
+        self._fingerprint: Optional[bytes] = None
+        # The owner lists of every directory content dict that holds this file. See `Directory._contents_owners`.
+        self._containers: List[List["Directory"]] = []
 
     def _write(self, new_content: str) -> None:
         """
@@ -30,6 +37,25 @@ class File:
         """
         self.content = new_content
         self._last_modified = datetime.datetime.now()
+        self._size = None
+        self._fingerprint = None
+        _invalidate_upward(self._containers, structure_changed=False)
+
+    def _get_size(self) -> int:
+        """
+        Get the byte size of the file content.
+        """
+        if self._size is None:
+            self._size = len(self.content.encode("utf-8"))
+        return self._size
+
+    def _get_fingerprint(self) -> bytes:
+        """
+        Get the structural hash of the file. Two files with the same name and content have the same fingerprint.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = _hash_fields(b"file", self.name, self.content)
+        return self._fingerprint
 
     def _read(self) -> str:
         """
@@ -49,6 +75,9 @@ class File:
         """
         self.content += additional_content
         self._last_modified = datetime.datetime.now()
+        self._size = None
+        self._fingerprint = None
+        _invalidate_upward(self._containers, structure_changed=False)
 
     def __repr__(self):
         return f"<<File: {self.name}, Content: {self.content}>>"
@@ -56,7 +85,7 @@ class File:
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, File):
             return False
-        return self.name == other.name and self.content == other.content
+        return self._get_fingerprint() == other._get_fingerprint()
 
 
 class Directory:
@@ -72,6 +101,117 @@ class Directory:
         self.parent: Optional["Directory"] = parent
         self.contents: Dict[str, Union["File", "Directory"]] = {}
 
+        # `mv` hands the same content dict over to the new directory, so several directories can share one content dict.
+        # This is the list of all directories using `self.contents`; every directory sharing the dict also shares this list.
+        self._contents_owners: List["Directory"] = [self]
+        # The owner lists of every content dict that holds this directory.
+        # `cp` copies the content dict shallowly, so a file or directory can be held by more than one directory.
+        self._containers: List[List["Directory"]] = []
+        # Cached total byte size of all files under this directory; None if it needs to be recomputed
+        self._size: Optional[int] = None
+        # Cached structural (Merkle) hash of the name and everything under this directory; None if it needs to be recomputed
+        self._fingerprint: Optional[bytes] = None
+        # Cached index from a relative path (as a tuple of names) to every item under this directory, in depth-first order, for `find`; None if it needs to be rebuilt
+        self._path_index: Optional[Dict[tuple, Union["File", "Directory"]]] = None
+
+    def __getstate__(self) -> dict:
+        # The path index is cheap to rebuild, so don't spend time copying it along with the instance
+        state = self.__dict__.copy()
+        state["_path_index"] = None
+        return state
+
+    def _set_item(self, item_name: str, item: Union["File", "Directory"]) -> None:
+        """
+        Put an item (file or subdirectory) into the directory, keeping the cached sizes and path indexes up to date.
+
+        Args:
+            item_name (str): The name of the item.
+            item (File or Directory): The item to put.
+        """
+        if item_name in self.contents:
+            self._pop_item(item_name)
+        self.contents[item_name] = item
+        item._containers.append(self._contents_owners)
+        _invalidate_upward([self._contents_owners], structure_changed=True)
+
+    def _pop_item(self, item_name: str) -> Union["File", "Directory"]:
+        """
+        Remove an item (file or subdirectory) from the directory, keeping the cached sizes and path indexes up to date.
+
+        Args:
+            item_name (str): The name of the item to remove.
+
+        Returns:
+            item (File or Directory): The removed item.
+        """
+        item = self.contents.pop(item_name)
+        for i, owners in enumerate(item._containers):
+            if owners is self._contents_owners:
+                del item._containers[i]
+                break
+        _invalidate_upward([self._contents_owners], structure_changed=True)
+        return item
+
+    def _share_contents_of(self, other: "Directory") -> None:
+        """
+        Make this directory use the same content dict as `other`; changes made through one are visible through the other.
+        """
+        for item_name in list(self.contents):
+            self._pop_item(item_name)
+        self._contents_owners[:] = [
+            owner for owner in self._contents_owners if owner is not self
+        ]
+        self.contents = other.contents
+        self._contents_owners = other._contents_owners
+        self._contents_owners.append(self)
+        _invalidate_upward([self._contents_owners], structure_changed=True)
+
+    def _copy_contents_of(self, other: "Directory") -> None:
+        """
+        Shallow copy the content dict of `other` into this directory; the items themselves are shared.
+        """
+        for item_name in list(self.contents):
+            self._pop_item(item_name)
+        for item_name, item in other.contents.items():
+            self._set_item(item_name, item)
+
+    def _get_size(self) -> int:
+        """
+        Get the total byte size of all files under this directory.
+        """
+        if self._size is None:
+            self._size = sum(item._get_size() for item in self.contents.values())
+        return self._size
+
+    def _get_fingerprint(self) -> bytes:
+        """
+        Get the structural hash of the directory, built from the fingerprints of its items.
+        Two directories compare equal exactly when they have the same fingerprint, so state checks don't need to walk the whole tree.
+        """
+        if self._fingerprint is None:
+            fields = [b"directory", self.name]
+            # Dict equality doesn't depend on the insertion order
+            for item_name in sorted(self.contents):
+                fields.append(item_name)
+                fields.append(self.contents[item_name]._get_fingerprint())
+            self._fingerprint = _hash_fields(*fields)
+        return self._fingerprint
+
+    def _get_path_index(self) -> Dict[tuple, Union["File", "Directory"]]:
+        """
+        Get the mapping from relative path (a tuple of names) to every item under this directory, in depth-first order.
+        The returned dict is shared with the cache and must not be modified.
+        """
+        if self._path_index is None:
+            path_index = {}
+            for item_name, item in self.contents.items():
+                path_index[(item_name,)] = item
+                if isinstance(item, Directory):
+                    for sub_path, sub_item in item._get_path_index().items():
+                        path_index[(item_name,) + sub_path] = sub_item
+            self._path_index = path_index
+        return self._path_index
+
     def _add_file(self, file_name: str, content: str = "") -> None:
         """
         Add a new file to the directory.
@@ -85,7 +225,7 @@ class Directory:
                 f"File '{file_name}' already exists in directory '{self.name}'."
             )
         new_file = File(file_name, content)
-        self.contents[file_name] = new_file
+        self._set_item(file_name, new_file)
 
     def _add_directory(self, dir_name: str) -> None:
         """
@@ -99,7 +239,7 @@ class Directory:
                 f"Directory '{dir_name}' already exists in directory '{self.name}'."
             )
         new_dir = Directory(dir_name, self)
-        self.contents[dir_name] = new_dir
+        self._set_item(dir_name, new_dir)
 
     def _get_item(self, item_name: str) -> Union["File", "Directory", None]:
         """
@@ -130,7 +270,58 @@ class Directory:
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, Directory):
             return False
-        return self.name == other.name and self.contents == other.contents
+        try:
+            return self._get_fingerprint() == other._get_fingerprint()
+        except RecursionError:
+            # `cp` of a directory into itself creates a cycle that cannot be hashed; compare the contents instead
+            return self.name == other.name and self.contents == other.contents
+
+
+def _hash_fields(*fields: Union[str, bytes]) -> bytes:
+    """
+    Hash a sequence of fields into a fingerprint. Each field is length-prefixed, so different sequences never produce the same input.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    for field in fields:
+        if isinstance(field, str):
+            # Model outputs may contain lone surrogates, which plain UTF-8 can't encode
+            field = field.encode("utf-8", "surrogatepass")
+        hasher.update(len(field).to_bytes(8, "big"))
+        hasher.update(field)
+    return hasher.digest()
+
+
+def _invalidate_upward(
+    owner_lists: List[List[Directory]], structure_changed: bool
+) -> None:
+    """
+    Invalidate the cached sizes and fingerprints (and path indexes, if the structure changed) of the given directories and all directories above them.
+
+    Args:
+        owner_lists (List[List[Directory]]): The owner lists of the content dicts that have changed.
+        structure_changed (bool): Whether items were added or removed, as opposed to only file content being changed.
+    """
+    stack = [directory for owners in owner_lists for directory in owners]
+    visited = set()
+    while stack:
+        directory = stack.pop()
+        # `cp` can create cycles, so we need to keep track of the visited directories
+        if id(directory) in visited:
+            continue
+        visited.add(id(directory))
+        # Caches are always computed bottom-up, so a directory whose caches are all invalid has invalid caches above it and we can stop early
+        if (
+            not structure_changed
+            and directory._size is None
+            and directory._fingerprint is None
+        ):
+            continue
+        directory._size = None
+        directory._fingerprint = None
+        if structure_changed:
+            directory._path_index = None
+        for owners in directory._containers:
+            stack.extend(owners)
 
 
 DEFAULT_STATE = {"root": Directory("/", None)}
@@ -221,14 +412,14 @@ class GorillaFileSystem:
                 is_bottommost = False
                 new_dir = Directory(dir_name, parent)
                 new_dir = self._load_directory(dir_data["contents"], new_dir)
-                parent.contents[dir_name] = new_dir
+                parent._set_item(dir_name, new_dir)
 
             elif dir_data["type"] == "file":
                 content = dir_data["content"]
                 if self.long_context and dir_name not in FILES_TAIL_USED:
                     content += FILE_CONTENT_EXTENSION
                 new_file = File(dir_name, content)
-                parent.contents[dir_name] = new_file
+                parent._set_item(dir_name, new_file)
 
         if is_bottommost and self.long_context:
             self._populate_directory(parent)
@@ -412,18 +603,14 @@ class GorillaFileSystem:
             matches (List[str]): A list of matching file and directory paths relative to the given path.
 
         """
-        matches = []
         target_dir = self._current_dir
+        base_path = path.rstrip("/")
 
-        def recursive_search(directory: Directory, base_path: str) -> None:
-            for item_name, item in directory.contents.items():
-                item_path = f"{base_path}/{item_name}"
-                if name is None or name in item_name:
-                    matches.append(item_path)
-                if isinstance(item, Directory):
-                    recursive_search(item, item_path)
-
-        recursive_search(target_dir, path.rstrip("/"))
+        matches = [
+            f"{base_path}/{'/'.join(relative_path)}"
+            for relative_path in target_dir._get_path_index()
+            if name is None or name in relative_path[-1]
+        ]
         return {"matches": matches}
 
     def wc(self, file_name: str, mode: str = "l") -> Dict[str, Union[int, str]]:
@@ -513,19 +700,11 @@ class GorillaFileSystem:
         Returns:
             disk_usage (str): The estimated disk usage.
         """
-
-        def get_size(item: Union[File, Directory]) -> int:
-            if isinstance(item, File):
-                return len(item._read().encode("utf-8"))
-            elif isinstance(item, Directory):
-                return sum(get_size(child) for child in item.contents.values())
-            return 0
-
         target_dir = self._navigate_to_directory(None)
         if isinstance(target_dir, dict):  # Error condition check
             return target_dir
 
-        total_size = get_size(target_dir)
+        total_size = target_dir._get_size()
 
         if human_readable:
             for unit in ["B", "KB", "MB", "GB", "TB"]:
@@ -631,12 +810,12 @@ class GorillaFileSystem:
                         "error": f"mv: cannot move '{source}' to '{destination}/{source}': File exists"
                     }
                 else:
-                    self._current_dir.contents.pop(source)
+                    self._current_dir._pop_item(source)
                     if isinstance(item, File):
                         dest_item._add_file(source, item.content)
                     else:
                         dest_item._add_directory(source)
-                        dest_item.contents[source].contents = item.contents
+                        dest_item.contents[source]._share_contents_of(item)
                     return {"result": f"'{source}' moved to '{destination}/{source}'"}
             else:
                 return {
@@ -644,12 +823,12 @@ class GorillaFileSystem:
                 }
         else:
             # Destination is not an existing directory, move/rename the item
-            self._current_dir.contents.pop(source)
+            self._current_dir._pop_item(source)
             if isinstance(item, File):
                 self._current_dir._add_file(destination, item.content)
             else:
                 self._current_dir._add_directory(destination)
-                self._current_dir.contents[destination].contents = item.contents
+                self._current_dir.contents[destination]._share_contents_of(item)
             return {"result": f"'{source}' moved to '{destination}'"}
 
     def rm(self, file_name: str) -> Dict[str, str]:
@@ -665,7 +844,7 @@ class GorillaFileSystem:
         if file_name in self._current_dir.contents:
             item = self._current_dir._get_item(file_name)
             if isinstance(item, File) or isinstance(item, Directory):
-                self._current_dir.contents.pop(file_name)
+                self._current_dir._pop_item(file_name)
                 return {"result": f"'{file_name}' removed"}
             else:
                 return {
@@ -692,7 +871,7 @@ class GorillaFileSystem:
                         "error": f"rmdir: failed to remove '{dir_name}': Directory not empty"
                     }
                 else:
-                    self._current_dir.contents.pop(dir_name)
+                    self._current_dir._pop_item(dir_name)
                     return {"result": f"'{dir_name}' removed"}
             else:
                 return {"error": f"rmdir: cannot remove '{dir_name}': Not a directory"}
@@ -746,7 +925,7 @@ class GorillaFileSystem:
                         dest_item._add_file(source, item.content)
                     else:
                         dest_item._add_directory(source)
-                        dest_item.contents[source].contents = item.contents.copy()
+                        dest_item.contents[source]._copy_contents_of(item)
                     return {"result": f"'{source}' copied to '{destination}/{source}'"}
             else:
                 return {
@@ -758,7 +937,7 @@ class GorillaFileSystem:
                 self._current_dir._add_file(destination, item.content)
             else:
                 self._current_dir._add_directory(destination)
-                self._current_dir.contents[destination].contents = item.contents.copy()
+                self._current_dir.contents[destination]._copy_contents_of(item)
             return {"result": f"'{source}' copied to '{destination}'"}
 
     def _navigate_to_directory(
@@ -781,6 +960,7 @@ class GorillaFileSystem:
         dirs = path.strip("/").split("/")
         temp_dir = self._current_dir if not path.startswith("/") else self.root
 
+        # A walk of the path components rather than a path index lookup: the index is dropped on every structural change, and rebuilding it costs a walk of the whole subtree
         for dir_name in dirs:
             next_dir = temp_dir._get_item(dir_name)
             if isinstance(next_dir, Directory):
@@ -2,6 +2,10 @@ import random
 from copy import deepcopy
 from typing import Dict, List, Optional, Union
 
+from bfcl_eval.eval_checker.multi_turn_eval.func_source_code.search_index import (
+    SubstringIndex,
+)
+
 DEFAULT_STATE = {
     "generated_ids": set(),
     "user_count": 4,
@@ -64,6 +68,11 @@ class MessageAPI:
         self.inbox: List[Dict[str, str]]
         self.message_count: int
         self.current_user: Optional[str]
+        # Substring index over the message contents, keyed by the position in `inbox`.
+        # New messages are indexed lazily on the next search; deleting a message shifts the positions, so the index is rebuilt.
+        self._message_index = SubstringIndex()
+        # Set if some message can't be indexed, in which case we fall back to scanning the inbox
+        self._message_index_unusable: bool = False
         self._api_description = "This tool belongs to the Message API, which is used to manage user interactions in a workspace."
 
     def _load_scenario(self, scenario: dict, long_context=False) -> None:
@@ -85,6 +94,7 @@ class MessageAPI:
             "message_count", DEFAULT_STATE_COPY["message_count"]
         )
         self.current_user = scenario.get("current_user", DEFAULT_STATE_COPY["current_user"])
+        self._reset_message_index()
 
     def __eq__(self, value: object) -> bool:
         if not isinstance(value, MessageAPI):
@@ -116,6 +126,33 @@ class MessageAPI:
         self.generated_ids.add(new_id)
         return {"new_id": new_id}
 
+    def _reset_message_index(self) -> None:
+        self._message_index = SubstringIndex()
+        self._message_index_unusable = False
+
+    def _update_message_index(self) -> bool:
+        """
+        Index the messages added to the inbox since the last update.
+
+        Returns:
+            usable (bool): Whether the index can be used. If not, the caller should scan the inbox instead.
+        """
+        if len(self._message_index) > len(self.inbox):
+            # The inbox has been replaced, so start over
+            self._reset_message_index()
+        if self._message_index_unusable:
+            return False
+
+        for position in range(len(self._message_index), len(self.inbox)):
+            try:
+                _, message_content = list(self.inbox[position].items())[0]
+                self._message_index.add(position, message_content)
+            except (AttributeError, IndexError, TypeError):
+                # Scanning the inbox raises the same errors as before for malformed messages
+                self._message_index_unusable = True
+                return False
+        return True
+
     def list_users(self) -> Dict[str, List[str]]:
         """
         List all users in the workspace.
@@ -214,6 +251,7 @@ class MessageAPI:
             receiver, _ = list(message.items())[0]
             if receiver == receiver_id:
                 self.inbox.remove(message)
+                self._reset_message_index()
                 return {
                     "deleted_status": True,
                     "message_id": receiver,
@@ -281,6 +319,18 @@ class MessageAPI:
             return {"error": "No user is currently logged in."}
         keyword_lower = keyword.lower()
         results = []
+        if self._update_message_index():
+            # Report the matches in inbox order
+            for position in sorted(self._message_index.search(keyword)):
+                receiver_id, message_content = list(self.inbox[position].items())[0]
+                results.append(
+                    {
+                        "receiver_id": receiver_id,
+                        "message": message_content,
+                    }
+                )
+            return {"results": results}
+
         # Iterate through the inbox to search for the keyword in messages
         # for message_id, message_data in self.inbox.items():
         for message_data in self.inbox:
@@ -1,5 +1,10 @@
 from copy import deepcopy
-from typing import Dict, List, Optional, Union
+from itertools import islice
+from typing import Dict, List, Optional, Set, Union
+
+from bfcl_eval.eval_checker.multi_turn_eval.func_source_code.search_index import (
+    SubstringIndex,
+)
 
 DEFAULT_STATE = {
     "username": "john",
@@ -24,6 +29,14 @@ class TwitterAPI:
         self.following_list: List[str]
         # tweet_counter is used to assign unique IDs to tweets, it might not be the same as the length of the tweets list for different scenarios
         self.tweet_counter: int
+        # Indexes over `tweets`, caught up lazily with the tweets posted since the last lookup.
+        # Tweets are never removed, but `post_tweet` can overwrite an existing ID, in which case the indexes are rebuilt.
+        self._tweet_content_index = SubstringIndex()
+        self._tweets_by_tag: Dict[str, Set[int]] = {}  # lowercased tag -> tweet IDs
+        self._tweets_by_user: Dict[str, List[int]] = {}  # username -> tweet IDs, in `tweets` order
+        self._tweet_rank: Dict[int, int] = {}  # tweet ID -> position in `tweets`
+        # Set if some tweet can't be indexed, in which case we fall back to scanning the tweets
+        self._tweet_index_unusable: bool = False
         self._api_description = "This tool belongs to the TwitterAPI, which provides core functionality for posting tweets, retweeting, commenting, and following users on Twitter."
 
     def _load_scenario(self, scenario: dict, long_context=False) -> None:
@@ -48,6 +61,40 @@ class TwitterAPI:
         self.tweet_counter = scenario.get(
             "tweet_counter", DEFAULT_STATE_COPY["tweet_counter"]
         )
+        self._reset_tweet_index()
+
+    def _reset_tweet_index(self) -> None:
+        self._tweet_content_index = SubstringIndex()
+        self._tweets_by_tag = {}
+        self._tweets_by_user = {}
+        self._tweet_rank = {}
+        self._tweet_index_unusable = False
+
+    def _update_tweet_index(self) -> bool:
+        """
+        Index the tweets posted since the last update.
+
+        Returns:
+            usable (bool): Whether the indexes can be used. If not, the caller should scan the tweets instead.
+        """
+        if len(self._tweet_rank) > len(self.tweets):
+            # The tweets have been replaced, so start over
+            self._reset_tweet_index()
+        if self._tweet_index_unusable:
+            return False
+
+        for tweet_id, tweet in islice(self.tweets.items(), len(self._tweet_rank), None):
+            try:
+                self._tweet_content_index.add(tweet_id, tweet["content"])
+                for tag in tweet["tags"]:
+                    self._tweets_by_tag.setdefault(tag.lower(), set()).add(tweet_id)
+                self._tweets_by_user.setdefault(tweet["username"], []).append(tweet_id)
+            except (AttributeError, KeyError, TypeError):
+                # Scanning the tweets raises the same errors as before for malformed tweets
+                self._tweet_index_unusable = True
+                return False
+            self._tweet_rank[tweet_id] = len(self._tweet_rank)
+        return True
 
     def authenticate_twitter(self, username: str, password: str) -> Dict[str, bool]:
         """
@@ -100,6 +147,9 @@ class TwitterAPI:
             "tags": tags,
             "mentions": mentions,
         }
+        if self.tweet_counter in self._tweet_rank:
+            # Overwriting an indexed tweet
+            self._reset_tweet_index()
         self.tweets[self.tweet_counter] = tweet
         self.tweet_counter += 1
         return tweet
@@ -251,6 +301,15 @@ class TwitterAPI:
                 - tags (List[str]): List of tags associated with the tweet.
                 - mentions (List[str]): List of users mentioned in the tweet.
         """
+        if self._update_tweet_index():
+            try:
+                return [
+                    self.tweets[tweet_id]
+                    for tweet_id in self._tweets_by_user.get(username, [])
+                ]
+            except TypeError:
+                # Unhashable username, which can't match any tweet
+                return []
         return [tweet for tweet in self.tweets.values() if tweet["username"] == username]
 
     def search_tweets(self, keyword: str) -> List[Dict[str, Union[int, str, List[str]]]]:
@@ -267,6 +326,17 @@ class TwitterAPI:
                 - tags (List[str]): List of tags associated with the tweet.
                 - mentions (List[str]): List of users mentioned in the tweet.
         """
+        if not self.tweets:
+            return []
+        if self._update_tweet_index():
+            matching_tweet_ids = self._tweet_content_index.search(
+                keyword
+            ) | self._tweets_by_tag.get(keyword.lower(), set())
+            # Report the matches in `tweets` order
+            return [
+                self.tweets[tweet_id]
+                for tweet_id in sorted(matching_tweet_ids, key=self._tweet_rank.get)
+            ]
         return [
             tweet
             for tweet in self.tweets.values()
@@ -300,9 +370,7 @@ class TwitterAPI:
             following_count (int): Number of users the specified user is following.
             retweet_count (int): Number of retweets made by the user.
         """
-        tweet_count = len(
-            [tweet for tweet in self.tweets.values() if tweet["username"] == username]
-        )
+        tweet_count = len(self.get_user_tweets(username))
         following_count = len(self.following_list) if username == self.username else 0
         retweet_count = len(self.retweets.get(username, []))
 
@@ -0,0 +1,72 @@
+from typing import Dict, Hashable, Optional, Set
+
+# Length of the character n-grams used by the index. Keywords shorter than this can't be looked up and are checked against every item.
+NGRAM_SIZE = 3
+
+
+def _ngrams(text: str) -> Set[str]:
+    return {text[i : i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class SubstringIndex:
+    """
+    A character n-gram index for case-insensitive substring search over a collection of texts.
+
+    Each text is stored under a key chosen by the caller (e.g. a message position or a tweet ID).
+    `search(keyword)` returns the keys of all texts where `keyword.lower() in text.lower()`, which is the check the simulators used to do by scanning every text.
+    The returned keys are unordered; callers sort them to reproduce the order of their own collections.
+    """
+
+    def __init__(self) -> None:
+        self._lowered_texts: Dict[Hashable, str] = {}
+        self._postings: Dict[str, Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._lowered_texts)
+
+    def add(self, key: Hashable, text: str) -> None:
+        """
+        Add a text to the index, replacing any text previously stored under the same key.
+        """
+        lowered_text = text.lower()
+        if key in self._lowered_texts:
+            self.remove(key)
+        self._lowered_texts[key] = lowered_text
+        for ngram in _ngrams(lowered_text):
+            self._postings.setdefault(ngram, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        """
+        Remove the text stored under the key from the index.
+        """
+        lowered_text = self._lowered_texts.pop(key)
+        for ngram in _ngrams(lowered_text):
+            postings = self._postings[ngram]
+            postings.discard(key)
+            if not postings:
+                del self._postings[ngram]
+
+    def search(self, keyword: str) -> Set[Hashable]:
+        """
+        Get the keys of all texts that contain the keyword, ignoring case.
+        """
+        keyword_lower = keyword.lower()
+        candidates: Optional[Set[Hashable]] = None
+        if len(keyword_lower) >= NGRAM_SIZE:
+            # Every n-gram of the keyword must appear in a matching text; start from the rarest one
+            for postings in sorted(
+                (self._postings.get(ngram, set()) for ngram in _ngrams(keyword_lower)),
+                key=len,
+            ):
+                candidates = (
+                    set(postings) if candidates is None else candidates & postings
+                )
+                if not candidates:
+                    return set()
+        if candidates is None:
+            candidates = self._lowered_texts.keys()
+
+        # The n-grams only narrow down the candidates; confirm with the actual substring check
+        return {
+            key for key in candidates if keyword_lower in self._lowered_texts[key]
+        }
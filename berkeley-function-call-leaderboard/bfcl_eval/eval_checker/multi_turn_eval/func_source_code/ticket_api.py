@@ -30,6 +30,13 @@ class TicketAPI:
         self.ticket_queue: List[Dict[str, Union[int, str]]]
         self.ticket_counter: int
         self.current_user: Optional[str]
+        # Indexes over `ticket_queue`, which is append-only. They are caught up lazily with the tickets added since the last lookup.
+        # Maps each ticket ID to the first ticket with that ID, and each user to their tickets in queue order.
+        self._ticket_by_id: Dict[Union[int, str], Dict[str, Union[int, str]]] = {}
+        self._tickets_by_user: Dict[str, List[Dict[str, Union[int, str]]]] = {}
+        self._indexed_ticket_count: int = 0
+        # Set if some ticket can't be indexed (e.g. a scenario ticket without an ID), in which case we fall back to scanning the queue
+        self._ticket_index_unusable: bool = False
         self._api_description = "This tool belongs to the ticketing system that is part of a company, which allows users to create, view, and manage support business tickets."
 
     def _load_scenario(self, scenario: dict, long_context=False) -> None:
@@ -45,6 +52,7 @@ class TicketAPI:
             "ticket_counter", DEFAULT_STATE_COPY["ticket_counter"]
         )
         self.current_user = scenario.get("current_user", DEFAULT_STATE_COPY["current_user"])
+        self._reset_ticket_index()
 
     def create_ticket(
         self, title: str, description: str = "", priority: int = 1
@@ -185,11 +193,48 @@ class TicketAPI:
             priority (int): Priority level of the ticket.
             created_by (str): Username of the ticket creator.
         """
+        if self._update_ticket_index():
+            try:
+                return self._ticket_by_id.get(ticket_id)
+            except TypeError:
+                # Unhashable ticket ID, which can't match any ticket
+                return None
+
         for ticket in self.ticket_queue:
             if ticket["id"] == ticket_id:
                 return ticket
         return None
 
+    def _reset_ticket_index(self) -> None:
+        self._ticket_by_id = {}
+        self._tickets_by_user = {}
+        self._indexed_ticket_count = 0
+        self._ticket_index_unusable = False
+
+    def _update_ticket_index(self) -> bool:
+        """
+        Add the tickets created since the last update to the indexes.
+
+        Returns:
+            usable (bool): Whether the indexes can be used. If not, the caller should scan the queue instead.
+        """
+        if self._indexed_ticket_count > len(self.ticket_queue):
+            # The queue has been replaced, so start over
+            self._reset_ticket_index()
+        if self._ticket_index_unusable:
+            return False
+
+        for ticket in self.ticket_queue[self._indexed_ticket_count :]:
+            try:
+                self._ticket_by_id.setdefault(ticket["id"], ticket)
+                self._tickets_by_user.setdefault(ticket["created_by"], []).append(ticket)
+            except (KeyError, TypeError):
+                # Scanning the queue raises the same errors as before for malformed tickets
+                self._ticket_index_unusable = True
+                return False
+            self._indexed_ticket_count += 1
+        return True
+
     def ticket_login(self, username: str, password: str) -> Dict[str, bool]:
         """
         Authenticate a user for ticket system.
@@ -249,11 +294,17 @@ class TicketAPI:
         if not self.current_user:
             return [{"error": "User not authenticated. Please log in to view tickets."}]
 
-        user_tickets = [
-            ticket
-            for ticket in self.ticket_queue
-            if ticket["created_by"] == self.current_user
-        ]
+        if self._update_ticket_index():
+            try:
+                user_tickets = list(self._tickets_by_user.get(self.current_user, []))
+            except TypeError:
+                user_tickets = []
+        else:
+            user_tickets = [
+                ticket
+                for ticket in self.ticket_queue
+                if ticket["created_by"] == self.current_user
+            ]
 
         if status:
             user_tickets = [
@@ -1,4 +1,5 @@
 import random
+from bisect import bisect_left, bisect_right, insort
 from copy import deepcopy
 from datetime import datetime, time, timedelta
 from typing import Dict, List, Optional, Union
@@ -15,6 +16,31 @@ from bfcl_eval.eval_checker.multi_turn_eval.func_source_code.long_context import
 
 CURRENT_TIME = datetime(2024, 9, 1, 10, 30)
 
+SYMBOL_BY_NAME = {
+    "Apple": "AAPL",
+    "Google": "GOOG",
+    "Tesla": "TSLA",
+    "Microsoft": "MSFT",
+    "Nvidia": "NVDA",
+    "Zeta Corp": "ZETA",
+    "Alpha Tech": "ALPH",
+    "Omega Industries": "OMEG",
+    "Quasar Ltd.": "QUAS",
+    "Neptune Systems": "NEPT",
+    "Synex Solutions": "SYNX",
+    "Amazon": "AMZN",
+}
+
+STOCKS_BY_SECTOR = {
+    "Technology": ["AAPL", "GOOG", "MSFT", "NVDA"],
+    "Automobile": ["TSLA", "F", "GM"],
+}
+
+LONG_CONTEXT_STOCKS_BY_SECTOR = {
+    "Technology": STOCKS_BY_SECTOR["Technology"] + TECHNOLOGY_EXTENSION,
+    "Automobile": STOCKS_BY_SECTOR["Automobile"] + AUTOMOBILE_EXTENSION,
+}
+
 DEFAULT_STATE = {
     "orders": {
         12345: {
@@ -154,6 +180,10 @@ class TradingBot:
         self.stocks: Dict[str, Dict[str, Union[float, int]]]
         self.watch_list: List[str]
         self.transaction_history: List[Dict[str, Union[str, float, int]]]
+        # Index of `transaction_history` sorted by timestamp, as (timestamp, position) pairs.
+        # `transaction_history` is append-only, so the index is caught up lazily with the entries added since the last query.
+        self._transaction_time_index: List[tuple] = []
+        self._indexed_transaction_count: int = 0
         self._api_description = "This tool belongs to the trading system, which allows users to trade stocks, manage their account, and view stock information."
 
     def _load_scenario(self, scenario: dict, long_context=False) -> None:
@@ -185,6 +215,8 @@ class TradingBot:
         self.transaction_history = scenario.get(
             "transaction_history", DEFAULT_STATE_COPY["transaction_history"]
         )
+        self._transaction_time_index = []
+        self._indexed_transaction_count = 0
         self.long_context = long_context
         self._random = random.Random(
             (scenario.get("random_seed", DEFAULT_STATE_COPY["random_seed"]))
@@ -212,6 +244,24 @@ class TradingBot:
 
         return random_date.strftime("%Y-%m-%d %H:%M:%S")
 
+    def _update_transaction_time_index(self) -> None:
+        """
+        Add the transactions made since the last update to the timestamp index.
+        """
+        if self._indexed_transaction_count > len(self.transaction_history):
+            # The history has been replaced, so start over
+            self._transaction_time_index = []
+            self._indexed_transaction_count = 0
+
+        for position in range(
+            self._indexed_transaction_count, len(self.transaction_history)
+        ):
+            timestamp = datetime.strptime(
+                self.transaction_history[position]["timestamp"], "%Y-%m-%d %H:%M:%S"
+            )
+            insort(self._transaction_time_index, (timestamp, position))
+            self._indexed_transaction_count = position + 1
+
     def get_current_time(self) -> Dict[str, str]:
         """
         Get the current time.
@@ -253,22 +303,7 @@ class TradingBot:
         Returns:
             symbol (str): Symbol of the stock or "Stock not found" if not available.
         """
-        symbol_map = {
-            "Apple": "AAPL",
-            "Google": "GOOG",
-            "Tesla": "TSLA",
-            "Microsoft": "MSFT",
-            "Nvidia": "NVDA",
-            "Zeta Corp": "ZETA",
-            "Alpha Tech": "ALPH",
-            "Omega Industries": "OMEG",
-            "Quasar Ltd.": "QUAS",
-            "Neptune Systems": "NEPT",
-            "Synex Solutions": "SYNX",
-            "Amazon": "AMZN",
-        }
-
-        return {"symbol": symbol_map.get(name, "Stock not found")}
+        return {"symbol": SYMBOL_BY_NAME.get(name, "Stock not found")}
 
     def get_stock_info(self, symbol: str) -> Dict[str, Union[float, int, str]]:
         """
@@ -613,13 +648,14 @@ class TradingBot:
         else:
             end = datetime.max
 
-        filtered_history = [
-            transaction
-            for transaction in self.transaction_history
-            if start
-            <= datetime.strptime(transaction["timestamp"], "%Y-%m-%d %H:%M:%S")
-            <= end
-        ]
+        self._update_transaction_time_index()
+        lower = bisect_left(self._transaction_time_index, (start,))
+        upper = bisect_right(self._transaction_time_index, (end, float("inf")))
+        # Keep the transactions in the order they were made
+        positions = sorted(
+            position for _, position in self._transaction_time_index[lower:upper]
+        )
+        filtered_history = [self.transaction_history[position] for position in positions]
 
         if self.long_context:
             filtered_history.extend(TRANSACTION_HISTORY_EXTENSION)
@@ -663,15 +699,10 @@ class TradingBot:
         Returns:
             stock_list (List[str]): List of stock symbols in the specified sector.
         """
-        sector_map = {
-            "Technology": ["AAPL", "GOOG", "MSFT", "NVDA"],
-            "Automobile": ["TSLA", "F", "GM"],
-        }
-
-        if self.long_context:
-            sector_map["Technology"].extend(TECHNOLOGY_EXTENSION)
-            sector_map["Automobile"].extend(AUTOMOBILE_EXTENSION)
-        return {"stock_list": sector_map.get(sector, [])}
+        sector_map = (
+            LONG_CONTEXT_STOCKS_BY_SECTOR if self.long_context else STOCKS_BY_SECTOR
+        )
+        return {"stock_list": list(sector_map.get(sector, []))}
 
     def filter_stocks_by_price(
         self, stocks: List[str], min_price: float, max_price: float
@@ -19,6 +19,166 @@ DEFAULT_STATE = {
     "budget_limit": None,
 }
 
+FLIGHT_BASE_COSTS: Dict[Tuple[str, str], int] = {
+    ("SFO", "LAX"): 200,
+    ("SFO", "JFK"): 500,
+    ("SFO", "ORD"): 400,
+    ("SFO", "BOS"): 450,
+    ("SFO", "RMS"): 300,
+    ("SFO", "SBK"): 350,
+    ("SFO", "MPC"): 370,
+    ("SFO", "SVP"): 320,
+    ("SFO", "SHD"): 330,
+    ("SFO", "SSV"): 340,
+    ("SFO", "OKD"): 360,
+    ("SFO", "WLB"): 310,
+    ("SFO", "CRH"): 380,
+    ("SFO", "ATV"): 390,
+    ("SFO", "PHV"): 420,
+    ("SFO", "GFD"): 430,
+    ("SFO", "CIA"): 700,
+    ("LAX", "SFO"): 100,
+    ("LAX", "JFK"): 600,
+    ("LAX", "ORD"): 500,
+    ("LAX", "BOS"): 550,
+    ("LAX", "RMS"): 310,
+    ("LAX", "SBK"): 320,
+    ("LAX", "MPC"): 330,
+    ("LAX", "SVP"): 340,
+    ("LAX", "SHD"): 350,
+    ("LAX", "SSV"): 360,
+    ("LAX", "OKD"): 370,
+    ("LAX", "WLB"): 380,
+    ("LAX", "CRH"): 390,
+    ("LAX", "ATV"): 400,
+    ("LAX", "PHV"): 410,
+    ("LAX", "GFD"): 420,
+    ("LAX", "HND"): 430,
+    ("JFK", "ORD"): 300,
+    ("JFK", "BOS"): 250,
+    ("JFK", "RMS"): 450,
+    ("JFK", "SBK"): 460,
+    ("JFK", "MPC"): 470,
+    ("JFK", "SVP"): 480,
+    ("JFK", "SHD"): 490,
+    ("JFK", "SSV"): 500,
+    ("JFK", "OKD"): 510,
+    ("JFK", "WLB"): 520,
+    ("JFK", "CRH"): 530,
+    ("JFK", "ATV"): 540,
+    ("JFK", "PHV"): 550,
+    ("JFK", "GFD"): 560,
+    ("JFK", "LAX"): 570,
+    ("JFK", "HND"): 800,
+    ("JFK", "PVG"): 950,
+    ("JFK", "PEK"): 1000,
+    ("ORD", "LAX"): 180,
+    ("ORD", "BOS"): 200,
+    ("ORD", "RMS"): 350,
+    ("ORD", "SBK"): 360,
+    ("ORD", "MPC"): 370,
+    ("ORD", "SVP"): 380,
+    ("ORD", "SHD"): 390,
+    ("ORD", "SSV"): 400,
+    ("ORD", "OKD"): 410,
+    ("ORD", "WLB"): 420,
+    ("ORD", "CRH"): 430,
+    ("ORD", "ATV"): 440,
+    ("ORD", "PHV"): 450,
+    ("ORD", "GFD"): 460,
+    ("BOS", "RMS"): 400,
+    ("BOS", "SBK"): 410,
+    ("BOS", "MPC"): 420,
+    ("BOS", "SVP"): 430,
+    ("BOS", "SHD"): 440,
+    ("BOS", "SSV"): 450,
+    ("BOS", "OKD"): 460,
+    ("BOS", "WLB"): 470,
+    ("BOS", "CRH"): 480,
+    ("BOS", "ATV"): 490,
+    ("BOS", "PHV"): 500,
+    ("BOS", "GFD"): 510,
+    ("RMS", "BOS"): 200,
+    ("RMS", "JFK"): 210,
+    ("RMS", "SBK"): 220,
+    ("RMS", "MPC"): 230,
+    ("RMS", "SVP"): 240,
+    ("RMS", "SHD"): 250,
+    ("RMS", "SSV"): 260,
+    ("RMS", "OKD"): 270,
+    ("RMS", "WLB"): 280,
+    ("RMS", "CRH"): 290,
+    ("RMS", "ATV"): 300,
+    ("RMS", "PHV"): 310,
+    ("RMS", "GFD"): 320,
+    ("RMS", "LAX"): 330,
+    ("SBK", "MPC"): 200,
+    ("SBK", "SVP"): 210,
+    ("SBK", "SHD"): 220,
+    ("SBK", "SSV"): 230,
+    ("SBK", "OKD"): 240,
+    ("SBK", "WLB"): 250,
+    ("SBK", "CRH"): 260,
+    ("SBK", "ATV"): 270,
+    ("SBK", "PHV"): 280,
+    ("SBK", "GFD"): 290,
+    ("MPC", "SVP"): 210,
+    ("MPC", "SHD"): 220,
+    ("MPC", "SSV"): 230,
+    ("MPC", "OKD"): 240,
+    ("MPC", "WLB"): 250,
+    ("MPC", "CRH"): 260,
+    ("MPC", "ATV"): 270,
+    ("MPC", "PHV"): 280,
+    ("MPC", "GFD"): 290,
+    ("SVP", "SHD"): 230,
+    ("SVP", "SSV"): 240,
+    ("SVP", "OKD"): 250,
+    ("SVP", "WLB"): 260,
+    ("SVP", "CRH"): 270,
+    ("SVP", "ATV"): 280,
+    ("SVP", "PHV"): 290,
+    ("SVP", "GFD"): 300,
+    ("SHD", "SSV"): 220,
+    ("SHD", "OKD"): 230,
+    ("SHD", "WLB"): 240,
+    ("SHD", "CRH"): 250,
+    ("SHD", "ATV"): 260,
+    ("SHD", "PHV"): 270,
+    ("SHD", "GFD"): 280,
+    ("SSV", "OKD"): 240,
+    ("SSV", "WLB"): 250,
+    ("SSV", "CRH"): 260,
+    ("SSV", "ATV"): 270,
+    ("SSV", "PHV"): 280,
+    ("SSV", "GFD"): 290,
+    ("OKD", "WLB"): 230,
+    ("OKD", "CRH"): 240,
+    ("OKD", "ATV"): 250,
+    ("OKD", "PHV"): 260,
+    ("OKD", "GFD"): 270,
+    ("WLB", "CRH"): 250,
+    ("WLB", "ATV"): 260,
+    ("WLB", "PHV"): 270,
+    ("WLB", "GFD"): 280,
+    ("CRH", "ATV"): 240,
+    ("CRH", "PHV"): 250,
+    ("CRH", "GFD"): 260,
+    ("CRH", "SFO"): 270,
+    ("CRH", "RMS"): 280,
+    ("CRH", "HKG"): 290,
+    ("CRH", "JFK"): 300,
+    ("ATV", "PHV"): 230,
+    ("ATV", "GFD"): 240,
+    ("PHV", "GFD"): 220,
+    ("LHR", "CDG"): 100,
+    ("OKD", "LAX"): 220,
+}
+
+# The list of all flight costs returned in long context mode, keyed by the combined class and date multiplier.
+# There are only a handful of multipliers, so each list is built once and then reused.
+_LONG_CONTEXT_FLIGHT_COST_LISTS: Dict[int, List[float]] = {}
+
 
 class TravelAPI:
     # Adapted from source : https://developer.concur.com/api-reference/
@@ -242,168 +402,13 @@ class TravelAPI:
         Returns:
             travel_cost_list (List[float]): The list of cost of the travel
         """
-        base_costs: Dict[Tuple[str, str], int] = {
-            ("SFO", "LAX"): 200,
-            ("SFO", "JFK"): 500,
-            ("SFO", "ORD"): 400,
-            ("SFO", "BOS"): 450,
-            ("SFO", "RMS"): 300,
-            ("SFO", "SBK"): 350,
-            ("SFO", "MPC"): 370,
-            ("SFO", "SVP"): 320,
-            ("SFO", "SHD"): 330,
-            ("SFO", "SSV"): 340,
-            ("SFO", "OKD"): 360,
-            ("SFO", "WLB"): 310,
-            ("SFO", "CRH"): 380,
-            ("SFO", "ATV"): 390,
-            ("SFO", "PHV"): 420,
-            ("SFO", "GFD"): 430,
-            ("SFO", "CIA"): 700,
-            ("LAX", "SFO"): 100,
-            ("LAX", "JFK"): 600,
-            ("LAX", "ORD"): 500,
-            ("LAX", "BOS"): 550,
-            ("LAX", "RMS"): 310,
-            ("LAX", "SBK"): 320,
-            ("LAX", "MPC"): 330,
-            ("LAX", "SVP"): 340,
-            ("LAX", "SHD"): 350,
-            ("LAX", "SSV"): 360,
-            ("LAX", "OKD"): 370,
-            ("LAX", "WLB"): 380,
-            ("LAX", "CRH"): 390,
-            ("LAX", "ATV"): 400,
-            ("LAX", "PHV"): 410,
-            ("LAX", "GFD"): 420,
-            ("LAX", "HND"): 430,
-            ("JFK", "ORD"): 300,
-            ("JFK", "BOS"): 250,
-            ("JFK", "RMS"): 450,
-            ("JFK", "SBK"): 460,
-            ("JFK", "MPC"): 470,
-            ("JFK", "SVP"): 480,
-            ("JFK", "SHD"): 490,
-            ("JFK", "SSV"): 500,
-            ("JFK", "OKD"): 510,
-            ("JFK", "WLB"): 520,
-            ("JFK", "CRH"): 530,
-            ("JFK", "ATV"): 540,
-            ("JFK", "PHV"): 550,
-            ("JFK", "GFD"): 560,
-            ("JFK", "LAX"): 570,
-            ("JFK", "HND"): 800,
-            ("JFK", "PVG"): 950,
-            ("JFK", "PEK"): 1000,
-            ("ORD", "LAX"): 180,
-            ("ORD", "BOS"): 200,
-            ("ORD", "RMS"): 350,
-            ("ORD", "SBK"): 360,
-            ("ORD", "MPC"): 370,
-            ("ORD", "SVP"): 380,
-            ("ORD", "SHD"): 390,
-            ("ORD", "SSV"): 400,
-            ("ORD", "OKD"): 410,
-            ("ORD", "WLB"): 420,
-            ("ORD", "CRH"): 430,
-            ("ORD", "ATV"): 440,
-            ("ORD", "PHV"): 450,
-            ("ORD", "GFD"): 460,
-            ("BOS", "RMS"): 400,
-            ("BOS", "SBK"): 410,
-            ("BOS", "MPC"): 420,
-            ("BOS", "SVP"): 430,
-            ("BOS", "SHD"): 440,
-            ("BOS", "SSV"): 450,
-            ("BOS", "OKD"): 460,
-            ("BOS", "WLB"): 470,
-            ("BOS", "CRH"): 480,
-            ("BOS", "ATV"): 490,
-            ("BOS", "PHV"): 500,
-            ("BOS", "GFD"): 510,
-            ("RMS", "BOS"): 200,
-            ("RMS", "JFK"): 210,
-            ("RMS", "SBK"): 220,
-            ("RMS", "MPC"): 230,
-            ("RMS", "SVP"): 240,
-            ("RMS", "SHD"): 250,
-            ("RMS", "SSV"): 260,
-            ("RMS", "OKD"): 270,
-            ("RMS", "WLB"): 280,
-            ("RMS", "CRH"): 290,
-            ("RMS", "ATV"): 300,
-            ("RMS", "PHV"): 310,
-            ("RMS", "GFD"): 320,
-            ("RMS", "LAX"): 330,
-            ("SBK", "MPC"): 200,
-            ("SBK", "SVP"): 210,
-            ("SBK", "SHD"): 220,
-            ("SBK", "SSV"): 230,
-            ("SBK", "OKD"): 240,
-            ("SBK", "WLB"): 250,
-            ("SBK", "CRH"): 260,
-            ("SBK", "ATV"): 270,
-            ("SBK", "PHV"): 280,
-            ("SBK", "GFD"): 290,
-            ("MPC", "SVP"): 210,
-            ("MPC", "SHD"): 220,
-            ("MPC", "SSV"): 230,
-            ("MPC", "OKD"): 240,
-            ("MPC", "WLB"): 250,
-            ("MPC", "CRH"): 260,
-            ("MPC", "ATV"): 270,
-            ("MPC", "PHV"): 280,
-            ("MPC", "GFD"): 290,
-            ("SVP", "SHD"): 230,
-            ("SVP", "SSV"): 240,
-            ("SVP", "OKD"): 250,
-            ("SVP", "WLB"): 260,
-            ("SVP", "CRH"): 270,
-            ("SVP", "ATV"): 280,
-            ("SVP", "PHV"): 290,
-            ("SVP", "GFD"): 300,
-            ("SHD", "SSV"): 220,
-            ("SHD", "OKD"): 230,
-            ("SHD", "WLB"): 240,
-            ("SHD", "CRH"): 250,
-            ("SHD", "ATV"): 260,
-            ("SHD", "PHV"): 270,
-            ("SHD", "GFD"): 280,
-            ("SSV", "OKD"): 240,
-            ("SSV", "WLB"): 250,
-            ("SSV", "CRH"): 260,
-            ("SSV", "ATV"): 270,
-            ("SSV", "PHV"): 280,
-            ("SSV", "GFD"): 290,
-            ("OKD", "WLB"): 230,
-            ("OKD", "CRH"): 240,
-            ("OKD", "ATV"): 250,
-            ("OKD", "PHV"): 260,
-            ("OKD", "GFD"): 270,
-            ("WLB", "CRH"): 250,
-            ("WLB", "ATV"): 260,
-            ("WLB", "PHV"): 270,
-            ("WLB", "GFD"): 280,
-            ("CRH", "ATV"): 240,
-            ("CRH", "PHV"): 250,
-            ("CRH", "GFD"): 260,
-            ("CRH", "SFO"): 270,
-            ("CRH", "RMS"): 280,
-            ("CRH", "HKG"): 290,
-            ("CRH", "JFK"): 300,
-            ("ATV", "PHV"): 230,
-            ("ATV", "GFD"): 240,
-            ("PHV", "GFD"): 220,
-            ("LHR", "CDG"): 100,
-            ("OKD", "LAX"): 220
-        }
 
         # Ensure the travel_from and travel_to is a tuple in the correct order (from, to)
         travel_pair = (travel_from, travel_to)
 
         # Get the base cost, raise an error if the route is not available
-        if travel_pair in base_costs:
-            base_cost = base_costs[travel_pair]
+        if travel_pair in FLIGHT_BASE_COSTS:
+            base_cost = FLIGHT_BASE_COSTS[travel_pair]
         else:
             raise ValueError("No available route for the given airports.")
 
@@ -424,19 +429,21 @@ class TravelAPI:
         # Calculate the total cost
         travel_cost = float(base_cost * factor * travel_date_multiplier)
 
-        travel_cost_list = []
+        # Only the requested route is ever read back from the lookup (by `book_flight`)
+        self._flight_cost_lookup = {}  # reset cache
+        self._cache_flight_cost_entry(
+            travel_from, travel_to, travel_cost, travel_class, travel_date
+        )
+
         if self.long_context:
-            self._flight_cost_lookup = {}  # reset cache
-            for (frm, to), base in base_costs.items():
-                cost = float(base * factor * travel_date_multiplier)
-                self._cache_flight_cost_entry(frm, to, cost, travel_class, travel_date)
-                travel_cost_list.append(cost)
+            multiplier = factor * travel_date_multiplier
+            if multiplier not in _LONG_CONTEXT_FLIGHT_COST_LISTS:
+                _LONG_CONTEXT_FLIGHT_COST_LISTS[multiplier] = [
+                    float(base * multiplier) for base in FLIGHT_BASE_COSTS.values()
+                ]
+            travel_cost_list = list(_LONG_CONTEXT_FLIGHT_COST_LISTS[multiplier])
         else:
-            cost = float(base_costs[travel_pair] * factor * travel_date_multiplier)
-            travel_cost_list = [cost]
-            self._flight_cost_lookup = {
-                f"{travel_from}|{travel_to}|{travel_class}|{travel_date}": {"cost": cost}
-            }
+            travel_cost_list = [travel_cost]
 
         return {"travel_cost_list": travel_cost_list}
 
@@ -0,0 +1,346 @@
+import multiprocessing
+import threading
+import traceback
+
+try:
+    import resource
+except ImportError:
+    # `resource` is not available on Windows; the memory limit is not enforced there
+    resource = None
+
+from bfcl_eval.constants.eval_config import (
+    ISOLATED_EXECUTION_CALL_TIMEOUT,
+    ISOLATED_EXECUTION_MAX_SESSIONS_PER_WORKER,
+    ISOLATED_EXECUTION_MEMORY_LIMIT_MB,
+)
+
+WORKER_STARTUP_TIMEOUT = 120  # seconds
+
+
+class SimulatorStateLostError(RuntimeError):
+    """
+    The state of a session could not be restored after its worker was replaced, so its remaining function calls can't be executed faithfully.
+    """
+
+
+def _worker_main(conn, memory_limit_mb: int) -> None:
+    """
+    Entry point of a worker process.
+    The worker owns the simulator instances of the sessions bound to it, and runs their function calls one at a time so that the parent can time each call individually.
+    """
+    # Imported here so that the worker runs the in-process code path of `execute_multi_turn_func_call`
+    from bfcl_eval.eval_checker.multi_turn_eval import multi_turn_utils
+
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError) as e:
+            print(f"⚠️ Failed to set the memory limit of the execution worker: {e}")
+    conn.send(("ready",))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+
+        command = message[0]
+        if command == "execute":
+            _, func_call_list, initial_config, involved_classes, model_name, test_entry_id, long_context = message
+            involved_instances = {}
+            try:
+                if len(func_call_list) == 0:
+                    # Still load the instances, the caller wants their initial state
+                    _, involved_instances = multi_turn_utils.execute_multi_turn_func_call(
+                        [], initial_config, involved_classes, model_name, test_entry_id, long_context
+                    )
+                for func_call in func_call_list:
+                    execution_results, involved_instances = (
+                        multi_turn_utils.execute_multi_turn_func_call(
+                            [func_call],
+                            initial_config,
+                            involved_classes,
+                            model_name,
+                            test_entry_id,
+                            long_context,
+                        )
+                    )
+                    conn.send(("result", execution_results[0]))
+                conn.send(("done", involved_instances))
+            except Exception as e:
+                # Loading the scenario or sending the instances back failed
+                conn.send(("failed", f"{e}\n{traceback.format_exc()}"))
+
+        elif command == "restore":
+            _, model_name, test_entry_id, instances = message
+            multi_turn_utils.restore_instances(model_name, test_entry_id, instances)
+            conn.send(("restored",))
+
+        elif command == "end_session":
+            _, model_name, test_entry_id = message
+            multi_turn_utils.release_instances(model_name, test_entry_id)
+            conn.send(("ended",))
+
+        elif command == "shutdown":
+            return
+
+
+class _ExecutionWorker:
+    def __init__(self, context, memory_limit_mb: int) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_limit_mb), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.session_count = 0
+
+        # Starting the interpreter and importing the simulators should not count towards the timeout of the first call
+        if self.receive(WORKER_STARTUP_TIMEOUT) is None:
+            self.kill()
+            raise RuntimeError("The isolated execution worker failed to start.")
+
+    def receive(self, timeout: float):
+        """
+        Wait for the next message from the worker.
+        Returns `None` if the worker does not answer in time or has died.
+        """
+        try:
+            if not self.conn.poll(timeout):
+                return None
+            return self.conn.recv()
+        except (EOFError, OSError):
+            return None
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def shutdown(self) -> None:
+        try:
+            self.conn.send(("shutdown",))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class IsolatedExecutionPool:
+    """
+    Runs the simulator sessions in a pool of long-lived worker processes, instead of with `eval` in the calling thread.
+
+    A session is all the function calls made against the instances of one model (or ground truth) on one test entry.
+    Each session is bound to one worker for its whole lifetime, since the instances live in that worker.
+    Every function call is subject to a wall-clock timeout, and each worker process runs under a memory limit (`RLIMIT_AS`), so a pathological call can neither pin the caller forever nor take down the whole run.
+    When a call times out, its worker is killed and replaced; the session's earlier calls are replayed on the new worker to restore the state, as if the offending call never happened.
+    If the replay fails as well, the session fails: this and every later call of the session raise `SimulatorStateLostError`, until the session ends.
+    Workers are recycled after serving a number of sessions, to keep memory fragmentation and leftovers in check.
+    """
+
+    def __init__(
+        self,
+        call_timeout: float = ISOLATED_EXECUTION_CALL_TIMEOUT,
+        memory_limit_mb: int = ISOLATED_EXECUTION_MEMORY_LIMIT_MB,
+        max_sessions_per_worker: int = ISOLATED_EXECUTION_MAX_SESSIONS_PER_WORKER,
+    ) -> None:
+        self.call_timeout = call_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_sessions_per_worker = max_sessions_per_worker
+
+        # Spawn, so that the workers don't inherit the state (and the threads) of the parent process
+        self._context = multiprocessing.get_context("spawn")
+        self._idle_workers: list[_ExecutionWorker] = []
+        # Session key -> (worker, calls that have been executed in the session)
+        self._sessions: dict[tuple[str, str], tuple[_ExecutionWorker, list[str]]] = {}
+        # Session key -> instances the session was restored from; the history is replayed on top of them
+        self._restored_instances: dict[tuple[str, str], dict] = {}
+        # Session key -> why the session failed; see `SimulatorStateLostError`
+        self._failed_sessions: dict[tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def _acquire_worker(self, session_key: tuple[str, str]):
+        with self._lock:
+            failure = self._failed_sessions.get(session_key)
+            if failure is not None:
+                raise SimulatorStateLostError(failure)
+            session = self._sessions.get(session_key)
+            if session is not None:
+                return session
+            if self._idle_workers:
+                worker = self._idle_workers.pop()
+            else:
+                worker = None
+
+        if worker is None:
+            # The pool grows to the number of concurrently open sessions, i.e. the number of inference/evaluation threads
+            worker = _ExecutionWorker(self._context, self.memory_limit_mb)
+        worker.session_count += 1
+        session = (worker, [])
+        with self._lock:
+            self._sessions[session_key] = session
+        return session
+
+    def _replace_worker(
+        self,
+        session_key: tuple[str, str],
+        history: list[str],
+        initial_config: dict,
+        involved_classes: list,
+        long_context: bool,
+    ) -> _ExecutionWorker:
+        """
+        Kill the worker of the session and restore the session state on a fresh worker by replaying its history.
+        Raises `SimulatorStateLostError` if the state can't be restored.
+        """
+        old_worker = self._sessions[session_key][0]
+        old_worker.kill()
+
+        worker = _ExecutionWorker(self._context, self.memory_limit_mb)
+        worker.session_count = old_worker.session_count
+        with self._lock:
+            self._sessions[session_key] = (worker, history)
+
+        model_name, test_entry_id = session_key
+        restored = True
+        if session_key in self._restored_instances:
+            worker.conn.send(
+                ("restore", model_name, test_entry_id, self._restored_instances[session_key])
+            )
+            restored = worker.receive(self.call_timeout) is not None
+        if restored:
+            worker.conn.send(
+                ("execute", list(history), initial_config, involved_classes, model_name, test_entry_id, long_context)
+            )
+            for _ in range(len(history) + 1):
+                message = worker.receive(self.call_timeout)
+                if message is None and history:
+                    # Calls that finished in time before should do so again
+                    restored = False
+                if message is None or message[0] != "result":
+                    break
+        if not restored:
+            # Continuing from the initial state instead would silently score the remaining calls against the wrong state
+            failure = f"Failed to restore the simulator state of {test_entry_id} after a function call timed out or crashed the execution worker."
+            print(f"⚠️ {failure}")
+            worker.kill()
+            with self._lock:
+                self._sessions.pop(session_key, None)
+                self._failed_sessions[session_key] = failure
+            raise SimulatorStateLostError(failure)
+        return worker
+
+    def execute(
+        self,
+        func_call_list: list[str],
+        initial_config: dict,
+        involved_classes: list,
+        model_name: str,
+        test_entry_id: str,
+        long_context: bool,
+    ) -> tuple[list[str], dict]:
+        """
+        Same contract as `execute_multi_turn_func_call`, except that the returned instances are snapshots.
+        `model_name` must already include the `_eval` suffix for evaluation runs.
+        """
+        session_key = (model_name, test_entry_id)
+        worker, history = self._acquire_worker(session_key)
+
+        execution_results = []
+        pending_calls = list(func_call_list)
+        while True:
+            worker.conn.send(
+                ("execute", pending_calls, initial_config, involved_classes, model_name, test_entry_id, long_context)
+            )
+            completed_count = 0
+            message = None
+            for func_call in pending_calls:
+                message = worker.receive(self.call_timeout)
+                if message is None or message[0] != "result":
+                    break
+                execution_results.append(message[1])
+                history.append(func_call)
+                completed_count += 1
+
+            if completed_count == len(pending_calls):
+                message = worker.receive(self.call_timeout)
+                if message is not None and message[0] == "done":
+                    return execution_results, message[1]
+
+            if message is not None and message[0] == "failed":
+                raise RuntimeError(
+                    f"Failed to execute the function calls in an isolated worker: {message[1]}"
+                )
+
+            if completed_count < len(pending_calls):
+                if worker.process.is_alive():
+                    error_message = f"Function call timed out after {self.call_timeout} seconds."
+                else:
+                    error_message = f"Function call crashed the execution worker (exit code {worker.process.exitcode})."
+                execution_results.append(f"Error during execution: {error_message}")
+                # Skip the offending call
+                pending_calls = pending_calls[completed_count + 1 :]
+            else:
+                # All calls have finished, but the worker got stuck sending the instances back
+                pending_calls = []
+
+            worker = self._replace_worker(
+                session_key, history, initial_config, involved_classes, long_context
+            )
+
+    def restore_session(self, model_name: str, test_entry_id: str, instances: dict) -> None:
+        """
+        Replace the instances of the session with the given ones, see `restore_instances`.
+        """
+        session_key = (model_name, test_entry_id)
+        worker, history = self._acquire_worker(session_key)
+        history.clear()
+        with self._lock:
+            self._restored_instances[session_key] = instances
+
+        worker.conn.send(("restore", model_name, test_entry_id, instances))
+        if worker.receive(self.call_timeout) is None:
+            self._replace_worker(session_key, history, {}, [], False)
+
+    def end_session(self, model_name: str, test_entry_id: str) -> None:
+        """
+        Release the instances of the session and return its worker to the pool.
+        """
+        session_key = (model_name, test_entry_id)
+        with self._lock:
+            session = self._sessions.pop(session_key, None)
+            self._restored_instances.pop(session_key, None)
+            self._failed_sessions.pop(session_key, None)
+        if session is None:
+            return
+
+        worker = session[0]
+        try:
+            worker.conn.send(("end_session", model_name, test_entry_id))
+            released = worker.receive(self.call_timeout) is not None
+        except (BrokenPipeError, OSError):
+            released = False
+
+        if not released:
+            worker.kill()
+        elif worker.session_count >= self.max_sessions_per_worker:
+            worker.shutdown()
+        else:
+            with self._lock:
+                self._idle_workers.append(worker)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers = self._idle_workers + [
+                worker for worker, _ in self._sessions.values()
+            ]
+            self._idle_workers = []
+            self._sessions = {}
+            self._restored_instances = {}
+            self._failed_sessions = {}
+        for worker in workers:
+            worker.shutdown()
@@ -1,8 +1,14 @@
+import hashlib
 import importlib
 import inspect
 import json
+import random
 import re
 import copy
+import datetime
+import threading
+
+from bfcl_eval.eval_checker.multi_turn_eval.func_source_code import long_context
 
 CLASS_FILE_PATH_MAPPING = {
     "GorillaFileSystem": "bfcl_eval.eval_checker.multi_turn_eval.func_source_code.gorilla_file_system",
@@ -20,6 +26,211 @@ STATELESS_CLASSES = [
     "MathAPI",
 ]
 
+# Loaded simulator instances, keyed by (class name, initial config, long context flag).
+# Every entry is loaded three times (inference, model evaluation, ground truth evaluation), and many entries share the same initial config,
+# so we load each scenario once and hand out clones of it.
+_SCENARIO_TEMPLATE_CACHE = {}
+_SCENARIO_TEMPLATE_CACHE_LOCK = threading.Lock()
+# Public method names of each simulator class
+_PUBLIC_METHOD_NAME_CACHE = {}
+
+# When set, function calls are executed in isolated worker processes instead of in the calling thread. See `configure_isolated_execution`.
+_ISOLATED_EXECUTION_POOL = None
+
+# Values of these types can be shared between clones
+_IMMUTABLE_TYPES = {str, int, float, bool, bytes, type(None), datetime.datetime}
+
+
+def _collect_long_context_payload_ids() -> set[int]:
+    """
+    Collect the ids of all the containers in `long_context.py`.
+    `_load_scenario` splices these objects into the instance state by reference, so clones must keep referencing them instead of copying them.
+    """
+    payload_ids = set()
+    stack = [
+        value
+        for name, value in vars(long_context).items()
+        if name.isupper() and isinstance(value, (dict, list))
+    ]
+    while stack:
+        value = stack.pop()
+        if id(value) in payload_ids:
+            continue
+        payload_ids.add(id(value))
+        children = value.values() if isinstance(value, dict) else value
+        stack.extend(child for child in children if isinstance(child, (dict, list)))
+    return payload_ids
+
+
+_LONG_CONTEXT_PAYLOAD_IDS = _collect_long_context_payload_ids()
+
+
+def _clone_value(value, memo: dict):
+    """
+    A specialized `copy.deepcopy` for simulator states, which are made of plain containers, `random.Random`, and a few simple classes.
+    It skips the generic `__reduce_ex__` machinery of `copy.deepcopy`, which dominates the cost for these small objects.
+    """
+    value_type = type(value)
+    if value_type in _IMMUTABLE_TYPES:
+        return value
+    value_id = id(value)
+    clone = memo.get(value_id)
+    if clone is not None:
+        return clone
+    if value_id in _LONG_CONTEXT_PAYLOAD_IDS:
+        return value
+
+    if value_type is dict:
+        clone = {}
+        memo[value_id] = clone
+        for k, v in value.items():
+            clone[k] = v if type(v) in _IMMUTABLE_TYPES else _clone_value(v, memo)
+    elif value_type is list:
+        clone = []
+        memo[value_id] = clone
+        clone.extend(
+            [v if type(v) in _IMMUTABLE_TYPES else _clone_value(v, memo) for v in value]
+        )
+    elif value_type is random.Random:
+        # Skip `__init__`, which would seed the generator from `os.urandom` only for us to overwrite the state
+        clone = random.Random.__new__(random.Random)
+        clone.setstate(value.getstate())
+        memo[value_id] = clone
+    elif value_type.__module__.startswith(
+        "bfcl_eval.eval_checker.multi_turn_eval.func_source_code"
+    ):
+        # Simulator classes and their helper classes (e.g. `File` and `Directory`)
+        clone = value_type.__new__(value_type)
+        memo[value_id] = clone
+        clone_dict = clone.__dict__
+        for k, v in vars(value).items():
+            clone_dict[k] = v if type(v) in _IMMUTABLE_TYPES else _clone_value(v, memo)
+    else:
+        clone = copy.deepcopy(value, memo)
+    return clone
+
+
+def _load_scenario_instance(class_, class_initial_config: dict, long_context: bool):
+    """
+    Create an instance of the simulator class with the given initial configuration loaded.
+    The loaded scenario is cached as a template; subsequent calls return fast clones of it.
+    """
+    try:
+        config_key = json.dumps(class_initial_config, sort_keys=True)
+    except (TypeError, ValueError):
+        config_key = None
+
+    if config_key is None:
+        # Not hashable, so can't be cached
+        class_instance = class_()
+        # Deep copy the initial configuration to avoid mutation issues
+        class_instance._load_scenario(
+            copy.deepcopy(class_initial_config), long_context=long_context
+        )
+        return class_instance
+
+    cache_key = (class_.__name__, config_key, long_context)
+    template = _SCENARIO_TEMPLATE_CACHE.get(cache_key)
+    if template is None:
+        with _SCENARIO_TEMPLATE_CACHE_LOCK:
+            template = _SCENARIO_TEMPLATE_CACHE.get(cache_key)
+            if template is None:
+                template = class_()
+                # Deep copy the initial configuration to avoid mutation issues
+                template._load_scenario(
+                    copy.deepcopy(class_initial_config), long_context=long_context
+                )
+                _SCENARIO_TEMPLATE_CACHE[cache_key] = template
+
+    # The template itself is never handed out, so it stays in its freshly loaded state
+    return _clone_value(template, {})
+
+
+def _get_public_method_names(class_instance) -> list[str]:
+    """
+    Get the names of all public methods of a simulator instance.
+    The result only depends on the class, so it is computed once per class instead of on every call.
+    """
+    class_ = type(class_instance)
+    method_names = _PUBLIC_METHOD_NAME_CACHE.get(class_)
+    if method_names is None:
+        method_names = [
+            method_name
+            for method_name, method in inspect.getmembers(
+                class_instance, predicate=inspect.ismethod
+            )
+            # Skip private methods
+            if not method_name.startswith("_")
+        ]
+        _PUBLIC_METHOD_NAME_CACHE[class_] = method_names
+    return method_names
+
+
+def configure_isolated_execution(enabled: bool, call_timeout: float = None) -> None:
+    """
+    Switch between executing the function calls in the calling thread (the default) and in a pool of isolated worker processes.
+    The worker processes enforce a per-call timeout and a memory limit, at the cost of some inter-process overhead.
+    """
+    global _ISOLATED_EXECUTION_POOL
+    from bfcl_eval.eval_checker.multi_turn_eval.isolated_executor import (
+        IsolatedExecutionPool,
+    )
+
+    if _ISOLATED_EXECUTION_POOL is not None:
+        _ISOLATED_EXECUTION_POOL.shutdown()
+        _ISOLATED_EXECUTION_POOL = None
+    if enabled:
+        if call_timeout is None:
+            _ISOLATED_EXECUTION_POOL = IsolatedExecutionPool()
+        else:
+            _ISOLATED_EXECUTION_POOL = IsolatedExecutionPool(call_timeout=call_timeout)
+
+
+def end_multi_turn_session(
+    model_name: str, test_entry_id: str, is_evaL_run: bool = False
+) -> None:
+    """
+    Signal that no more function calls will be made for this model on this test entry.
+    This only matters for isolated execution, where it frees the worker process bound to the entry.
+    """
+    if _ISOLATED_EXECUTION_POOL is None:
+        return
+    if is_evaL_run:
+        model_name += "_eval"
+    _ISOLATED_EXECUTION_POOL.end_session(model_name, test_entry_id)
+
+
+def _get_instance_name(model_name: str, test_entry_id: str, class_name: str) -> str:
+    # TODO: Handler the model name issue from handler more elegantly
+    return f"{model_name.replace('-', '_').replace('.', '_').replace('/', '_')}_{test_entry_id}_{class_name.lower()}_instance"
+
+
+def release_instances(model_name: str, test_entry_id: str) -> None:
+    """
+    Drop the instances of this model on this test entry, so that they can be garbage collected.
+    """
+    for class_name in CLASS_FILE_PATH_MAPPING:
+        globals().pop(_get_instance_name(model_name, test_entry_id, class_name), None)
+
+
+def restore_instances(
+    model_name: str, test_entry_id: str, instances: dict, is_evaL_run: bool = False
+) -> None:
+    """
+    Replace the instances of this model on this test entry with the given ones (class name -> instance), e.g. a snapshot taken after an earlier turn.
+    The following function calls continue from their state instead of loading the initial config.
+    """
+    if is_evaL_run:
+        model_name += "_eval"
+
+    if _ISOLATED_EXECUTION_POOL is not None:
+        _ISOLATED_EXECUTION_POOL.restore_session(model_name, test_entry_id, instances)
+        return
+
+    release_instances(model_name, test_entry_id)
+    for class_name, class_instance in instances.items():
+        globals()[_get_instance_name(model_name, test_entry_id, class_name)] = class_instance
+
 
 def execute_multi_turn_func_call(
     func_call_list: list[str],  # a list of strings of func calls
@@ -36,24 +247,31 @@ def execute_multi_turn_func_call(
     if is_evaL_run:
         model_name += "_eval"
 
+    if _ISOLATED_EXECUTION_POOL is not None:
+        return _ISOLATED_EXECUTION_POOL.execute(
+            func_call_list,
+            initial_config,
+            involved_classes,
+            model_name,
+            test_entry_id,
+            long_context,
+        )
+
     class_method_name_mapping = {}
     involved_instances = {}
     for class_name in involved_classes:
         module_name = CLASS_FILE_PATH_MAPPING[class_name]
-        # TODO: Handler the model name issue from handler more elegantly
-        instance_name = (
-            f"{model_name.replace('-', '_').replace('.', '_').replace('/', '_')}_{test_entry_id}_{class_name.lower()}_instance"
-        )
+        instance_name = _get_instance_name(model_name, test_entry_id, class_name)
         if instance_name not in globals():
             module = importlib.import_module(module_name)
             class_ = getattr(module, class_name)
-            class_instance = class_()
             if class_name not in STATELESS_CLASSES:
                 class_initial_config = initial_config.get(class_name, {})
-                # Deep copy the initial configuration to avoid mutation issues
-                class_instance._load_scenario(
-                    copy.deepcopy(class_initial_config), long_context=long_context
+                class_instance = _load_scenario_instance(
+                    class_, class_initial_config, long_context
                 )
+            else:
+                class_instance = class_()
             globals()[instance_name] = class_instance
         # This happens in subsequent turns
         else:
@@ -62,12 +280,7 @@ def execute_multi_turn_func_call(
         involved_instances[class_name] = class_instance
 
         # Retrieve all method names and map them to the instance
-        for method_name, method in inspect.getmembers(
-            class_instance, predicate=inspect.ismethod
-        ):
-            # Skip private methods
-            if method_name.startswith("_"):
-                continue
+        for method_name in _get_public_method_names(class_instance):
             class_method_name_mapping[method_name] = instance_name
 
     execution_results = []
@@ -110,6 +323,28 @@ def execute_multi_turn_func_call(
     return execution_results, involved_instances
 
 
+def get_instance_state_digest(involved_instances: dict) -> str:
+    """
+    Digest of the state of the instances, as the state checker sees it: their public attributes.
+    Objects that can fingerprint themselves (e.g. the `GorillaFileSystem` directories) are reduced to their fingerprint rather than walked.
+    """
+
+    def encode(value):
+        if hasattr(value, "_get_fingerprint"):
+            return value._get_fingerprint().hex()
+        return repr(value)
+
+    hasher = hashlib.blake2b(digest_size=16)
+    for class_name in sorted(involved_instances):
+        state = {
+            key: value
+            for key, value in vars(involved_instances[class_name]).items()
+            if not key.startswith("_")
+        }
+        hasher.update(json.dumps([class_name, state], default=encode).encode("utf-8"))
+    return hasher.hexdigest()
+
+
 def is_empty_execute_response(input_list: list):
     if len(input_list) == 0:
         return True
@@ -5,14 +5,15 @@ import time
 from anthropic import Anthropic, RateLimitError
 from anthropic.types import TextBlock, ToolUseBlock
 from bfcl_eval.model_handler.base_handler import BaseHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from bfcl_eval.constants.type_mappings import GORILLA_TO_OPENAPI
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import (
     ast_parse,
     combine_consecutive_user_prompts,
+    compile_tools,
     convert_system_prompt_into_user_prompt,
     convert_to_function_call,
-    convert_to_tool,
     extract_system_prompt,
     format_execution_results_prompting,
     func_doc_language_specific_pre_processing,
@@ -26,7 +27,13 @@ class ClaudeHandler(BaseHandler):
     def __init__(self, model_name, temperature) -> None:
         super().__init__(model_name, temperature)
         self.model_style = ModelStyle.Anthropic
-        self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        self.client = Anthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            # Same base URL as the SDK client, which also reads `ANTHROPIC_BASE_URL`
+            http_client=get_http_client(
+                os.getenv("ANTHROPIC_BASE_URL") or "https://api.anthropic.com"
+            ),
+        )
 
     def decode_ast(self, result, language="Python"):
         if "FC" not in self.model_name:
@@ -145,8 +152,7 @@ class ClaudeHandler(BaseHandler):
         functions: list = test_entry["function"]
         test_category: str = test_entry["id"].rsplit("_", 1)[0]
 
-        functions = func_doc_language_specific_pre_processing(functions, test_category)
-        tools = convert_to_tool(functions, GORILLA_TO_OPENAPI, self.model_style)
+        tools = compile_tools(functions, test_category, GORILLA_TO_OPENAPI, self.model_style)
 
         if inference_data["caching_enabled"]:
             # First time compiling tools, so adding cache control flag to the last tool
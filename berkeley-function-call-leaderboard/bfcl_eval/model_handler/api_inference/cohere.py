@@ -9,8 +9,7 @@ from bfcl_eval.model_handler.base_handler import BaseHandler
 from bfcl_eval.constants.type_mappings import GORILLA_TO_OPENAPI
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import (
-    convert_to_tool,
-    func_doc_language_specific_pre_processing,
+    compile_tools,
     retry_with_backoff,
 )
 from tenacity.stop import stop_after_attempt
@@ -138,8 +137,7 @@ class CohereHandler(BaseHandler):
         functions: list = test_entry["function"]
         test_category: str = test_entry["id"].rsplit("_", 1)[0]
 
-        functions = func_doc_language_specific_pre_processing(functions, test_category)
-        tools = convert_to_tool(functions, GORILLA_TO_OPENAPI, self.model_style)
+        tools = compile_tools(functions, test_category, GORILLA_TO_OPENAPI, self.model_style)
         inference_data["tools"] = tools
 
         return inference_data
@@ -211,6 +209,12 @@ class CohereHandler(BaseHandler):
             inference_data["chat_turns"].append(cohere.UserChatMessageV2(role="user", content=""))
         return inference_data
 
+    def _add_turn_end_message(self, inference_data: dict, content: str) -> dict:
+        inference_data["chat_turns"].append(
+            cohere.AssistantChatMessageV2(role="assistant", content=content)
+        )
+        return inference_data
+
     def _add_assistant_message_FC(
         self, inference_data: dict, model_response_data: dict
     ) -> dict:
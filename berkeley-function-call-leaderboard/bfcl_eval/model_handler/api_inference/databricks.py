@@ -3,6 +3,7 @@ import re
 import time
 
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import (
     ast_parse,
@@ -22,6 +23,7 @@ class DatabricksHandler(OpenAICompletionsHandler):
         self.client = OpenAI(
             api_key=os.getenv("DATABRICKS_API_KEY"),
             base_url=os.getenv("DATABRICKS_AZURE_ENDPOINT_URL"),
+            http_client=get_http_client(os.getenv("DATABRICKS_AZURE_ENDPOINT_URL")),
         )
 
     def decode_ast(self, result, language="Python"):
@@ -2,6 +2,7 @@ import os
 from bfcl_eval.model_handler.model_style import ModelStyle
 from openai import OpenAI
 from bfcl_eval.model_handler.api_inference.mining import MiningHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 
 class DMCitoHandler(MiningHandler):
     def __init__(self, model_name, temperature) -> None:
@@ -10,4 +11,5 @@ class DMCitoHandler(MiningHandler):
         self.client = OpenAI(
             base_url= os.getenv("DMCITO_BASE_URL"),
             api_key=os.getenv("DMCITO_API_KEY"),
+            http_client=get_http_client(os.getenv("DMCITO_BASE_URL")),
         )
\ No newline at end of file
@@ -3,6 +3,7 @@ import time
 
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from openai import OpenAI
 
 
@@ -14,6 +15,7 @@ class FireworksHandler(OpenAICompletionsHandler):
         self.client = OpenAI(
             base_url="https://api.fireworks.ai/inference/v1",
             api_key=os.getenv("FIREWORKS_API_KEY"),
+            http_client=get_http_client("https://api.fireworks.ai/inference/v1"),
         )
 
     #### FC methods ####
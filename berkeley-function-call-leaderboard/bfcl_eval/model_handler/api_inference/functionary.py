@@ -1,4 +1,5 @@
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from bfcl_eval.model_handler.model_style import ModelStyle
 from openai import OpenAI
 
@@ -8,4 +9,8 @@ class FunctionaryHandler(OpenAICompletionsHandler):
         super().__init__(model_name, temperature)
         self.model_style = ModelStyle.OpenAI_Completions
 
-        self.client = OpenAI(base_url="http://localhost:8000/v1", api_key="functionary")
+        self.client = OpenAI(
+            base_url="http://localhost:8000/v1",
+            api_key="functionary",
+            http_client=get_http_client("http://localhost:8000/v1"),
+        )
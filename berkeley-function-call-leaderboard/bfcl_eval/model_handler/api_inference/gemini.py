@@ -5,7 +5,7 @@ from bfcl_eval.constants.type_mappings import GORILLA_TO_OPENAPI
 from bfcl_eval.model_handler.base_handler import BaseHandler
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import (
-    convert_to_tool,
+    compile_tools,
     default_decode_ast_prompting,
     default_decode_execute_prompting,
     extract_system_prompt,
@@ -125,8 +125,7 @@ class GeminiHandler(BaseHandler):
         functions: list = test_entry["function"]
         test_category: str = test_entry["id"].rsplit("_", 1)[0]
 
-        functions = func_doc_language_specific_pre_processing(functions, test_category)
-        tools = convert_to_tool(functions, GORILLA_TO_OPENAPI, self.model_style)
+        tools = compile_tools(functions, test_category, GORILLA_TO_OPENAPI, self.model_style)
 
         inference_data["tools"] = tools
 
@@ -200,6 +199,10 @@ class GeminiHandler(BaseHandler):
     ) -> dict:
         return self.add_first_turn_message_FC(inference_data, user_message)
 
+    def _add_turn_end_message(self, inference_data: dict, content: str) -> dict:
+        inference_data["message"].append(Content(role="model", parts=[Part(text=content)]))
+        return inference_data
+
     def _add_assistant_message_FC(
         self, inference_data: dict, model_response_data: dict
     ) -> dict:
@@ -1,6 +1,7 @@
 import os
 
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from openai import OpenAI
 from overrides import override
 from typing import Any
@@ -13,6 +14,7 @@ class GLMAPIHandler(OpenAICompletionsHandler):
         self.client = OpenAI(
             api_key=os.getenv("GLM_API_KEY"),
             base_url="https://open.bigmodel.cn/api/paas/v4/",
-            timeout=httpx.Timeout(timeout=300.0, connect=8.0)
+            timeout=httpx.Timeout(timeout=300.0, connect=8.0),
+            http_client=get_http_client("https://open.bigmodel.cn/api/paas/v4/"),
         )
         self.is_fc_model = True
@@ -1,6 +1,7 @@
 import os
 
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from openai import OpenAI
 
 
@@ -10,5 +11,7 @@ class GoGoAgentHandler(OpenAICompletionsHandler):
         self.is_fc_model = False
 
         self.client = OpenAI(
-            base_url="https://api.gogoagent.ai", api_key=os.getenv("GOGOAGENT_API_KEY")
+            base_url="https://api.gogoagent.ai",
+            api_key=os.getenv("GOGOAGENT_API_KEY"),
+            http_client=get_http_client("https://api.gogoagent.ai"),
         )
@@ -1,8 +1,8 @@
 import json
 import time
 
-import requests
 from bfcl_eval.model_handler.base_handler import BaseHandler
+from bfcl_eval.model_handler.http_transport import get_requests_session
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import ast_parse
 
@@ -45,7 +45,7 @@ class GorillaHandler(BaseHandler):
         url = "https://luigi.millennium.berkeley.edu:443/v1/chat/completions"
 
         start_time = time.time()
-        api_response = requests.post(
+        api_response = get_requests_session().post(
             url,
             headers={
                 "Content-Type": "application/json",
@@ -1,6 +1,7 @@
 import os
 
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from openai import OpenAI
 from overrides import override
 from typing import Any
@@ -12,6 +13,7 @@ class GrokHandler(OpenAICompletionsHandler):
         self.client = OpenAI(
             base_url="https://api.x.ai/v1",
             api_key=os.getenv("GROK_API_KEY"),
+            http_client=get_http_client("https://api.x.ai/v1"),
         )
         self.is_fc_model = "FC" in self.model_name
 
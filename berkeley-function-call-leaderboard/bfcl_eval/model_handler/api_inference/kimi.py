@@ -1,5 +1,6 @@
 import os
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from bfcl_eval.model_handler.model_style import ModelStyle
 from openai import OpenAI
 
@@ -10,5 +11,6 @@ class KimiHandler(OpenAICompletionsHandler):
 
         self.client = OpenAI(
             base_url="https://platform.moonshot.ai", 
-            api_key=os.getenv("KIMI_API_KEY")
+            api_key=os.getenv("KIMI_API_KEY"),
+            http_client=get_http_client("https://platform.moonshot.ai"),
         )
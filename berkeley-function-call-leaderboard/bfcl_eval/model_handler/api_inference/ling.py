@@ -3,6 +3,7 @@ import os
 import time
 
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import (
     combine_consecutive_user_prompts,
@@ -19,7 +20,11 @@ class LingAPIHandler(OpenAICompletionsHandler):
         super().__init__(model_name, temperature)
         self.model_style = ModelStyle.OpenAI_Completions
         api_url = "https://bailingchat.alipay.com"
-        self.client = OpenAI(base_url=api_url, api_key=os.getenv("LING_API_KEY"))
+        self.client = OpenAI(
+            base_url=api_url,
+            api_key=os.getenv("LING_API_KEY"),
+            http_client=get_http_client(api_url),
+        )
 
     @retry_with_backoff(error_type=[RateLimitError, json.JSONDecodeError])
     def generate_with_backoff(self, **kwargs):
@@ -8,6 +8,7 @@ from bfcl_eval.model_handler.utils import (
 )
 from openai import OpenAI
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 
 class MiningHandler(OpenAICompletionsHandler):
     def __init__(self, model_name, temperature) -> None:
@@ -16,6 +17,7 @@ class MiningHandler(OpenAICompletionsHandler):
         self.client = OpenAI(
             base_url= os.getenv("MINING_BASE_URL"),
             api_key=os.getenv("MINING_API_KEY"),
+            http_client=get_http_client(os.getenv("MINING_BASE_URL")),
         )
 
     def decode_ast(self, result, language="Python"):
@@ -1,7 +1,7 @@
 import time
 
-import requests
 from bfcl_eval.model_handler.base_handler import BaseHandler
+from bfcl_eval.model_handler.http_transport import get_requests_session
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import (
     ast_parse,
@@ -159,7 +159,7 @@ class NexusHandler(BaseHandler):
             },
         }
         start_time = time.time()
-        api_response = requests.post(
+        api_response = get_requests_session().post(
             "http://nexusraven.nexusflow.ai", headers=headers, json=payload
         )
         end_time = time.time()
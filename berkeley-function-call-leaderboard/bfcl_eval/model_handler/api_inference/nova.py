@@ -7,10 +7,9 @@ from bfcl_eval.constants.type_mappings import GORILLA_TO_OPENAPI
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import (
     combine_consecutive_user_prompts,
+    compile_tools,
     convert_to_function_call,
-    convert_to_tool,
     extract_system_prompt,
-    func_doc_language_specific_pre_processing,
     retry_with_backoff,
 )
 
@@ -97,8 +96,7 @@ class NovaHandler(BaseHandler):
         functions: list = test_entry["function"]
         test_category: str = test_entry["id"].rsplit("_", 1)[0]
 
-        functions = func_doc_language_specific_pre_processing(functions, test_category)
-        tools = convert_to_tool(functions, GORILLA_TO_OPENAPI, self.model_style)
+        tools = compile_tools(functions, test_category, GORILLA_TO_OPENAPI, self.model_style)
 
         inference_data["tools"] = tools
 
@@ -168,6 +166,10 @@ class NovaHandler(BaseHandler):
         inference_data["message"].extend(user_message)
         return inference_data
 
+    def _add_turn_end_message(self, inference_data: dict, content: str) -> dict:
+        inference_data["message"].append({"role": "assistant", "content": [{"text": content}]})
+        return inference_data
+
     def _add_assistant_message_FC(
         self, inference_data: dict, model_response_data: dict
     ) -> dict:
@@ -1,6 +1,7 @@
 import os
 
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from bfcl_eval.model_handler.model_style import ModelStyle
 from openai import OpenAI
 
@@ -12,6 +13,7 @@ class NovitaHandler(OpenAICompletionsHandler):
         self.client = OpenAI(
             base_url="https://api.novita.ai/v3/openai",
             api_key=os.getenv("NOVITA_API_KEY"),
+            http_client=get_http_client("https://api.novita.ai/v3/openai"),
         )
 
     #### FC methods ####
@@ -2,6 +2,7 @@ import os
 
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from bfcl_eval.model_handler.utils import (
     ast_parse,
     combine_consecutive_user_prompts,
@@ -18,6 +19,7 @@ class NvidiaHandler(OpenAICompletionsHandler):
         self.client = OpenAI(
             base_url="https://integrate.api.nvidia.com/v1",
             api_key=os.getenv("NVIDIA_API_KEY"),
+            http_client=get_http_client("https://integrate.api.nvidia.com/v1"),
         )
 
     def decode_ast(self, result, language="Python"):
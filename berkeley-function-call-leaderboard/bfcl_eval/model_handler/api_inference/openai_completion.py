@@ -5,15 +5,17 @@ from typing import Any
 
 from bfcl_eval.constants.type_mappings import GORILLA_TO_OPENAPI
 from bfcl_eval.model_handler.base_handler import BaseHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import (
+    compile_tools,
     convert_to_function_call,
-    convert_to_tool,
     default_decode_ast_prompting,
     default_decode_execute_prompting,
     format_execution_results_prompting,
     func_doc_language_specific_pre_processing,
     retry_with_backoff,
+    split_choices,
     system_prompt_pre_processing_chat_model,
 )
 from openai import OpenAI, RateLimitError
@@ -23,7 +25,13 @@ class OpenAICompletionsHandler(BaseHandler):
     def __init__(self, model_name, temperature) -> None:
         super().__init__(model_name, temperature)
         self.model_style = ModelStyle.OpenAI_Completions
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            # Same base URL as the SDK client, which also reads `OPENAI_BASE_URL`
+            http_client=get_http_client(
+                os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+            ),
+        )
 
     def decode_ast(self, result, language="Python"):
         if "FC" in self.model_name or self.is_fc_model:
@@ -50,6 +58,18 @@ class OpenAICompletionsHandler(BaseHandler):
 
         return api_response, end_time - start_time
 
+    def _split_samples(self, api_response: any) -> list:
+        return split_choices(api_response)
+
+    def sends_seed(self) -> bool:
+        # Subclasses that build their own requests (e.g. for another provider) don't forward it
+        query_method = (
+            "_query_FC" if "FC" in self.model_name or self.is_fc_model else "_query_prompting"
+        )
+        return getattr(type(self), query_method) is getattr(
+            OpenAICompletionsHandler, query_method
+        )
+
     #### FC methods ####
 
     def _query_FC(self, inference_data: dict):
@@ -67,6 +87,12 @@ class OpenAICompletionsHandler(BaseHandler):
         if len(tools) > 0:
             kwargs["tools"] = tools
 
+        if inference_data.get("num_samples", 1) > 1:
+            kwargs["n"] = inference_data["num_samples"]
+
+        if self.seed is not None:
+            kwargs["seed"] = self.seed
+
         return self.generate_with_backoff(**kwargs)
 
     def _pre_query_processing_FC(self, inference_data: dict, test_entry: dict) -> dict:
@@ -77,8 +103,7 @@ class OpenAICompletionsHandler(BaseHandler):
         functions: list = test_entry["function"]
         test_category: str = test_entry["id"].rsplit("_", 1)[0]
 
-        functions = func_doc_language_specific_pre_processing(functions, test_category)
-        tools = convert_to_tool(functions, GORILLA_TO_OPENAPI, self.model_style)
+        tools = compile_tools(functions, test_category, GORILLA_TO_OPENAPI, self.model_style)
 
         inference_data["tools"] = tools
 
@@ -196,12 +221,20 @@ class OpenAICompletionsHandler(BaseHandler):
     def _query_prompting(self, inference_data: dict):
         inference_data["inference_input_log"] = {"message": repr(inference_data["message"])}
 
-        return self.generate_with_backoff(
-            messages=inference_data["message"],
-            model=self.model_name,
-            temperature=self.temperature,
-            store=False,
-        )
+        kwargs = {
+            "messages": inference_data["message"],
+            "model": self.model_name,
+            "temperature": self.temperature,
+            "store": False,
+        }
+
+        if inference_data.get("num_samples", 1) > 1:
+            kwargs["n"] = inference_data["num_samples"]
+
+        if self.seed is not None:
+            kwargs["seed"] = self.seed
+
+        return self.generate_with_backoff(**kwargs)
 
     def _pre_query_processing_prompting(self, test_entry: dict) -> dict:
         functions: list = test_entry["function"]
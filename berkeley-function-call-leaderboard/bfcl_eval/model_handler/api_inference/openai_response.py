@@ -4,10 +4,11 @@ import time
 
 from bfcl_eval.constants.type_mappings import GORILLA_TO_OPENAPI
 from bfcl_eval.model_handler.base_handler import BaseHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import (
+    compile_tools,
     convert_to_function_call,
-    convert_to_tool,
     default_decode_ast_prompting,
     default_decode_execute_prompting,
     format_execution_results_prompting,
@@ -23,7 +24,13 @@ class OpenAIResponsesHandler(BaseHandler):
     def __init__(self, model_name, temperature) -> None:
         super().__init__(model_name, temperature)
         self.model_style = ModelStyle.OpenAI_Responses
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            # Same base URL as the SDK client, which also reads `OPENAI_BASE_URL`
+            http_client=get_http_client(
+                os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+            ),
+        )
 
     @staticmethod
     def _substitute_prompt_role(prompts: list[dict]) -> list[dict]:
@@ -103,8 +110,7 @@ class OpenAIResponsesHandler(BaseHandler):
         functions: list = test_entry["function"]
         test_category: str = test_entry["id"].rsplit("_", 1)[0]
 
-        functions = func_doc_language_specific_pre_processing(functions, test_category)
-        tools = convert_to_tool(functions, GORILLA_TO_OPENAPI, self.model_style)
+        tools = compile_tools(functions, test_category, GORILLA_TO_OPENAPI, self.model_style)
 
         inference_data["tools"] = tools
 
@@ -2,6 +2,7 @@ import os
 from typing import Any
 
 from bfcl_eval.model_handler.api_inference.openai_completion import OpenAICompletionsHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from bfcl_eval.model_handler.model_style import ModelStyle
 from openai import OpenAI
 from overrides import override
@@ -23,6 +24,7 @@ class QwenAPIHandler(OpenAICompletionsHandler):
         self.client = OpenAI(
             base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
             api_key=os.getenv("QWEN_API_KEY"),
+            http_client=get_http_client("https://dashscope.aliyuncs.com/compatible-mode/v1"),
         )
 
     #### FC methods ####
@@ -3,12 +3,12 @@ import os
 import time
 
 from bfcl_eval.model_handler.base_handler import BaseHandler
+from bfcl_eval.model_handler.http_transport import get_http_client
 from bfcl_eval.constants.type_mappings import GORILLA_TO_OPENAPI
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import (
+    compile_tools,
     convert_to_function_call,
-    convert_to_tool,
-    func_doc_language_specific_pre_processing,
 )
 from openai import OpenAI
 
@@ -18,7 +18,11 @@ class YiHandler(BaseHandler):
         super().__init__(model_name, temperature)
         self.model_style = ModelStyle.OpenAI_Completions
         self.base_url = "https://api.01.ai/v1"
-        self.client = OpenAI(base_url=self.base_url, api_key=os.getenv("YI_API_KEY"))
+        self.client = OpenAI(
+            base_url=self.base_url,
+            api_key=os.getenv("YI_API_KEY"),
+            http_client=get_http_client(self.base_url),
+        )
 
     def decode_ast(self, result, language="Python"):
         decoded_output = []
@@ -66,8 +70,7 @@ class YiHandler(BaseHandler):
         functions: list = test_entry["function"]
         test_category: str = test_entry["id"].rsplit("_", 1)[0]
 
-        functions = func_doc_language_specific_pre_processing(functions, test_category)
-        tools = convert_to_tool(functions, GORILLA_TO_OPENAPI, self.model_style)
+        tools = compile_tools(functions, test_category, GORILLA_TO_OPENAPI, self.model_style)
 
         inference_data["tools"] = tools
 
@@ -1,21 +1,36 @@
-import json
+import os
 import time
 from copy import deepcopy
+from typing import Callable, Optional
 
+from bfcl_eval._json_codec import write_jsonl
 from bfcl_eval.constants.category_mapping import VERSION_PREFIX
 from bfcl_eval.constants.default_prompts import (
     DEFAULT_USER_PROMPT_FOR_ADDITIONAL_FUNCTION_FC,
     DEFAULT_USER_PROMPT_FOR_ADDITIONAL_FUNCTION_PROMPTING,
+    LOOP_DETECTION_REPEAT_LIMIT,
+    LOOP_DETECTION_TURN_END_MESSAGE,
     MAXIMUM_STEP_LIMIT,
 )
 from bfcl_eval.constants.eval_config import RESULT_PATH
 from bfcl_eval.eval_checker.multi_turn_eval.multi_turn_utils import (
     STATELESS_CLASSES,
+    end_multi_turn_session,
     execute_multi_turn_func_call,
+    get_instance_state_digest,
     is_empty_execute_response,
+    restore_instances,
 )
+from bfcl_eval.model_handler.input_log import INPUT_LOG_MESSAGES_KEY, InputLogEncoder
 from bfcl_eval.model_handler.model_style import ModelStyle
-from bfcl_eval.utils import load_file, make_json_serializable, sort_key
+from bfcl_eval.model_handler.request_hedging import run_query
+from bfcl_eval.model_handler.turn_checkpoint import (
+    load_turn_checkpoint,
+    remove_turn_checkpoint,
+    save_turn_checkpoint,
+)
+from bfcl_eval.model_handler.utils import StepLoopDetector
+from bfcl_eval.utils import load_file, sort_key
 from overrides import final
 
 
@@ -32,6 +47,14 @@ class BaseHandler:
         )
         self.temperature = temperature
         self.is_fc_model = False  # Whether the model is a function calling model
+        # Number of identical steps (or cycles of steps) after which a multi-turn turn is ended early; 0 disables the check
+        self.loop_repeat_limit = LOOP_DETECTION_REPEAT_LIMIT
+        # Where multi-turn entries are checkpointed after each turn, or None to disable checkpointing
+        self.checkpoint_dir = None
+        # Number of completions generated for each single-turn entry, for pass@k evaluation
+        self.num_samples = 1
+        # Sampling seed sent with each request, for the handlers whose API supports one; None to let the provider choose
+        self.seed = None
 
     def inference(self, test_entry: dict, include_input_log: bool, exclude_state_log: bool):
         # This method is used to retrive model response for each model.
@@ -40,17 +63,27 @@ class BaseHandler:
         # TODO: Let all models have the is_fc_model attribute and remove the "FC" check
         if "FC" in self.model_name or self.is_fc_model:
             if "multi_turn" in test_entry["id"]:
-                return self.inference_multi_turn_FC(
-                    test_entry, include_input_log, exclude_state_log
-                )
+                try:
+                    return self.inference_multi_turn_FC(
+                        test_entry, include_input_log, exclude_state_log
+                    )
+                finally:
+                    end_multi_turn_session(
+                        self.model_name_underline_replaced, test_entry["id"]
+                    )
             else:
                 return self.inference_single_turn_FC(test_entry, include_input_log)
         # Prompting model
         else:
             if "multi_turn" in test_entry["id"]:
-                return self.inference_multi_turn_prompting(
-                    test_entry, include_input_log, exclude_state_log
-                )
+                try:
+                    return self.inference_multi_turn_prompting(
+                        test_entry, include_input_log, exclude_state_log
+                    )
+                finally:
+                    end_multi_turn_session(
+                        self.model_name_underline_replaced, test_entry["id"]
+                    )
             else:
                 return self.inference_single_turn_prompting(test_entry, include_input_log)
 
@@ -79,6 +112,22 @@ class BaseHandler:
         force_quit = False  # Whether the model has been forced to quit. If True, this whole entry will be failed.
 
         all_reasoning_content: list[list] = []
+        # Delta-encodes the input logs of the steps; its message table is stored with the result
+        input_log_encoder = InputLogEncoder()
+
+        # Resume after the last completed turn, if an earlier attempt at this entry left a checkpoint
+        checkpoint = self._load_turn_checkpoint(test_entry)
+        completed_turns = 0
+        if checkpoint is not None:
+            completed_turns = checkpoint["completed_turns"]
+            total_input_token_count = checkpoint["total_input_token_count"]
+            total_output_token_count = checkpoint["total_output_token_count"]
+            total_latency = checkpoint["total_latency"]
+            all_model_response = checkpoint["all_model_response"]
+            all_reasoning_content = checkpoint["all_reasoning_content"]
+            all_inference_log = checkpoint["all_inference_log"]
+            input_log_encoder = checkpoint.get("input_log_encoder", input_log_encoder)
+
         # Execute no function call, but just to get a reference to all the instances to get the initial state for logging purpose
         if not exclude_state_log:
             _, involved_instances = execute_multi_turn_func_call(
@@ -109,11 +158,15 @@ class BaseHandler:
                         },
                     }
                 )
-            all_inference_log.append(state_log)
+            # A resumed entry already has the initial state in its restored log
+            if checkpoint is None:
+                all_inference_log.append(state_log)
 
         inference_data: dict = {}
         inference_data = self._pre_query_processing_FC(inference_data, test_entry)
         inference_data = self._compile_tools(inference_data, test_entry)
+        if checkpoint is not None:
+            inference_data = checkpoint["inference_data"]
 
         all_multi_turn_messages: list[list[dict]] = test_entry["question"]
         for turn_idx, current_turn_message in enumerate(all_multi_turn_messages):
@@ -133,6 +186,10 @@ class BaseHandler:
                     }
                 ]
 
+            # Already completed by an earlier attempt
+            if turn_idx < completed_turns:
+                continue
+
             if turn_idx == 0:
                 inference_data = self.add_first_turn_message_FC(
                     inference_data, current_turn_message
@@ -152,6 +209,7 @@ class BaseHandler:
             current_turn_reasoning_content = []
 
             count = 0
+            loop_detector = StepLoopDetector(self.loop_repeat_limit)
             while True:
                 print("-" * 100)
                 print(
@@ -161,7 +219,9 @@ class BaseHandler:
                 # Add to the current_turn_inference_log at beginning of each step so that we don't need to bother dealing with the break statements
                 current_turn_inference_log[f"step_{count}"] = current_step_inference_log
 
-                api_response, query_latency = self._query_FC(inference_data)
+                api_response, query_latency = run_query(
+                    self.model_name, self._query_FC, inference_data
+                )
 
                 # This part of logging is disabled by default because it is too verbose and will make the result file extremely large
                 # It is only useful to see if the inference pipeline is working as expected (eg, does it convert all the inputs correctly)
@@ -169,7 +229,10 @@ class BaseHandler:
                     current_step_inference_log.append(
                         {
                             "role": "inference_input",
-                            "content": inference_data.get("inference_input_log", ""),
+                            "content": input_log_encoder.encode(
+                                inference_data.get("inference_input_log", ""),
+                                inference_data.get("message"),
+                            ),
                         }
                     )
 
@@ -260,6 +323,29 @@ class BaseHandler:
                         }
                     )
 
+                # End the turn early if the model keeps making the same calls and getting the same results
+                loop_reason = loop_detector.record_step(
+                    decoded_model_responses,
+                    execution_results,
+                    get_instance_state_digest(involved_instances)
+                    if loop_detector.enabled
+                    else None,
+                )
+                if loop_reason is not None:
+                    print(f"{loop_reason} Proceed to next turn.")
+                    current_step_inference_log.append(
+                        {
+                            "role": "handler_log",
+                            "content": f"{loop_reason} Proceed to next turn.",
+                            "loop_detected": True,
+                        }
+                    )
+                    # The chat history ends with the execution results; close the turn with an assistant message, as some providers reject a user message right after tool results
+                    inference_data = self._add_turn_end_message(
+                        inference_data, LOOP_DETECTION_TURN_END_MESSAGE
+                    )
+                    break
+
                 count += 1
                 # Force quit after too many steps
                 if count > MAXIMUM_STEP_LIMIT:
@@ -301,6 +387,24 @@ class BaseHandler:
                     )
                 all_inference_log.append(state_log)
 
+            self._save_turn_checkpoint(
+                test_entry,
+                {
+                    # A forced quit ends the entry, so no turn is left to resume
+                    "completed_turns": (
+                        len(all_multi_turn_messages) if force_quit else turn_idx + 1
+                    ),
+                    "inference_data": inference_data,
+                    "total_input_token_count": total_input_token_count,
+                    "total_output_token_count": total_output_token_count,
+                    "total_latency": total_latency,
+                    "all_model_response": all_model_response,
+                    "all_reasoning_content": all_reasoning_content,
+                    "all_inference_log": all_inference_log,
+                    "input_log_encoder": input_log_encoder,
+                },
+            )
+
             if force_quit:
                 break
 
@@ -310,6 +414,8 @@ class BaseHandler:
             "latency": total_latency,
             "inference_log": all_inference_log,
         }
+        if input_log_encoder.messages:
+            metadata[INPUT_LOG_MESSAGES_KEY] = input_log_encoder.messages
 
         if not all(
             all(content == "" for content in single_turn_reasoning_content)
@@ -343,6 +449,22 @@ class BaseHandler:
         all_inference_log: list[list[dict]] = []
         force_quit = False  # Whether the model has been forced to quit. If True, this whole entry will be failed.
 
+        # Delta-encodes the input logs of the steps; its message table is stored with the result
+        input_log_encoder = InputLogEncoder()
+
+        # Resume after the last completed turn, if an earlier attempt at this entry left a checkpoint
+        checkpoint = self._load_turn_checkpoint(test_entry)
+        completed_turns = 0
+        if checkpoint is not None:
+            completed_turns = checkpoint["completed_turns"]
+            total_input_token_count = checkpoint["total_input_token_count"]
+            total_output_token_count = checkpoint["total_output_token_count"]
+            total_latency = checkpoint["total_latency"]
+            all_model_response = checkpoint["all_model_response"]
+            all_reasoning_content = checkpoint["all_reasoning_content"]
+            all_inference_log = checkpoint["all_inference_log"]
+            input_log_encoder = checkpoint.get("input_log_encoder", input_log_encoder)
+
         # Execute no function call, but just to get a reference to all the instances to get the initial state for logging purpose
         if not exclude_state_log:
             _, involved_instances = execute_multi_turn_func_call(
@@ -373,9 +495,13 @@ class BaseHandler:
                         },
                     }
                 )
-            all_inference_log.append(state_log)
+            # A resumed entry already has the initial state in its restored log
+            if checkpoint is None:
+                all_inference_log.append(state_log)
 
         inference_data: dict = self._pre_query_processing_prompting(test_entry)
+        if checkpoint is not None:
+            inference_data = checkpoint["inference_data"]
 
         all_multi_turn_messages: list[list[dict]] = test_entry["question"]
         for turn_idx, current_turn_message in enumerate(all_multi_turn_messages):
@@ -394,6 +520,10 @@ class BaseHandler:
                     }
                 ]
 
+            # Already completed by an earlier attempt
+            if turn_idx < completed_turns:
+                continue
+
             if turn_idx == 0:
                 inference_data = self.add_first_turn_message_prompting(
                     inference_data, current_turn_message
@@ -413,6 +543,7 @@ class BaseHandler:
             current_turn_latency: list[float] = []
 
             count = 0
+            loop_detector = StepLoopDetector(self.loop_repeat_limit)
             while True:
                 print("-" * 100)
                 print(
@@ -422,7 +553,9 @@ class BaseHandler:
                 # Add to the current_turn_inference_log at beginning of each step so that we don't need to bother dealing with the break statements
                 current_turn_inference_log[f"step_{count}"] = current_step_inference_log
 
-                api_response, query_latency = self._query_prompting(inference_data)
+                api_response, query_latency = run_query(
+                    self.model_name, self._query_prompting, inference_data
+                )
 
                 # This part of logging is disabled by default because it is too verbose and will make the result file extremely large
                 # It is only useful to see if the inference pipeline is working as expected (eg, does it convert all the inputs correctly)
@@ -430,7 +563,10 @@ class BaseHandler:
                     current_step_inference_log.append(
                         {
                             "role": "inference_input",
-                            "content": inference_data.get("inference_input_log", ""),
+                            "content": input_log_encoder.encode(
+                                inference_data.get("inference_input_log", ""),
+                                inference_data.get("message"),
+                            ),
                         }
                     )
 
@@ -521,6 +657,29 @@ class BaseHandler:
                         }
                     )
 
+                # End the turn early if the model keeps making the same calls and getting the same results
+                loop_reason = loop_detector.record_step(
+                    decoded_model_responses,
+                    execution_results,
+                    get_instance_state_digest(involved_instances)
+                    if loop_detector.enabled
+                    else None,
+                )
+                if loop_reason is not None:
+                    print(f"{loop_reason} Proceed to next turn.")
+                    current_step_inference_log.append(
+                        {
+                            "role": "handler_log",
+                            "content": f"{loop_reason} Proceed to next turn.",
+                            "loop_detected": True,
+                        }
+                    )
+                    # The chat history ends with the execution results; close the turn with an assistant message, as some providers reject a user message right after tool results
+                    inference_data = self._add_turn_end_message(
+                        inference_data, LOOP_DETECTION_TURN_END_MESSAGE
+                    )
+                    break
+
                 count += 1
                 # Force quit after too many steps
                 if count > MAXIMUM_STEP_LIMIT:
@@ -561,6 +720,24 @@ class BaseHandler:
                     )
                 all_inference_log.append(state_log)
 
+            self._save_turn_checkpoint(
+                test_entry,
+                {
+                    # A forced quit ends the entry, so no turn is left to resume
+                    "completed_turns": (
+                        len(all_multi_turn_messages) if force_quit else turn_idx + 1
+                    ),
+                    "inference_data": inference_data,
+                    "total_input_token_count": total_input_token_count,
+                    "total_output_token_count": total_output_token_count,
+                    "total_latency": total_latency,
+                    "all_model_response": all_model_response,
+                    "all_reasoning_content": all_reasoning_content,
+                    "all_inference_log": all_inference_log,
+                    "input_log_encoder": input_log_encoder,
+                },
+            )
+
             if force_quit:
                 break
 
@@ -570,6 +747,8 @@ class BaseHandler:
             "latency": total_latency,
             "inference_log": all_inference_log,
         }
+        if input_log_encoder.messages:
+            metadata[INPUT_LOG_MESSAGES_KEY] = input_log_encoder.messages
         # We only include reasoning content if it exists and is not empty
         if not all(
             all(content == "" for content in single_turn_reasoning_content)
@@ -590,7 +769,17 @@ class BaseHandler:
             inference_data, test_entry["question"][0]
         )
 
-        api_response, query_latency = self._query_FC(inference_data)
+        if self.num_samples > 1:
+            return self._inference_single_turn_samples(
+                self._query_FC,
+                self._parse_query_response_FC,
+                inference_data,
+                include_input_log,
+            )
+
+        api_response, query_latency = run_query(
+            self.model_name, self._query_FC, inference_data
+        )
 
         # Try parsing the model response
         model_response_data = self._parse_query_response_FC(api_response)
@@ -625,7 +814,17 @@ class BaseHandler:
             inference_data, test_entry["question"][0]
         )
 
-        api_response, query_latency = self._query_prompting(inference_data)
+        if self.num_samples > 1:
+            return self._inference_single_turn_samples(
+                self._query_prompting,
+                self._parse_query_response_prompting,
+                inference_data,
+                include_input_log,
+            )
+
+        api_response, query_latency = run_query(
+            self.model_name, self._query_prompting, inference_data
+        )
 
         # Try parsing the model response
         model_response_data = self._parse_query_response_prompting(api_response)
@@ -651,6 +850,72 @@ class BaseHandler:
 
         return model_response_data["model_responses"], metadata
 
+    @final
+    def _inference_single_turn_samples(
+        self,
+        query_method: Callable,
+        parse_method: Callable,
+        inference_data: dict,
+        include_input_log: bool,
+    ) -> tuple[any, dict]:
+        """
+        Generate `self.num_samples` completions for a single-turn entry.
+        The query method is told how many completions are still needed through `inference_data["num_samples"]`; handlers whose API can return several completions in one call (the `n` parameter) use it, and split the response in `_split_samples`. Otherwise, the query is repeated until there are enough samples.
+        The first sample is returned as the model response, and all of them are stored under `samples` in the metadata.
+        """
+        all_model_response_data = []
+        total_input_token_count = 0
+        total_output_token_count = 0
+        total_latency = 0
+        while len(all_model_response_data) < self.num_samples:
+            inference_data["num_samples"] = self.num_samples - len(all_model_response_data)
+            api_response, query_latency = run_query(
+                self.model_name, query_method, inference_data
+            )
+            call_model_response_data = [
+                parse_method(sample) for sample in self._split_samples(api_response)
+            ]
+            # The token usage is reported once for the whole call, so every sample of a call carries the same counts
+            total_input_token_count += call_model_response_data[0]["input_token"]
+            total_output_token_count += call_model_response_data[0]["output_token"]
+            total_latency += query_latency
+            all_model_response_data.extend(call_model_response_data)
+        all_model_response_data = all_model_response_data[: self.num_samples]
+
+        metadata = {}
+        if include_input_log:
+            metadata["inference_log"] = [
+                {
+                    "role": "inference_input",
+                    "content": inference_data.get("inference_input_log", ""),
+                }
+            ]
+        metadata["input_token_count"] = total_input_token_count
+        metadata["output_token_count"] = total_output_token_count
+        metadata["latency"] = total_latency
+
+        if all_model_response_data[0].get("reasoning_content", "") != "":
+            metadata["reasoning_content"] = all_model_response_data[0]["reasoning_content"]
+        metadata["samples"] = [
+            model_response_data["model_responses"]
+            for model_response_data in all_model_response_data
+        ]
+
+        return all_model_response_data[0]["model_responses"], metadata
+
+    def _split_samples(self, api_response: any) -> list:
+        """
+        Split a response that holds several completions (requested with `inference_data["num_samples"]`) into one response per completion, each of which can be fed into the `_parse_query_response_xxx` methods.
+        Handlers that always get a single completion per call don't need to override this.
+        """
+        return [api_response]
+
+    def sends_seed(self) -> bool:
+        """
+        Whether the requests of the handler carry `self.seed`. Handlers whose API takes a sampling seed override this.
+        """
+        return False
+
     def decode_ast(self, result, language="Python"):
         """
         This method takes raw model output (from `_parse_query_response_xxx`) and convert it to standard AST checker input.
@@ -664,6 +929,53 @@ class BaseHandler:
         raise NotImplementedError
 
     @final
+    def _load_turn_checkpoint(self, test_entry: dict) -> Optional[dict]:
+        """
+        Load the checkpoint left by an earlier attempt at this multi-turn entry, and restore its simulator instances.
+        Returns `None` if checkpointing is disabled or there is no checkpoint.
+        """
+        if self.checkpoint_dir is None:
+            return None
+        checkpoint = load_turn_checkpoint(self.checkpoint_dir, test_entry["id"])
+        if checkpoint is None:
+            return None
+
+        restore_instances(
+            self.model_name_underline_replaced, test_entry["id"], checkpoint["instances"]
+        )
+        print(
+            f"Resuming {test_entry['id']} after turn {checkpoint['completed_turns'] - 1}."
+        )
+        return checkpoint
+
+    def _save_turn_checkpoint(self, test_entry: dict, checkpoint: dict) -> None:
+        if self.checkpoint_dir is None:
+            return
+        test_entry_id = test_entry["id"]
+        test_category = test_entry_id.rsplit("_", 1)[0]
+
+        # Execute no function call, but just to get the current instances
+        _, involved_instances = execute_multi_turn_func_call(
+            [],
+            test_entry["initial_config"],
+            test_entry["involved_classes"],
+            self.model_name_underline_replaced,
+            test_entry_id,
+            long_context=(
+                "long_context" in test_category or "composite" in test_category
+            ),
+            is_evaL_run=False,
+        )
+        try:
+            save_turn_checkpoint(
+                self.checkpoint_dir,
+                test_entry_id,
+                {**checkpoint, "instances": involved_instances},
+            )
+        except Exception as e:
+            # e.g. a handler keeps an unpicklable object in its inference data; the entry just can't be resumed
+            print(f"⚠️ Failed to checkpoint {test_entry_id}: {e}")
+
     def write(self, result, result_dir, update_mode=False):
         model_name_dir = self.model_name.replace("/", "_")
         model_result_dir = result_dir / model_name_dir
@@ -672,12 +984,9 @@ class BaseHandler:
         if isinstance(result, dict):
             result = [result]
 
-        # Collect and format each entry for JSON compatibility
-        entries_to_write = [make_json_serializable(entry) for entry in result]
-
         # Group entries by their `test_category` for efficient file handling
         file_entries = {}
-        for entry in entries_to_write:
+        for entry in result:
             test_category = entry["id"].rsplit("_", 1)[0]
             file_name = f"{VERSION_PREFIX}_{test_category}_result.json"
             file_path = model_result_dir / file_name
@@ -698,16 +1007,45 @@ class BaseHandler:
 
                 # Sort entries by `id` and write them back to ensure order consistency
                 sorted_entries = sorted(existing_entries.values(), key=sort_key)
-                with open(file_path, "w") as f:
-                    for entry in sorted_entries:
-                        f.write(json.dumps(entry) + "\n")
+                write_jsonl(file_path, sorted_entries)
 
             else:
                 # Normal mode: Append in sorted order
                 entries.sort(key=sort_key)
-                with open(file_path, "a") as f:
-                    for entry in entries:
-                        f.write(json.dumps(entry) + "\n")
+                write_jsonl(file_path, entries, append=True)
+
+        if self.checkpoint_dir is not None:
+            # The entries are safely on disk now; only the failed ones are worth resuming
+            for entry in result:
+                if not (
+                    isinstance(entry["result"], str)
+                    and entry["result"].startswith("Error during inference")
+                ):
+                    remove_turn_checkpoint(self.checkpoint_dir, entry["id"])
+
+    def sort_result_files(self, result_dir, test_entries):
+        """
+        Rewrite the result files of the given entries sorted by id.
+        The results are appended as they complete, which is not id order when the entries are scheduled longest-first.
+        """
+        model_result_dir = result_dir / self.model_name.replace("/", "_")
+        test_categories = {entry["id"].rsplit("_", 1)[0] for entry in test_entries}
+        for test_category in sorted(test_categories):
+            file_path = model_result_dir / f"{VERSION_PREFIX}_{test_category}_result.json"
+            if not file_path.exists():
+                continue
+            # Written aside first, so that an interruption never leaves a truncated result file behind
+            temp_path = file_path.with_suffix(f".{os.getpid()}.tmp")
+            write_jsonl(temp_path, load_file(file_path, sort_by_id=True))
+            os.replace(temp_path, file_path)
+
+    def _add_turn_end_message(self, inference_data: dict, content: str) -> dict:
+        """
+        Add an assistant text message to the chat history, to close a turn that the handler ends early (e.g. on a detected loop) right after the execution results.
+        Handlers whose chat history is not a list of role/content dicts override this.
+        """
+        inference_data["message"].append({"role": "assistant", "content": content})
+        return inference_data
 
     #### FC methods ####
 
@@ -732,7 +1070,7 @@ class BaseHandler:
         """
         [Only for FC mode]
         This method is used to prepare/compile the tools from the test entry and add them to the inference data to use for model query in FC mode.
-        Function docs usually need to be transformed to the format expected by the model, done through the `convert_to_tool` function from `model_handler/utils.py`.
+        Function docs usually need to be transformed to the format expected by the model, done through the `compile_tools` (or `convert_to_tool`) function from `model_handler/utils.py`. Both leave the function docs unchanged and cache their output, so this method can be called again when holdout functions are added.
         The inference_data dict is updated in place and returned.
         """
         raise NotImplementedError
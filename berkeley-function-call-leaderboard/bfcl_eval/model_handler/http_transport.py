@@ -0,0 +1,140 @@
+import threading
+from collections import defaultdict
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import h2  # noqa: F401
+
+    # HTTP/2 multiplexes the concurrent requests to the same host over one connection
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Size of each connection pool, unless `configure_connection_pools` is called with the number of threads
+DEFAULT_POOL_SIZE = 16
+
+# Process-wide registry of connection pools, shared by all handlers and threads
+_pool_size = DEFAULT_POOL_SIZE
+_http_clients: dict[str, httpx.Client] = {}
+_requests_session: Optional[requests.Session] = None
+_registry_lock = threading.Lock()
+
+# Base URL -> {"requests": ..., "connections": ...}, for the httpx clients
+_connection_stats = defaultdict(lambda: {"requests": 0, "connections": 0})
+_stats_lock = threading.Lock()
+
+
+def configure_connection_pools(num_threads: int) -> None:
+    """
+    Size the connection pools handed out from now on to the number of inference threads, so that every thread can keep its own connection alive.
+    Pools that have already been created keep their size.
+    """
+    global _pool_size
+    _pool_size = max(num_threads, 1)
+
+
+def _make_tracer(base_url: str):
+    def trace(event_name: str, info: dict) -> None:
+        # A TCP connect only happens when no idle keep-alive connection was available
+        if event_name == "connection.connect_tcp.complete":
+            counter = "connections"
+        elif event_name.endswith(".send_request_headers.started"):
+            counter = "requests"
+        else:
+            return
+        with _stats_lock:
+            _connection_stats[base_url][counter] += 1
+
+    return trace
+
+
+def get_http_client(base_url: str, min_pool_size: Optional[int] = None) -> httpx.Client:
+    """
+    Get the shared `httpx.Client` for the given base URL, to be passed as `http_client` to the SDK clients (`OpenAI`, `Anthropic`, ...).
+
+    SDK clients created with their default settings each open their own small connection pool, so every handler instance (and `bfcl evaluate` creates one per result file) pays for new TCP and TLS handshakes.
+    The shared client keeps up to the configured number of keep-alive connections per base URL instead.
+    Timeouts are still set per request by the SDK clients.
+    """
+    client = _http_clients.get(base_url)
+    if client is not None:
+        return client
+
+    with _registry_lock:
+        client = _http_clients.get(base_url)
+        if client is None:
+            pool_size = max(_pool_size, min_pool_size or 0)
+            trace = _make_tracer(base_url)
+
+            def attach_tracer(request: httpx.Request) -> None:
+                request.extensions["trace"] = trace
+
+            client = httpx.Client(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                ),
+                follow_redirects=True,
+                event_hooks={"request": [attach_tracer]},
+            )
+            _http_clients[base_url] = client
+    return client
+
+
+def get_requests_session() -> requests.Session:
+    """
+    Get the shared `requests.Session`, for the handlers that talk to their endpoint with `requests` directly.
+    """
+    global _requests_session
+    if _requests_session is None:
+        with _registry_lock:
+            if _requests_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=_pool_size, pool_maxsize=_pool_size
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _requests_session = session
+    return _requests_session
+
+
+def get_connection_stats() -> dict[str, dict[str, int]]:
+    """
+    Get the number of requests sent and connections opened for each base URL (or host, for the `requests` session).
+    The difference between the two is the number of requests that reused a keep-alive connection.
+    """
+    with _stats_lock:
+        stats = {base_url: dict(counts) for base_url, counts in _connection_stats.items()}
+
+    if _requests_session is not None:
+        for adapter in set(_requests_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                counts = stats.setdefault(
+                    f"{pool.scheme}://{pool.host}:{pool.port}",
+                    {"requests": 0, "connections": 0},
+                )
+                counts["requests"] += pool.num_requests
+                counts["connections"] += pool.num_connections
+
+    for counts in stats.values():
+        counts["reused"] = max(counts["requests"] - counts["connections"], 0)
+    return stats
+
+
+def print_connection_stats() -> None:
+    for base_url, counts in get_connection_stats().items():
+        if counts["requests"] == 0:
+            continue
+        print(
+            f"🔌 {base_url}: {counts['requests']} requests over {counts['connections']} connections ({counts['reused']} reused)."
+        )
@@ -0,0 +1,193 @@
+from copy import deepcopy
+from typing import Optional
+
+# Key of the result entry that holds the message table of its delta-encoded input logs
+INPUT_LOG_MESSAGES_KEY = "input_log_messages"
+# Marks the content of a delta-encoded `inference_input` log
+DELTA_ENCODED_KEY = "delta_encoded"
+
+
+class InputLogEncoder:
+    """
+    Delta-encode the `inference_input` logs of the steps of a multi-turn entry.
+
+    Every query sends the whole conversation so far, so logging it in full at each step makes the log grow quadratically with the number of steps.
+    Instead, each distinct message is stored once in the message table of the entry, where its index is its id.
+    The `message` field of a step then only records how many messages it shares with the previous step (`prefix_length`), and the ids of the messages after them (`new_message_ids`).
+    Other fields are recorded as `unchanged` when they are the same as in the previous step (e.g. the tools), and strings that extend the one of the previous step (e.g. the formatted prompt of the OSS models) by their new suffix.
+
+    `decode_input_logs` reconstructs the full logs.
+    """
+
+    def __init__(self):
+        # The message table: each message in the form the handler logs it, `repr(message)` or the message itself
+        self.messages: list = []
+        self._message_ids: dict[tuple[bool, str], int] = {}
+        self._previous_message_ids: list[int] = []
+        self._previous_fields: dict = {}
+
+    def _get_message_id(self, message, is_repr: bool) -> int:
+        key = (is_repr, message if is_repr else repr(message))
+        if key not in self._message_ids:
+            self._message_ids[key] = len(self.messages)
+            # A copy, since the handler may still modify the messages of its chat history
+            self.messages.append(message if is_repr else deepcopy(message))
+        return self._message_ids[key]
+
+    def _encode_message_list(self, message_list: list, is_repr: bool) -> dict:
+        message_ids = [self._get_message_id(message, is_repr) for message in message_list]
+        prefix_length = 0
+        for previous_id, message_id in zip(self._previous_message_ids, message_ids):
+            if previous_id != message_id:
+                break
+            prefix_length += 1
+        self._previous_message_ids = message_ids
+        return {
+            "kind": "message_list",
+            "repr": is_repr,
+            "prefix_length": prefix_length,
+            "new_message_ids": message_ids[prefix_length:],
+        }
+
+    def _encode_field(self, key: str, value, messages: Optional[list]) -> dict:
+        has_previous_value = key in self._previous_fields
+        previous_value = self._previous_fields.get(key)
+        self._previous_fields[key] = value
+
+        if key == "message":
+            if isinstance(value, list):
+                return self._encode_message_list(value, is_repr=False)
+            # Most handlers log `repr(message)`, which is the reprs of the messages joined in the list syntax
+            if (
+                isinstance(value, str)
+                and isinstance(messages, list)
+                and value == repr(messages)
+            ):
+                return self._encode_message_list(
+                    [repr(message) for message in messages], is_repr=True
+                )
+
+        if has_previous_value and previous_value == value:
+            return {"kind": "unchanged"}
+        if isinstance(value, str) and isinstance(previous_value, str):
+            prefix_length = _common_prefix_length(previous_value, value)
+            if prefix_length > 0:
+                return {
+                    "kind": "string",
+                    "prefix_length": prefix_length,
+                    "suffix": value[prefix_length:],
+                }
+        return {"kind": "value", "value": value}
+
+    def encode(self, input_log, messages: Optional[list] = None):
+        """
+        Encode the input log of the next step, given the chat history that was sent (`inference_data["message"]`).
+        Input logs that are not a dict (no log, or a handler-specific format) are kept as they are.
+        """
+        if not isinstance(input_log, dict):
+            return input_log
+        encoded = {DELTA_ENCODED_KEY: True}
+        for key, value in input_log.items():
+            encoded[key] = self._encode_field(key, value, messages)
+        return encoded
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    # Compare chunk by chunk first, the strings can be long
+    chunk_size = 4096
+    length = 0
+    end = min(len(a), len(b))
+    while length < end and a[length : length + chunk_size] == b[length : length + chunk_size]:
+        length += chunk_size
+    length = min(length, end)
+    chunk_end = min(length + chunk_size, end)
+    while length < chunk_end and a[length] == b[length]:
+        length += 1
+    return length
+
+
+def _decode_field(key: str, encoded: dict, message_table: list, state: dict):
+    kind = encoded["kind"]
+    if kind == "message_list":
+        message_ids = state["message_ids"][: encoded["prefix_length"]] + encoded["new_message_ids"]
+        state["message_ids"] = message_ids
+        messages = [message_table[message_id] for message_id in message_ids]
+        value = f"[{', '.join(messages)}]" if encoded["repr"] else messages
+    elif kind == "unchanged":
+        value = state["fields"][key]
+    elif kind == "string":
+        value = state["fields"][key][: encoded["prefix_length"]] + encoded["suffix"]
+    else:
+        value = encoded["value"]
+    state["fields"][key] = value
+    return value
+
+
+def decode_input_logs(inference_log, message_table: Optional[list]):
+    """
+    Reconstruct the full `inference_input` logs of an entry from its delta-encoded `inference_log` and message table (`entry["input_log_messages"]`).
+    The steps are decoded in the order they were logged, since each one refers to the previous one. Logs that are not delta-encoded are returned as they are.
+    """
+    if not isinstance(inference_log, list):
+        return inference_log
+    message_table = message_table or []
+    state = {"message_ids": [], "fields": {}}
+
+    def decode_step(step_log):
+        decoded_step_log = []
+        for log_entry in step_log:
+            if (
+                isinstance(log_entry, dict)
+                and log_entry.get("role") == "inference_input"
+                and isinstance(log_entry.get("content"), dict)
+                and log_entry["content"].get(DELTA_ENCODED_KEY)
+            ):
+                log_entry = {
+                    **log_entry,
+                    "content": {
+                        key: _decode_field(key, value, message_table, state)
+                        for key, value in log_entry["content"].items()
+                        if key != DELTA_ENCODED_KEY
+                    },
+                }
+            decoded_step_log.append(log_entry)
+        return decoded_step_log
+
+    decoded_log = []
+    for turn_log in inference_log:
+        # Each turn is a dict of the query and the log of each step, between the lists of state logs
+        if isinstance(turn_log, dict):
+            turn_log = {
+                key: decode_step(value) if key.startswith("step_") else value
+                for key, value in turn_log.items()
+            }
+        decoded_log.append(turn_log)
+    return decoded_log
+
+
+def expand_input_logs(entry: dict) -> dict:
+    """
+    Get a copy of a result (or score file) entry with its input logs reconstructed in full, and without the message table.
+    """
+    if INPUT_LOG_MESSAGES_KEY not in entry and not _has_delta_encoded_log(entry.get("inference_log")):
+        return entry
+    expanded = {key: value for key, value in entry.items() if key != INPUT_LOG_MESSAGES_KEY}
+    expanded["inference_log"] = decode_input_logs(
+        entry.get("inference_log"), entry.get(INPUT_LOG_MESSAGES_KEY)
+    )
+    return expanded
+
+
+def _has_delta_encoded_log(inference_log) -> bool:
+    return isinstance(inference_log, list) and any(
+        isinstance(turn_log, dict)
+        and any(
+            isinstance(log_entry, dict)
+            and isinstance(log_entry.get("content"), dict)
+            and log_entry["content"].get(DELTA_ENCODED_KEY)
+            for key, step_log in turn_log.items()
+            if key.startswith("step_")
+            for log_entry in step_log
+        )
+        for turn_log in inference_log
+    )
@@ -2,18 +2,30 @@ import os
 import subprocess
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 import traceback
+from contextlib import contextmanager
+from functools import partial
 
 import requests
+from bfcl_eval._scheduling import plan_longest_first, report_makespan
 from bfcl_eval.constants.eval_config import RESULT_PATH, VLLM_PORT
+from bfcl_eval.eval_checker.multi_turn_eval.multi_turn_utils import (
+    end_multi_turn_session,
+)
 from bfcl_eval.model_handler.base_handler import BaseHandler
+from bfcl_eval.model_handler.http_transport import (
+    get_http_client,
+    get_requests_session,
+)
 from bfcl_eval.model_handler.model_style import ModelStyle
+from bfcl_eval.model_handler.request_hedging import get_request_timeout
 from bfcl_eval.model_handler.utils import (
     default_decode_ast_prompting,
     default_decode_execute_prompting,
     func_doc_language_specific_pre_processing,
+    split_choices,
     system_prompt_pre_processing_chat_model,
 )
 from openai import OpenAI
@@ -31,13 +43,20 @@ class OSSHandler(BaseHandler, EnforceOverrides):
         # Will be overridden in batch_inference method
         # Used to indicate where the tokenizer and config should be loaded from
         self.model_path_or_id = None
+        # Name of the LoRA adapter (served with `--lora-modules`) to query instead of the base model, if any
+        self.lora_adapter = None
 
         # Read from env vars with fallbacks
         self.vllm_host = os.getenv("VLLM_ENDPOINT", "localhost")
         self.vllm_port = os.getenv("VLLM_PORT", VLLM_PORT)
 
         self.base_url = f"http://{self.vllm_host}:{self.vllm_port}/v1"
-        self.client = OpenAI(base_url=self.base_url, api_key="EMPTY")
+        self.client = OpenAI(
+            base_url=self.base_url,
+            api_key="EMPTY",
+            # `batch_inference` sends requests from 100 threads
+            http_client=get_http_client(self.base_url, min_pool_size=100),
+        )
 
     @override
     def inference(self, test_entry: dict, include_input_log: bool, exclude_state_log: bool):
@@ -51,6 +70,11 @@ class OSSHandler(BaseHandler, EnforceOverrides):
             "OSS Models should call the batch_inference method instead."
         )
 
+    @override
+    def sends_seed(self) -> bool:
+        # Subclasses that query their own way don't forward it
+        return type(self)._query_prompting is OSSHandler._query_prompting
+
     @override
     def decode_ast(self, result, language="Python"):
         return default_decode_ast_prompting(result, language)
@@ -72,10 +96,106 @@ class OSSHandler(BaseHandler, EnforceOverrides):
         exclude_state_log: bool,
         update_mode: bool,
         result_dir=RESULT_PATH,
+        work_queue=None,
+        cost_model=None,
+        lora_modules: Optional[dict[str, str]] = None,
     ):
         """
         Batch inference for OSS models.
+        If `work_queue` is provided, the entries are claimed from the shared `FileLeaseWorkQueue` instead of being generated all at once.
+        """
+        self._load_model_files(local_model_path)
+
+        if not skip_server_setup:
+            server = self._launch_server(
+                num_gpus, gpu_memory_utilization, backend, lora_modules
+            )
+
+        try:
+            # Wait for the server to be ready
+            self._wait_for_server(None if skip_server_setup else server)
+
+            # Once the server is ready, make the completion requests
+            if work_queue is not None:
+                work_queue.run(
+                    partial(
+                        self._multi_threaded_inference,
+                        include_input_log=include_input_log,
+                        exclude_state_log=exclude_state_log,
+                    ),
+                    num_threads=100,
+                    desc=f"Generating results for {self.model_name}",
+                )
+                work_queue.merge(self, result_dir)
+                return
+
+            submission_order = test_entries
+            if cost_model is not None:
+                # Submit the slowest entries first, so that the run doesn't end waiting on a few stragglers
+                submission_order, predicted_makespan, original_makespan = (
+                    plan_longest_first(test_entries, cost_model, 100)
+                )
+            start_time = time.time()
+
+            futures = {}
+            with ThreadPoolExecutor(max_workers=100) as executor:
+                with tqdm(
+                    total=len(test_entries),
+                    desc=f"Generating results for {self.model_name}",
+                ) as pbar:
+
+                    for test_case in submission_order:
+                        future = executor.submit(
+                            self._multi_threaded_inference,
+                            test_case,
+                            include_input_log,
+                            exclude_state_log,
+                        )
+                        futures[test_case["id"]] = future
+
+                    # Written as they complete, so that a crash loses as few results as possible
+                    for future in as_completed(futures.values()):
+                        self.write(future.result(), result_dir, update_mode=update_mode)
+                        pbar.update()
+
+            if not update_mode:
+                self.sort_result_files(result_dir, test_entries)
+
+            if cost_model is not None:
+                report_makespan(
+                    predicted_makespan, original_makespan, time.time() - start_time
+                )
+
+        except Exception as e:
+            raise e
+
+        finally:
+            if not skip_server_setup:
+                self._shutdown_server(server)
+
+    @final
+    @contextmanager
+    def serve(
+        self,
+        num_gpus: int,
+        gpu_memory_utilization: float,
+        backend: str,
+        local_model_path: Optional[str],
+        lora_modules: Optional[dict[str, str]] = None,
+    ):
         """
+        Launch the server and keep it up for the duration of the `with` block, so that several `batch_inference` calls (with `skip_server_setup=True`, e.g. one per temperature or LoRA adapter) share a single launch.
+        """
+        self._load_model_files(local_model_path)
+        server = self._launch_server(num_gpus, gpu_memory_utilization, backend, lora_modules)
+        try:
+            self._wait_for_server(server)
+            yield
+        finally:
+            self._shutdown_server(server)
+
+    @final
+    def _load_model_files(self, local_model_path: Optional[str]) -> None:
         from transformers import AutoConfig, AutoTokenizer
 
         # Determine the model source
@@ -120,146 +240,140 @@ class OSSHandler(BaseHandler, EnforceOverrides):
                 )
         print(f"Max context length: {self.max_context_length}")
 
-        if not skip_server_setup:
-            if backend == "vllm":
-                process = subprocess.Popen(
-                    [
-                        "vllm",
-                        "serve",
-                        str(self.model_path_or_id),
-                        "--port",
-                        str(self.vllm_port),
-                        "--dtype",
-                        str(self.dtype),
-                        "--tensor-parallel-size",
-                        str(num_gpus),
-                        "--gpu-memory-utilization",
-                        str(gpu_memory_utilization),
-                        "--trust-remote-code",
-                    ],
-                    stdout=subprocess.PIPE,  # Capture stdout
-                    stderr=subprocess.PIPE,  # Capture stderr
-                    text=True,  # To get the output as text instead of bytes
-                )
-            elif backend == "sglang":
-
-                process = subprocess.Popen(
-                    [
-                        "python",
-                        "-m",
-                        "sglang.launch_server",
-                        "--model-path",
-                        str(self.model_path_or_id),
-                        "--port",
-                        str(self.vllm_port),
-                        "--dtype",
-                        str(self.dtype),
-                        "--tp",
-                        str(num_gpus),
-                        "--mem-fraction-static",
-                        str(gpu_memory_utilization),
-                        "--trust-remote-code",
-                    ],
-                    stdout=subprocess.PIPE,  # Capture stdout
-                    stderr=subprocess.PIPE,  # Capture stderr
-                    text=True,  # To get the output as text instead of bytes
-                )
-            else:
-                raise ValueError(f"Backend {backend} is not supported.")
-
-            stop_event = threading.Event()
-            # Event to signal threads to stop; no need to see logs after server is ready
-
-            def log_subprocess_output(pipe, stop_event):
-                # Read lines until stop event is set
-                for line in iter(pipe.readline, ""):
-                    if stop_event.is_set():
-                        break
-                    else:
-                        print(line, end="")
-                pipe.close()
-                print("server log tracking thread stopped successfully.")
-
-            # Start threads to read and print stdout and stderr
-            stdout_thread = threading.Thread(
-                target=log_subprocess_output, args=(process.stdout, stop_event)
-            )
-            stderr_thread = threading.Thread(
-                target=log_subprocess_output, args=(process.stderr, stop_event)
-            )
-            stdout_thread.start()
-            stderr_thread.start()
-
-        try:
-            # Wait for the server to be ready
-            server_ready = False
-            while not server_ready:
-                # Check if the process has terminated unexpectedly
-                if not skip_server_setup and process.poll() is not None:
-                    # Output the captured logs
-                    stdout, stderr = process.communicate()
-                    print(stdout)
-                    print(stderr)
-                    raise Exception(
-                        f"Subprocess terminated unexpectedly with code {process.returncode}"
-                    )
-                try:
-                    # Make a simple request to check if the server is up
-                    response = requests.get(f"{self.base_url}/models")
-                    if response.status_code == 200:
-                        server_ready = True
-                        print("server is ready!")
-                except requests.exceptions.ConnectionError:
-                    # If the connection is not ready, wait and try again
-                    time.sleep(1)
-
-            if not skip_server_setup:
-                # Signal threads to stop reading output
-                stop_event.set()
+    @final
+    def _launch_server(
+        self,
+        num_gpus: int,
+        gpu_memory_utilization: float,
+        backend: str,
+        lora_modules: Optional[dict[str, str]],
+    ) -> tuple:
+        """
+        Start the server process, and the threads that print its logs until it is ready.
+        """
+        if backend == "vllm":
+            command = [
+                "vllm",
+                "serve",
+                str(self.model_path_or_id),
+                "--port",
+                str(self.vllm_port),
+                "--dtype",
+                str(self.dtype),
+                "--tensor-parallel-size",
+                str(num_gpus),
+                "--gpu-memory-utilization",
+                str(gpu_memory_utilization),
+                "--trust-remote-code",
+            ]
+            if lora_modules:
+                # Each adapter is served under its own model name
+                command += ["--enable-lora", "--lora-modules"] + [
+                    f"{name}={path}" for name, path in lora_modules.items()
+                ]
+        elif backend == "sglang":
+            if lora_modules:
+                raise ValueError("LoRA adapters are only supported with the vLLM backend.")
+            command = [
+                "python",
+                "-m",
+                "sglang.launch_server",
+                "--model-path",
+                str(self.model_path_or_id),
+                "--port",
+                str(self.vllm_port),
+                "--dtype",
+                str(self.dtype),
+                "--tp",
+                str(num_gpus),
+                "--mem-fraction-static",
+                str(gpu_memory_utilization),
+                "--trust-remote-code",
+            ]
+        else:
+            raise ValueError(f"Backend {backend} is not supported.")
 
-            # Once the server is ready, make the completion requests
-            futures = []
-            with ThreadPoolExecutor(max_workers=100) as executor:
-                with tqdm(
-                    total=len(test_entries),
-                    desc=f"Generating results for {self.model_name}",
-                ) as pbar:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,  # Capture stdout
+            stderr=subprocess.PIPE,  # Capture stderr
+            text=True,  # To get the output as text instead of bytes
+        )
 
-                    for test_case in test_entries:
-                        future = executor.submit(
-                            self._multi_threaded_inference,
-                            test_case,
-                            include_input_log,
-                            exclude_state_log,
-                        )
-                        futures.append(future)
+        stop_event = threading.Event()
+        # Event to signal threads to stop; no need to see logs after server is ready
+
+        def log_subprocess_output(pipe, stop_event):
+            # Read lines until stop event is set
+            for line in iter(pipe.readline, ""):
+                if stop_event.is_set():
+                    break
+                else:
+                    print(line, end="")
+            pipe.close()
+            print("server log tracking thread stopped successfully.")
+
+        # Start threads to read and print stdout and stderr
+        stdout_thread = threading.Thread(
+            target=log_subprocess_output, args=(process.stdout, stop_event)
+        )
+        stderr_thread = threading.Thread(
+            target=log_subprocess_output, args=(process.stderr, stop_event)
+        )
+        stdout_thread.start()
+        stderr_thread.start()
 
-                    for future in futures:
-                        # This will wait for the task to complete, so that we are always writing in order
-                        result = future.result()
-                        self.write(result, result_dir, update_mode=update_mode)
-                        pbar.update()
+        return process, stop_event, [stdout_thread, stderr_thread]
 
-        except Exception as e:
-            raise e
+    @final
+    def _wait_for_server(self, server: Optional[tuple]) -> None:
+        """
+        Block until the server answers on `/models`. `server` is `None` for an externally managed server.
+        """
+        server_ready = False
+        while not server_ready:
+            # Check if the process has terminated unexpectedly
+            if server is not None and server[0].poll() is not None:
+                process = server[0]
+                # Output the captured logs
+                stdout, stderr = process.communicate()
+                print(stdout)
+                print(stderr)
+                raise Exception(
+                    f"Subprocess terminated unexpectedly with code {process.returncode}"
+                )
+            try:
+                # Make a simple request to check if the server is up
+                response = get_requests_session().get(f"{self.base_url}/models")
+                if response.status_code == 200:
+                    server_ready = True
+                    print("server is ready!")
+            except requests.exceptions.ConnectionError:
+                # If the connection is not ready, wait and try again
+                time.sleep(1)
+
+        if server is not None:
+            # Signal threads to stop reading output
+            server[1].set()
 
-        finally:
-            if not skip_server_setup:
-                # Ensure the server process is terminated properly
-                process.terminate()
-                try:
-                    # Wait for the process to terminate fully
-                    process.wait(timeout=15)
-                    print("Process terminated successfully.")
-                except subprocess.TimeoutExpired:
-                    process.kill()
-                    process.wait()  # Wait again to ensure it's fully terminated
-                    print("Process killed.")
-
-                # Wait for the output threads to finish
-                stop_event.set()
-                stdout_thread.join()
-                stderr_thread.join()
+    @final
+    def _shutdown_server(self, server: tuple) -> None:
+        process, stop_event, log_threads = server
+        # Ensure the server process is terminated properly
+        process.terminate()
+        try:
+            # Wait for the process to terminate fully
+            process.wait(timeout=15)
+            print("Process terminated successfully.")
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()  # Wait again to ensure it's fully terminated
+            print("Process killed.")
+
+        # Wait for the output threads to finish
+        stop_event.set()
+        for thread in log_threads:
+            thread.join()
 
     @final
     def _multi_threaded_inference(
@@ -292,6 +406,9 @@ class OSSHandler(BaseHandler, EnforceOverrides):
             metadata = {
                 "traceback": traceback.format_exc(),
             }
+        finally:
+            if "multi_turn" in test_case["id"]:
+                end_multi_turn_session(self.model_name_underline_replaced, test_case["id"])
 
         result_to_write = {
             "id": test_case["id"],
@@ -340,28 +457,30 @@ class OSSHandler(BaseHandler, EnforceOverrides):
         if hasattr(self, "skip_special_tokens"):
             extra_body["skip_special_tokens"] = self.skip_special_tokens
 
-        start_time = time.time()
+        kwargs = {
+            # vLLM serves each LoRA adapter under its own model name
+            "model": self.lora_adapter or self.model_path_or_id,
+            "temperature": self.temperature,
+            "prompt": formatted_prompt,
+            "max_tokens": leftover_tokens_count,
+            "n": inference_data.get("num_samples", 1),
+            "timeout": get_request_timeout(72000),  # Avoid timeout errors, unless a deadline is set
+        }
+        if self.seed is not None:
+            kwargs["seed"] = self.seed
         if len(extra_body) > 0:
-            api_response = self.client.completions.create(
-                model=self.model_path_or_id,
-                temperature=self.temperature,
-                prompt=formatted_prompt,
-                max_tokens=leftover_tokens_count,
-                extra_body=extra_body,
-                timeout=72000,  # Avoid timeout errors
-            )
-        else:
-            api_response = self.client.completions.create(
-                model=self.model_path_or_id,
-                temperature=self.temperature,
-                prompt=formatted_prompt,
-                max_tokens=leftover_tokens_count,
-                timeout=72000,  # Avoid timeout errors
-            )
+            kwargs["extra_body"] = extra_body
+
+        start_time = time.time()
+        api_response = self.client.completions.create(**kwargs)
         end_time = time.time()
 
         return api_response, end_time - start_time
 
+    @override
+    def _split_samples(self, api_response: any) -> list:
+        return split_choices(api_response)
+
     @override
     def _pre_query_processing_prompting(self, test_entry: dict) -> dict:
         functions: list = test_entry["function"]
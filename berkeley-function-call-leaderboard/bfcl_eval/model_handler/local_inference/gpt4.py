@@ -1,8 +1,8 @@
-import requests
 import time
 import json
 import os
 from bfcl_eval.model_handler.base_handler import BaseHandler
+from bfcl_eval.model_handler.http_transport import get_requests_session
 from bfcl_eval.model_handler.model_style import ModelStyle
 from overrides import override
 
@@ -27,7 +27,7 @@ class GPT4Handler(BaseHandler):
         
         
         start_time = time.time()
-        response = requests.post(
+        response = get_requests_session().post(
             f"{self.base_url}/chat/completions",
             headers={
                 "Authorization": f"Bearer {self.api_key}",
@@ -1,6 +1,6 @@
-import requests
 import time
 from bfcl_eval.model_handler.base_handler import BaseHandler
+from bfcl_eval.model_handler.http_transport import get_requests_session
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.utils import (
     func_doc_language_specific_pre_processing,
@@ -28,7 +28,7 @@ class SOHandler(BaseHandler):
             request_data["tools"] = tools
             
         start_time = time.time()
-        response = requests.post(f"{self.base_url}/v1/chat/completions", json=request_data, timeout=30)
+        response = get_requests_session().post(f"{self.base_url}/v1/chat/completions", json=request_data, timeout=30)
         end_time = time.time()
         
         return response, end_time - start_time
@@ -181,7 +181,7 @@ class SOHandler(BaseHandler):
             request_data["tools"] = tools
             
         start_time = time.time()
-        response = requests.post(f"{self.base_url}/v1/chat/completions", json=request_data, timeout=30)
+        response = get_requests_session().post(f"{self.base_url}/v1/chat/completions", json=request_data, timeout=30)
         end_time = time.time()
         
         return response, end_time - start_time
@@ -0,0 +1,220 @@
+import copy
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Optional
+
+import numpy as np
+
+# A duplicate request is fired once the original has been running for longer than this percentile of the latencies observed so far
+HEDGE_PERCENTILE = 95
+# Minimum number of observed latencies before any request is hedged
+MIN_HEDGE_SAMPLES = 20
+# Only the most recent latencies are used for the percentile, so that it follows the current load of the provider
+LATENCY_WINDOW = 1000
+# Maximum fraction of the requests that may be hedged, unless `configure_request_hedging` says otherwise
+DEFAULT_MAX_HEDGE_RATE = 0.05
+
+# Process-wide configuration, shared by all handlers and threads
+_deadline: Optional[float] = None
+_hedging_enabled = False
+_max_hedge_rate = DEFAULT_MAX_HEDGE_RATE
+
+# Model name -> statistics of its requests
+_latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+_request_stats = defaultdict(
+    lambda: {
+        "requests": 0,
+        "hedged": 0,
+        "hedges_won": 0,
+        "deadline_exceeded": 0,
+        "saved_latency": 0.0,
+        # Requests that are no longer waited for (hedge losers, requests past the deadline) but have not returned yet
+        "abandoned_in_flight": 0,
+    }
+)
+_stats_lock = threading.Lock()
+
+
+class RequestDeadlineExceeded(TimeoutError):
+    pass
+
+
+def configure_request_hedging(
+    deadline: Optional[float] = None,
+    hedging: bool = False,
+    max_hedge_rate: float = DEFAULT_MAX_HEDGE_RATE,
+) -> None:
+    """
+    Set the per-request deadline (in seconds, `None` for no deadline) and whether slow requests are hedged.
+    """
+    global _deadline, _hedging_enabled, _max_hedge_rate
+    _deadline = deadline
+    _hedging_enabled = hedging
+    _max_hedge_rate = max_hedge_rate
+
+
+def get_request_timeout(default: float) -> float:
+    """
+    Get the client-side timeout for a single request: the deadline if one is configured, otherwise the handler's own default.
+    """
+    return _deadline if _deadline is not None else default
+
+
+def _start_query(query_method: Callable, inference_data: dict) -> Future:
+    # A plain daemon thread rather than a pool: a request that never returns must not hold up a pool slot, or the interpreter at exit
+    future = Future()
+
+    def run() -> None:
+        try:
+            future.set_result(query_method(inference_data))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="bfcl-hedged-request", daemon=True).start()
+    return future
+
+
+def _hedge_delay(model_name: str) -> Optional[float]:
+    # Called with `_stats_lock` held
+    latencies = _latencies[model_name]
+    if len(latencies) < MIN_HEDGE_SAMPLES:
+        return None
+    if not _has_hedge_budget(model_name):
+        return None
+    return float(np.percentile(latencies, HEDGE_PERCENTILE))
+
+
+def _has_hedge_budget(model_name: str) -> bool:
+    # Called with `_stats_lock` held. The abandoned requests still running count against the budget, so that a provider that stops answering can't pile up background threads.
+    stats = _request_stats[model_name]
+    return stats["hedged"] + stats["abandoned_in_flight"] < _max_hedge_rate * stats["requests"]
+
+
+def _abandon(model_name: str, future: Future) -> None:
+    """
+    Stop waiting for a request. Its thread can't be interrupted, so it is counted as in flight until it returns.
+    """
+    with _stats_lock:
+        if future.done():
+            return
+        _request_stats[model_name]["abandoned_in_flight"] += 1
+
+    def release(_: Future) -> None:
+        with _stats_lock:
+            _request_stats[model_name]["abandoned_in_flight"] -= 1
+
+    future.add_done_callback(release)
+
+
+def run_query(
+    model_name: str, query_method: Callable, inference_data: dict
+) -> tuple[any, float]:
+    """
+    Call `query_method(inference_data)` (the handler's `_query_FC` or `_query_prompting`), subject to the configured deadline and hedging.
+
+    If the request has not returned by the p95 latency observed so far for the model, an identical request is fired and whichever returns first is used, as long as no more than the allowed fraction of requests has been hedged.
+    The returned latency is the wall-clock time since the original request was sent, so it includes the wait before the hedge.
+    A request still running at the deadline raises `RequestDeadlineExceeded`; the call itself cannot be interrupted and is left to finish in the background.
+
+    The query methods write the input log to `inference_data`, and some also change the messages in place (e.g. the cache control flags of Claude), so the hedge gets its own deep copy of it, taken before the original request is sent; if the hedge wins, its input log is copied back.
+    Abandoned requests keep running in the background, and count against the hedging budget until they return.
+    """
+    if _deadline is None and not _hedging_enabled:
+        return query_method(inference_data)
+
+    start_time = time.time()
+    with _stats_lock:
+        _request_stats[model_name]["requests"] += 1
+        hedge_delay = _hedge_delay(model_name) if _hedging_enabled else None
+
+    # Copied before the original request starts changing it
+    hedge_inference_data = (
+        copy.deepcopy(inference_data) if hedge_delay is not None else None
+    )
+    primary = _start_query(query_method, inference_data)
+    pending = {primary}
+    hedge = None
+    while True:
+        elapsed = time.time() - start_time
+        timeouts = []
+        if _deadline is not None:
+            timeouts.append(_deadline - elapsed)
+        if hedge is None and hedge_delay is not None:
+            timeouts.append(hedge_delay - elapsed)
+        done, pending = wait(
+            pending,
+            timeout=max(min(timeouts), 0) if timeouts else None,
+            return_when=FIRST_COMPLETED,
+        )
+
+        succeeded = [future for future in done if future.exception() is None]
+        if succeeded:
+            winner = primary if primary in succeeded else succeeded[0]
+            api_response, _ = winner.result()
+            latency = time.time() - start_time
+            with _stats_lock:
+                _latencies[model_name].append(latency)
+                if winner is hedge:
+                    _request_stats[model_name]["hedges_won"] += 1
+            if winner is hedge:
+                if "inference_input_log" in hedge_inference_data:
+                    inference_data["inference_input_log"] = hedge_inference_data[
+                        "inference_input_log"
+                    ]
+                primary.add_done_callback(
+                    _record_saved_latency(model_name, start_time, latency)
+                )
+            for future in pending:
+                _abandon(model_name, future)
+            return api_response, latency
+        if done and not pending:
+            # Every request failed, report the error of the original one
+            raise primary.exception()
+
+        elapsed = time.time() - start_time
+        if _deadline is not None and elapsed >= _deadline:
+            with _stats_lock:
+                _request_stats[model_name]["deadline_exceeded"] += 1
+            for future in pending:
+                _abandon(model_name, future)
+            raise RequestDeadlineExceeded(
+                f"Request did not return within the deadline of {_deadline} seconds."
+            )
+
+        if hedge is None and hedge_delay is not None and elapsed >= hedge_delay:
+            with _stats_lock:
+                # Re-check the budget, other threads may have hedged in the meantime
+                fire_hedge = _has_hedge_budget(model_name)
+                if fire_hedge:
+                    _request_stats[model_name]["hedged"] += 1
+            if fire_hedge:
+                hedge = _start_query(query_method, hedge_inference_data)
+                pending.add(hedge)
+            else:
+                hedge_delay = None
+
+
+def _record_saved_latency(model_name: str, start_time: float, latency: float) -> Callable:
+    def record(primary: Future) -> None:
+        # Only known once the original request finally returns
+        saved_latency = time.time() - start_time - latency
+        with _stats_lock:
+            _request_stats[model_name]["saved_latency"] += saved_latency
+
+    return record
+
+
+def get_hedging_stats() -> dict[str, dict]:
+    with _stats_lock:
+        return {model_name: dict(stats) for model_name, stats in _request_stats.items()}
+
+
+def print_hedging_stats() -> None:
+    for model_name, stats in get_hedging_stats().items():
+        if stats["hedged"] == 0 and stats["deadline_exceeded"] == 0:
+            continue
+        print(
+            f"🪁 {model_name}: hedged {stats['hedged']} of {stats['requests']} requests ({stats['hedges_won']} hedges returned first, saving at least {stats['saved_latency']:.1f}s of tail latency); {stats['deadline_exceeded']} requests exceeded the deadline; {stats['abandoned_in_flight']} abandoned requests are still running."
+        )
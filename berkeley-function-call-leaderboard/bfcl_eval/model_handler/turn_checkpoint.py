@@ -0,0 +1,53 @@
+import os
+import pickle
+from pathlib import Path
+from typing import Optional
+
+# Folder, inside each model's result folder, that holds the checkpoints of the multi-turn entries in progress
+TURN_CHECKPOINT_DIR_NAME = ".turn_checkpoints"
+
+
+def get_turn_checkpoint_dir(result_dir: Path, model_name: str) -> Path:
+    return result_dir / model_name.replace("/", "_") / TURN_CHECKPOINT_DIR_NAME
+
+
+def _checkpoint_path(checkpoint_dir: Path, test_entry_id: str) -> Path:
+    return checkpoint_dir / f"{test_entry_id}.pkl"
+
+
+def save_turn_checkpoint(checkpoint_dir: Path, test_entry_id: str, checkpoint: dict) -> None:
+    """
+    Persist the state of a multi-turn entry after a completed turn, replacing its previous checkpoint.
+
+    The checkpoint is pickled, since the chat history of most handlers holds SDK response objects, and the simulator instances are plain Python objects.
+    It is written to a temporary file first, so that a crash never leaves a truncated checkpoint behind.
+    """
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    path = _checkpoint_path(checkpoint_dir, test_entry_id)
+    temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(temp_path, "wb") as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+
+def load_turn_checkpoint(checkpoint_dir: Path, test_entry_id: str) -> Optional[dict]:
+    """
+    Load the checkpoint of a multi-turn entry, or `None` if there is none (or it can't be read, e.g. after a code change).
+    """
+    path = _checkpoint_path(checkpoint_dir, test_entry_id)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"⚠️ Ignoring the unreadable checkpoint of {test_entry_id}: {e}")
+        return None
+
+
+def has_turn_checkpoint(checkpoint_dir: Path, test_entry_id: str) -> bool:
+    return _checkpoint_path(checkpoint_dir, test_entry_id).exists()
+
+
+def remove_turn_checkpoint(checkpoint_dir: Path, test_entry_id: str) -> None:
+    _checkpoint_path(checkpoint_dir, test_entry_id).unlink(missing_ok=True)
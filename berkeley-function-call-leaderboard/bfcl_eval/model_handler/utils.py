@@ -1,13 +1,18 @@
 import ast
 import builtins
-import copy
+import hashlib
 import json
 import operator
 import re
+import threading
+from collections import OrderedDict
 from functools import reduce
 from typing import Callable, List, Optional, Type, Union
 
-from bfcl_eval.constants.default_prompts import DEFAULT_SYSTEM_PROMPT
+from bfcl_eval.constants.default_prompts import (
+    DEFAULT_SYSTEM_PROMPT,
+    LOOP_DETECTION_MAX_CYCLE_LENGTH,
+)
 from bfcl_eval.constants.type_mappings import GORILLA_TO_OPENAPI
 from bfcl_eval.model_handler.model_style import ModelStyle
 from bfcl_eval.model_handler.parser.java_parser import parse_java_function_call
@@ -20,6 +25,44 @@ from tenacity import (
 )
 
 
+# Maximum number of compiled function docs and tools kept in memory
+FUNCTION_DOC_CACHE_SIZE = 8192
+
+
+class _CompiledFunctionDocCache:
+    """
+    Thread-safe LRU cache of compiled function docs and tools.
+    Values are stored serialized, so that the cached copy can't be modified by a handler, and every caller gets its own copy from a fast `json.loads` instead of a `deepcopy`.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: tuple, value: str) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+_compiled_function_doc_cache = _CompiledFunctionDocCache(FUNCTION_DOC_CACHE_SIZE)
+
+
+def _function_doc_hash(functions) -> tuple[str, str]:
+    serialized_functions = json.dumps(functions)
+    return hashlib.sha256(serialized_functions.encode()).hexdigest(), serialized_functions
+
+
 def _cast_to_openai_type(properties, mapping):
     for key, value in properties.items():
         if "type" not in value:
@@ -66,7 +109,40 @@ def _cast_to_openai_type(properties, mapping):
 
 
 def convert_to_tool(functions, mapping, model_style):
-    functions = copy.deepcopy(functions)
+    """
+    Convert the function docs into the tool format of the model style.
+    The function docs are not modified. Compilations are cached by the hash of the function docs, so repeated docs (e.g. the live categories, or the multi-turn function doc files) are only converted once.
+    """
+    doc_hash, serialized_functions = _function_doc_hash(functions)
+    key = ("tool", doc_hash, tuple(sorted(mapping.items())), model_style)
+    compiled = _compiled_function_doc_cache.get(key)
+    if compiled is None:
+        compiled = json.dumps(
+            _convert_to_tool(json.loads(serialized_functions), mapping, model_style)
+        )
+        _compiled_function_doc_cache.put(key, compiled)
+    return json.loads(compiled)
+
+
+def compile_tools(functions, test_category, mapping, model_style):
+    """
+    Same as `convert_to_tool(func_doc_language_specific_pre_processing(functions, test_category), mapping, model_style)`, with a single cache lookup.
+    """
+    doc_hash, serialized_functions = _function_doc_hash(functions)
+    language = _get_func_doc_language(test_category)
+    key = ("compiled_tool", doc_hash, language, tuple(sorted(mapping.items())), model_style)
+    compiled = _compiled_function_doc_cache.get(key)
+    if compiled is None:
+        functions = json.loads(serialized_functions)
+        if len(functions) > 0:
+            functions = _func_doc_language_specific_pre_processing(functions, language)
+        compiled = json.dumps(_convert_to_tool(functions, mapping, model_style))
+        _compiled_function_doc_cache.put(key, compiled)
+    return json.loads(compiled)
+
+
+def _convert_to_tool(functions, mapping, model_style):
+    # Modifies `functions` in place
     oai_tool = []
     for item in functions:
         if "." in item["name"] and model_style in [
@@ -386,11 +462,37 @@ def _get_language_specific_hint(test_category):
         return " Note that the provided function is in Python 3 syntax."
 
 
+def _get_func_doc_language(test_category):
+    # The only part of the test category that the function doc pre-processing depends on
+    if test_category in ["java", "javascript"]:
+        return test_category
+    return "python"
+
+
 def func_doc_language_specific_pre_processing(function, test_category):
+    """
+    Add the language specific hints to the function docs, and cast the Java and JavaScript parameter types to string.
+    Returns a new list; the given function docs are not modified, so they can be safely compiled again (e.g. after a multi-turn holdout function is added).
+    """
     if len(function) == 0:
         return function
 
     assert type(function) == list
+    doc_hash, serialized_function = _function_doc_hash(function)
+    key = ("doc", doc_hash, _get_func_doc_language(test_category))
+    compiled = _compiled_function_doc_cache.get(key)
+    if compiled is None:
+        compiled = json.dumps(
+            _func_doc_language_specific_pre_processing(
+                json.loads(serialized_function), _get_func_doc_language(test_category)
+            )
+        )
+        _compiled_function_doc_cache.put(key, compiled)
+    return json.loads(compiled)
+
+
+def _func_doc_language_specific_pre_processing(function, test_category):
+    # Modifies `function` in place
     for item in function:
         # Add language specific hints to the function description
         func_description = item["description"]
@@ -757,6 +859,71 @@ def decoded_output_to_execution_list(decoded_output: list[dict]) -> list[str]:
     return execution_list
 
 
+def split_choices(api_response) -> list:
+    """
+    Split an OpenAI-style response (Chat Completions or Completions) with several `choices` into one response per choice, keeping the other fields (e.g. `usage`) as is.
+    """
+    choices = getattr(api_response, "choices", None)
+    if not choices or len(choices) < 2:
+        return [api_response]
+    return [api_response.model_copy(update={"choices": [choice]}) for choice in choices]
+
+
+class StepLoopDetector:
+    """
+    Detect a multi-turn model stuck in a loop within a turn.
+
+    Each step is reduced to a hash of its decoded function calls, their execution results and the state of the simulator instances after them.
+    The turn is considered stuck once the last steps are the same step repeated `repeat_limit` times, or the same cycle of up to `max_cycle_length` steps repeated `repeat_limit` times.
+    Since the execution results and the state are part of the hash, a model that repeats a call whose result changes (e.g. polling until something finishes), or that keeps changing the state (e.g. appending to a file with `echo`), is not flagged.
+    """
+
+    def __init__(
+        self, repeat_limit: int, max_cycle_length: int = LOOP_DETECTION_MAX_CYCLE_LENGTH
+    ) -> None:
+        self.repeat_limit = repeat_limit
+        self.max_cycle_length = max_cycle_length
+        self.step_hashes: list[int] = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.repeat_limit) and self.repeat_limit >= 2
+
+    def record_step(
+        self,
+        decoded_model_responses: list[str],
+        execution_results: list[str],
+        state_digest: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Record a step of the turn.
+        Returns the reason to end the turn if the model is looping, otherwise `None`.
+        """
+        if not self.enabled:
+            return None
+        self.step_hashes.append(
+            hash(
+                json.dumps(
+                    [decoded_model_responses, execution_results, state_digest], default=str
+                )
+            )
+        )
+
+        for cycle_length in range(1, self.max_cycle_length + 1):
+            window = cycle_length * self.repeat_limit
+            if len(self.step_hashes) < window:
+                break
+            recent_hashes = self.step_hashes[-window:]
+            if all(
+                recent_hashes[i] == recent_hashes[i + cycle_length]
+                for i in range(window - cycle_length)
+            ):
+                if cycle_length == 1:
+                    return f"Model repeated the same function calls with the same execution results {self.repeat_limit} times in a row."
+                return f"Model cycled through the same {cycle_length} steps {self.repeat_limit} times in a row."
+        return None
+
+
 def retry_with_backoff(
     error_type: Optional[Union[Type[Exception], List[Type[Exception]]]] = None,
     error_message_pattern: Optional[str] = None,
@@ -0,0 +1,40 @@
+import argparse
+from pathlib import Path
+
+from bfcl_eval.model_handler.input_log import expand_input_logs
+from bfcl_eval.utils import load_file, write_list_of_dicts_to_file
+
+"""
+With `--include-input-log`, the input logs of the multi-turn entries are delta-encoded: each step only refers to the messages it shares with the previous step, and stores the new ones in the message table of the entry (`input_log_messages`).
+This script reconstructs the full input log of every step, for a result file or a score file.
+
+To run this script, use the following command:
+```
+cd berkeley-function-call-leaderboard/bfcl_eval/scripts
+python expand_inference_input_log.py PATH_TO_RESULT_OR_SCORE_FILE [--id ENTRY_ID ...]
+```
+
+The expanded entries are written next to the input file, with the `_expanded` suffix.
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Reconstruct the full input logs of a result or score file."
+    )
+    parser.add_argument("file", type=str, help="Path to the result or score file")
+    parser.add_argument(
+        "--id", nargs="+", type=str, default=None, help="Only expand these entries"
+    )
+    args = parser.parse_args()
+
+    file_path = Path(args.file)
+    entries = load_file(file_path)
+    expanded_entries = [
+        expand_input_logs(entry)
+        for entry in entries
+        # The header of a score file has no id
+        if args.id is None or entry.get("id") in args.id
+    ]
+    output_file_name = f"{file_path.stem}_expanded{file_path.suffix}"
+    write_list_of_dicts_to_file(output_file_name, expanded_entries, file_path.parent)
+    print(f"Expanded {len(expanded_entries)} entries into {file_path.parent / output_file_name}")
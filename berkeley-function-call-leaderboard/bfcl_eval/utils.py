@@ -1,9 +1,10 @@
-import json
+import hashlib
 import os
 import re
 from pathlib import Path
 from typing import Union
 
+from bfcl_eval._json_codec import dumps_bytes, loads, read_jsonl, write_jsonl
 from bfcl_eval.constants.category_mapping import TEST_COLLECTION_MAPPING, TEST_FILE_MAPPING, VERSION_PREFIX
 
 
@@ -68,12 +69,182 @@ def is_sql(test_category):
     return "sql" in test_category
 
 
+def parse_shard_argument(shard_arg: str) -> tuple[int, int]:
+    """
+    Parse a shard specification of the form `i/N` into `(i, N)`.
+    Shards are 0-indexed, so `i` must be in the range `[0, N)`.
+    """
+    try:
+        shard_index, num_shards = (int(part) for part in shard_arg.split("/"))
+    except ValueError:
+        raise ValueError(
+            f"Invalid shard specification '{shard_arg}'. Expected the form `i/N`, e.g. `3/16`."
+        )
+    if num_shards <= 0 or not 0 <= shard_index < num_shards:
+        raise ValueError(
+            f"Invalid shard specification '{shard_arg}'. Shard index must be in the range [0, {num_shards})."
+        )
+    return shard_index, num_shards
+
+
+def is_in_shard(test_entry_id: str, shard_index: int, num_shards: int) -> bool:
+    """
+    Assign a test entry to a shard by a stable hash of its id.
+    Python's built-in `hash` is salted per process, so we use sha256 to make sure every worker agrees on the partition.
+    """
+    digest = hashlib.sha256(test_entry_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards == shard_index
+
+
+def get_shard_dir_name(shard_index: int, num_shards: int) -> str:
+    return f"shard_{shard_index}_of_{num_shards}"
+
+
+def validate_subset_arguments(subset_fraction, subset_size) -> None:
+    if subset_fraction is not None and subset_size is not None:
+        raise ValueError("Only one of `--subset-fraction` and `--subset-size` can be given.")
+    if subset_fraction is not None and not 0 < subset_fraction <= 1:
+        raise ValueError(
+            f"`--subset-fraction` must be in the range (0, 1], got {subset_fraction}."
+        )
+    if subset_size is not None and subset_size < 1:
+        raise ValueError(f"`--subset-size` must be at least 1, got {subset_size}.")
+
+
+def get_subset_stratum(test_entry: dict) -> str:
+    """
+    The stratum of an entry within its test category, for `--subset-fraction` / `--subset-size`: the set of classes involved for multi-turn entries, and the number of function docs offered otherwise.
+    Live and non-live entries are in different categories, so they are always sampled separately.
+    """
+    if "involved_classes" in test_entry:
+        return "classes:" + "+".join(sorted(test_entry["involved_classes"]))
+    num_functions = len(test_entry.get("function", []))
+    if num_functions >= 8:
+        return "functions:8+"
+    if num_functions >= 5:
+        return "functions:5-7"
+    return f"functions:{num_functions}"
+
+
+# Fewest entries sampled from each stratum: the variance of a stratum can't be estimated from a single entry
+MIN_SUBSET_STRATUM_SAMPLE = 2
+
+
+def _allocate_subset(stratum_sizes: list[int], sample_size: int) -> list[int]:
+    # Proportional allocation, with the largest remainders rounded up; every stratum gets at least `MIN_SUBSET_STRATUM_SAMPLE` entries when the sample is large enough
+    minimum = (
+        MIN_SUBSET_STRATUM_SAMPLE
+        if sample_size >= MIN_SUBSET_STRATUM_SAMPLE * len(stratum_sizes)
+        else 0
+    )
+    capacities = [size - minimum for size in stratum_sizes]
+    remaining = sample_size - minimum * len(stratum_sizes)
+    quotas = [capacity * remaining / max(sum(capacities), 1) for capacity in capacities]
+    allocation = [int(quota) for quota in quotas]
+    by_remainder = sorted(
+        range(len(quotas)), key=lambda i: allocation[i] - quotas[i]
+    )
+    for i in by_remainder[: remaining - sum(allocation)]:
+        allocation[i] += 1
+    return [minimum + count for count in allocation]
+
+
+def _get_subset_sample_size(num_entries: int, subset_fraction, subset_size) -> int:
+    if subset_fraction is not None:
+        return max(1, round(num_entries * subset_fraction))
+    return min(subset_size, num_entries)
+
+
+def _collapse_strata(strata: dict[str, list], sample_size: int) -> dict[str, list]:
+    """
+    Merge the strata until each one gets at least `MIN_SUBSET_STRATUM_SAMPLE` entries of the sample (or a single stratum is left).
+    The smallest stratum is merged into the smaller of its neighbours in name order, which are the closest number of functions, or sets of classes sharing the first ones.
+    """
+    strata = dict(sorted(strata.items()))
+    while len(strata) > 1:
+        names = list(strata)
+        allocation = _allocate_subset([len(strata[name]) for name in names], sample_size)
+        if min(allocation) >= MIN_SUBSET_STRATUM_SAMPLE:
+            break
+        smallest = min(range(len(names)), key=lambda i: (len(strata[names[i]]), i))
+        neighbours = [i for i in (smallest - 1, smallest + 1) if 0 <= i < len(names)]
+        neighbour = min(neighbours, key=lambda i: (len(strata[names[i]]), i))
+        first, second = sorted((smallest, neighbour))
+        merged = {}
+        for i, name in enumerate(names):
+            if i == first:
+                merged[f"{name} | {names[second]}"] = strata[name] + strata[names[second]]
+            elif i != second:
+                merged[name] = strata[name]
+        strata = merged
+    return strata
+
+
+def get_subset_strata(
+    test_entries: list[dict], subset_fraction: float = None, subset_size: int = None
+) -> dict[str, dict[str, list[dict]]]:
+    """
+    The strata that `select_subset` samples from, by test category: the strata of `get_subset_stratum`, with the ones too small for the sample size merged together.
+    """
+    entries_by_stratum = {}
+    for entry in test_entries:
+        test_category = extract_test_category_from_id(entry["id"])
+        entries_by_stratum.setdefault(test_category, {}).setdefault(
+            get_subset_stratum(entry), []
+        ).append(entry)
+
+    for test_category, strata in entries_by_stratum.items():
+        num_entries = sum(len(entries) for entries in strata.values())
+        entries_by_stratum[test_category] = _collapse_strata(
+            strata, _get_subset_sample_size(num_entries, subset_fraction, subset_size)
+        )
+    return entries_by_stratum
+
+
+def get_subset_stratum_by_id(
+    test_entries: list[dict], subset_fraction: float = None, subset_size: int = None
+) -> dict[str, str]:
+    return {
+        entry["id"]: stratum
+        for strata in get_subset_strata(test_entries, subset_fraction, subset_size).values()
+        for stratum, entries in strata.items()
+        for entry in entries
+    }
+
+
+def select_subset(
+    test_entries: list[dict],
+    subset_fraction: float = None,
+    subset_size: int = None,
+    seed: int = 0,
+) -> list[dict]:
+    """
+    Draw a stratified sample of the entries of each test category: `subset_fraction` of them, or `subset_size` of them (all of them for smaller categories).
+    The sample size is split across the strata of `get_subset_strata` in proportion to their size, and each stratum takes its entries in the order of a stable hash of the seed and their id, so the selection only depends on the dataset and the seed.
+    Returns the selected entries, in their original order.
+    """
+    selected_ids = set()
+    for strata in get_subset_strata(test_entries, subset_fraction, subset_size).values():
+        num_entries = sum(len(entries) for entries in strata.values())
+        sample_size = _get_subset_sample_size(num_entries, subset_fraction, subset_size)
+        stratum_names = sorted(strata)
+        allocation = _allocate_subset(
+            [len(strata[name]) for name in stratum_names], sample_size
+        )
+        for name, count in zip(stratum_names, allocation):
+            ordered = sorted(
+                strata[name],
+                key=lambda entry: hashlib.sha256(
+                    f"{seed}:{entry['id']}".encode("utf-8")
+                ).digest(),
+            )
+            selected_ids.update(entry["id"] for entry in ordered[:count])
+
+    return [entry for entry in test_entries if entry["id"] in selected_ids]
+
+
 def load_file(file_path, sort_by_id=False):
-    result = []
-    with open(file_path) as f:
-        file = f.readlines()
-        for line in file:
-            result.append(json.loads(line))
+    result = read_jsonl(file_path)
 
     if sort_by_id:
         result.sort(key=sort_key)
@@ -88,31 +259,13 @@ def write_list_of_dicts_to_file(filename, data, subdir=None):
         # Construct the full path to the file
         filename = os.path.join(subdir, filename)
 
-    # Write the list of dictionaries to the file in JSON format
-    with open(filename, "w") as f:
-        for i, entry in enumerate(data):
-            # Go through each key-value pair in the dictionary to make sure the values are JSON serializable
-            entry = make_json_serializable(entry)
-            json_str = json.dumps(entry)
-            f.write(json_str)
-            if i < len(data) - 1:
-                f.write("\n")
+    # Write the list of dictionaries to the file in JSON format; values that are not JSON serializable are written as strings
+    write_jsonl(filename, data)
 
 
 def make_json_serializable(value):
-    if isinstance(value, dict):
-        # If the value is a dictionary, we need to go through each key-value pair recursively
-        return {k: make_json_serializable(v) for k, v in value.items()}
-    elif isinstance(value, list):
-        # If the value is a list, we need to process each element recursively
-        return [make_json_serializable(item) for item in value]
-    else:
-        # Try to serialize the value directly, and if it fails, convert it to a string
-        try:
-            json.dumps(value)
-            return value
-        except (TypeError, ValueError):
-            return str(value)
+    # A round trip through the encoder, which turns the values that are not JSON serializable into strings
+    return loads(dumps_bytes(value))
 
 
 def sort_key(entry):